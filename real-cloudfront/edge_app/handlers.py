@@ -6,6 +6,7 @@ def viewer_request(event, context):
     Handler to run on viewer_request events which:
       * authorizes the http method based on the Method querystirng parameter
       * authorized methods default to read-only methods (GET, HEAD) if not specified
+      * urls signed with a custom policy are only authorized read-only methods
     """
     # https://docs.aws.amazon.com/AmazonCloudFront/latest/DeveloperGuide/lambda-event-structure.html
     request = event['Records'][0]['cf']['request']
@@ -13,6 +14,11 @@ def viewer_request(event, context):
     parsed_qs = urllib.parse.parse_qs(request['querystring'])
     allowed_http_methods = parsed_qs.get('Method', ['GET', 'HEAD'])
 
+    # urls signed with a custom policy may cover a whole directory with a wildcard, which also matches any
+    # Method parameter appended to them, so those urls are only ever allowed reads
+    if 'Policy' in parsed_qs:
+        allowed_http_methods = ['GET', 'HEAD']
+
     if http_method not in allowed_http_methods:
         return {'status': 403}
 
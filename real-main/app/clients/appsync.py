@@ -1,29 +1,128 @@
+import asyncio
+import collections
+import concurrent.futures
+import contextlib
+import functools
+import itertools
 import logging
 import os
+import threading
+import time
 
 import boto3
-import gql.transport.requests
+import gql
+import graphql.language.printer
+import requests
+import requests.adapters
 import requests_aws4auth
 
 APPSYNC_GRAPHQL_URL = os.environ.get('APPSYNC_GRAPHQL_URL')
 
 logger = logging.getLogger()
 
+GraphQLResult = collections.namedtuple('GraphQLResult', ['data', 'errors'])
+ParsedQuery = collections.namedtuple('ParsedQuery', ['document', 'text'])
+
+
+@functools.lru_cache(maxsize=64)
+def parse_document(query):
+    "Parse a graphql document, and print it back to the text sent, once per distinct query text per container"
+    return to_parsed_query(gql.gql(query))
+
+
+def to_parsed_query(document):
+    return ParsedQuery(document=document, text=graphql.language.printer.print_ast(document))
+
+
+class RetryableError(Exception):
+    "A request that was throttled, or failed server-side or in transit, and may succeed if tried again"
+
+
+class NotificationCoalescer:
+    """
+    Notifications recorded over a batch, deduped by (userId, type, payload key) so that each is sent once.
+    The payload key is made of those fields of the notification given for its type in `key_fields`, or of
+    all its fields if its type has none given. Of notifications with the same key, the payload of the latest
+    recorded is kept, in the place of the first. Safe to share between threads.
+    """
+
+    def __init__(self, key_fields=None):
+        self.key_fields = key_fields or {}
+        self.notifications = {}
+        self.recorded_count = 0
+        self.suppressed_count = 0
+        self.lock = threading.Lock()
+
+    def key(self, notification):
+        fields = self.key_fields.get(notification['type'])
+        if fields is None:
+            fields = sorted(field for field in notification if field not in ('userId', 'type'))
+        payload_key = tuple((field, repr(notification.get(field))) for field in fields)
+        return (notification['userId'], notification['type'], payload_key)
+
+    def record(self, notification):
+        key = self.key(notification)
+        with self.lock:
+            self.recorded_count += 1
+            if key in self.notifications:
+                self.suppressed_count += 1
+            self.notifications[key] = notification
+
+    def pop_all(self):
+        "Returns a list of the notifications recorded since the last pop, in the order first recorded"
+        with self.lock:
+            notifications, self.notifications = list(self.notifications.values()), {}
+            return notifications
+
 
 class AppSyncClient:
+    """
+    Sends graphql requests to AppSync.
+
+    The http session, and so its connections, are kept between requests, as is the request signer until the
+    credentials it was built with are refreshed. Queries may be passed as text, in which case they are parsed
+    once and the parsed document, and the text printed from it, are re-used by later requests of the same query.
+
+    Requests that are throttled or fail server-side are retried with exponential backoff. Within
+    `deferred_sends`, requests are queued rather than sent, and are sent concurrently on `flush`.
+    Notifications fired within it are coalesced first, so duplicates are sent only once.
+    """
 
     service_name = 'appsync'
     headers = {
         'Accept': 'application/json',
         'Content-Type': 'application/json',
     }
+    timeout = 10  # seconds
+    batch_size = 50  # max mutations aliased into one request
+    max_in_flight = 10  # max concurrent requests when flushing queued requests
+    max_attempts = 4
+    retry_backoff = 0.1  # seconds before the first retry, doubled for each after that
+    retry_statuses = (429, 500, 502, 503, 504)
+    # fields of the payload that tell notifications of the same user & type apart when coalescing. Those of
+    # types that report a current state have none, or only what identifies the state, so the latest wins.
+    # Those of types not listed are told apart by all their fields, so only exact duplicates are coalesced.
+    notification_key_fields = {
+        'USER_CHATS_WITH_UNVIEWED_MESSAGES_COUNT_CHANGED': (),
+        'USER_FEED_CHANGED': (),
+        'USER_FOLLOWED_USERS_WITH_STORIES_CHANGED': ('followedUserId',),
+    }
 
     def __init__(self, appsync_graphql_url=APPSYNC_GRAPHQL_URL):
         self.appsync_graphql_url = appsync_graphql_url
+        self.aws_session = None
+        self.auth = None
+        self.auth_credentials = None
+        self.http_session = None
+        self.send_queue = None
+        self.notification_coalescer = None
+        self.send_queue_lock = threading.Lock()
+        # the session & signer are built lazily, and requests may be posted from many threads at once on flush
+        self.session_lock = threading.Lock()
 
     def fire_notification(self, user_id, notification_type, **extra):
-        mutation = gql.gql(
-            f'''
+        # the text, and so the parsed document, only varies with the set of extra fields
+        mutation = f'''
             mutation TriggerNotification ($input: NotificationInput!) {{
                 triggerNotification (input: $input) {{
                     userId
@@ -32,30 +131,209 @@ class AppSyncClient:
                 }}
             }}
         '''
-        )
         input_obj = {
             'userId': user_id,
             'type': notification_type,
             **extra,
         }
+        if self.notification_coalescer is not None:
+            self.notification_coalescer.record(input_obj)
+            return
         self.send(mutation, {'input': input_obj})
 
+    def fire_notifications(self, notifications):
+        """
+        Fire many notifications, each a dict of the fields of a NotificationInput, in as few requests as possible.
+        Returns a dict of {userId: errors} of those that failed.
+        """
+        if self.notification_coalescer is not None:
+            for notification in notifications:
+                self.notification_coalescer.record(notification)
+            return {}
+        return self._fire_notifications(notifications)
+
+    def _fire_notifications(self, notifications):
+        # the selection of each, userId & type and any extra fields, mirrors its input
+        return self.send_batch('triggerNotification', 'NotificationInput', notifications, ' '.join)
+
     def send(self, query, variables):
-        aws_session = boto3.session.Session()
-        creds = aws_session.get_credentials().get_frozen_credentials()
-        auth = requests_aws4auth.AWS4Auth(
-            creds.access_key,
-            creds.secret_key,
-            aws_session.region_name,
-            self.service_name,
-            session_token=creds.token,
-        )
-        transport = gql.transport.requests.RequestsHTTPTransport(
-            url=self.appsync_graphql_url,
-            use_json=True,
-            headers=self.headers,
-            auth=auth,
+        parsed = parse_document(query) if isinstance(query, str) else to_parsed_query(query)
+        return self.execute(parsed, variables, functools.partial(self.raise_errors, parsed.text, variables))
+
+    def send_batch(self, field, input_type, input_objs, selection):
+        """
+        Send a `field` mutation for each of `input_objs`, aliased so that up to `batch_size` of them go in one
+        request. The `selection` of each mutation may be given as text or as a function of its input.
+        Errors are mapped back to the mutations they came from, and a dict of {userId: errors} of the inputs
+        whose mutation failed is returned. The others have gone through regardless.
+        Within `deferred_sends`, failures are logged when flushed instead.
+        """
+        failures = collections.defaultdict(list)
+        input_objs = iter(input_objs)
+        while chunk := list(itertools.islice(input_objs, self.batch_size)):
+            for user_id, errors in (self.send_aliased(field, input_type, chunk, selection) or {}).items():
+                failures[user_id].extend(errors)
+        return dict(failures)
+
+    def send_aliased(self, field, input_type, input_objs, selection):
+        "Send one request of aliased mutations, return a dict of {userId: errors} of those that failed"
+        selections = [selection(input_obj) if callable(selection) else selection for input_obj in input_objs]
+        variable_defs = ', '.join(f'$input{i}: {input_type}!' for i in range(len(input_objs)))
+        mutations = ' '.join(f'n{i}: {field} (input: $input{i}) {{ {sel} }}' for i, sel in enumerate(selections))
+        query = f'mutation TriggerNotifications ({variable_defs}) {{ {mutations} }}'
+        variables = {f'input{i}': input_obj for i, input_obj in enumerate(input_objs)}
+        return self.execute(
+            parse_document(query), variables, functools.partial(self.map_alias_errors, field, input_objs)
         )
-        resp = transport.execute(query, variables)
-        if resp.errors:
-            raise Exception(f'Appsync resp error: `{resp.errors}` from query `{query}`, variables `{variables}`')
+
+    def raise_errors(self, query, variables, result):
+        if result.errors:
+            raise Exception(
+                f'Appsync resp error: `{result.errors}` from query `{query}`, variables `{variables}`'
+            )
+
+    def map_alias_errors(self, field, input_objs, result):
+        "Map the errors of a request of aliased mutations to the userId of the input of each mutation"
+        failures = collections.defaultdict(list)
+        for error in result.errors or []:
+            # errors of a mutation have its alias at the start of their path, others are of the whole request
+            alias = (error.get('path') or [None])[0]
+            if isinstance(alias, str) and alias[1:].isdigit() and int(alias[1:]) < len(input_objs):
+                failures[input_objs[int(alias[1:])]['userId']].append(error)
+            else:
+                for input_obj in input_objs:
+                    failures[input_obj['userId']].append(error)
+        if failures:
+            logger.warning(f'Appsync `{field}` mutations failed: `{dict(failures)}`')
+        return dict(failures)
+
+    def execute(self, parsed, variables, handle_result):
+        """
+        Send a request, and return what `handle_result` makes of its GraphQLResult.
+        Within `deferred_sends` the request is instead queued to be sent on `flush`, and None is returned.
+        """
+        with self.send_queue_lock:
+            if self.send_queue is not None:
+                self.send_queue.append((parsed, variables, handle_result))
+                return None
+        for attempt in range(self.max_attempts):
+            try:
+                return handle_result(self.post(parsed, variables))
+            except RetryableError as err:
+                if attempt == self.max_attempts - 1:
+                    raise Exception(f'Appsync request failed after {self.max_attempts} attempts: {err}') from err
+                time.sleep(self.retry_backoff * 2**attempt)
+
+    @contextlib.contextmanager
+    def deferred_sends(self):
+        """
+        Within this context, requests are queued rather than sent, and notifications are coalesced.
+        On exit, they're all flushed. Yields the NotificationCoalescer.
+        """
+        with self.send_queue_lock:
+            assert self.send_queue is None, 'Deferred sends may not be nested'
+            self.send_queue = []
+            self.notification_coalescer = NotificationCoalescer(key_fields=self.notification_key_fields)
+            coalescer = self.notification_coalescer
+        try:
+            yield coalescer
+        finally:
+            try:
+                self.flush()
+            finally:
+                with self.send_queue_lock:
+                    self.send_queue = None
+                    self.notification_coalescer = None
+
+    def flush(self):
+        """
+        Send all queued requests, up to `max_in_flight` at a time, and wait for them to complete. Failures
+        are logged rather than raised, as they are of callers that have since moved on. Returns a tuple of
+        (count of requests sent, count of those that failed).
+        """
+        if self.notification_coalescer is not None:
+            # queued as aliased requests, as send_queue is set whenever the coalescer is
+            self._fire_notifications(self.notification_coalescer.pop_all())
+        with self.send_queue_lock:
+            queued = self.send_queue or []
+            if self.send_queue is not None:
+                self.send_queue = []
+        if not queued:
+            return 0, 0
+        results = asyncio.run(self.send_concurrently(queued))
+        failed_count = sum(1 for result in results if isinstance(result, Exception))
+        return len(queued), failed_count
+
+    async def send_concurrently(self, queued):
+        "Returns a list aligned with `queued` of what each's result handler returned, or the exception raised"
+        loop = asyncio.get_running_loop()
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+
+        async def send_one(executor, parsed, variables, handle_result):
+            async with in_flight:
+                for attempt in range(self.max_attempts):
+                    try:
+                        return handle_result(await loop.run_in_executor(executor, self.post, parsed, variables))
+                    except RetryableError as err:
+                        if attempt == self.max_attempts - 1:
+                            logger.warning(f'Appsync request failed after {self.max_attempts} attempts: {err}')
+                            return err
+                        await asyncio.sleep(self.retry_backoff * 2**attempt)
+                    except Exception as err:
+                        logger.warning(f'Appsync request failed: {err}')
+                        return err
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            return await asyncio.gather(*(send_one(executor, *args) for args in queued))
+
+    def post(self, parsed, variables):
+        "Post one request, return its GraphQLResult. Raises RetryableError if it may succeed if tried again."
+        payload = {'query': parsed.text, 'variables': variables or {}}
+        try:
+            response = self.get_http_session().post(
+                self.appsync_graphql_url,
+                json=payload,
+                headers=self.headers,
+                auth=self.get_auth(),
+                timeout=self.timeout,
+            )
+        except (requests.ConnectionError, requests.Timeout) as err:
+            raise RetryableError(str(err)) from err
+        if response.status_code in self.retry_statuses:
+            raise RetryableError(f'Status {response.status_code}: {response.text}')
+        try:
+            result = response.json()
+        except ValueError:
+            result = None
+        if not isinstance(result, dict) or ('data' not in result and 'errors' not in result):
+            response.raise_for_status()
+            raise Exception(f'Appsync did not return a graphql result: {response.text}')
+        return GraphQLResult(data=result.get('data'), errors=result.get('errors'))
+
+    def get_auth(self):
+        "The request signer, rebuilt only if the credentials have changed since it was last built"
+        with self.session_lock:
+            if not self.aws_session:
+                self.aws_session = boto3.session.Session()
+            # refreshable credentials refresh themselves here if they're close to expiry
+            creds = self.aws_session.get_credentials().get_frozen_credentials()
+            if creds != self.auth_credentials:
+                self.auth = requests_aws4auth.AWS4Auth(
+                    creds.access_key,
+                    creds.secret_key,
+                    self.aws_session.region_name,
+                    self.service_name,
+                    session_token=creds.token,
+                )
+                self.auth_credentials = creds
+            return self.auth
+
+    def get_http_session(self):
+        with self.session_lock:
+            if not self.http_session:
+                http_session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.max_in_flight)
+                http_session.mount('https://', adapter)
+                http_session.mount('http://', adapter)
+                self.http_session = http_session
+            return self.http_session
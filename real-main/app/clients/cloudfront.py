@@ -1,7 +1,10 @@
 import base64
+import collections
 import json
 import os
+import threading
 import urllib
+import weakref
 
 import botocore
 import pendulum
@@ -13,14 +16,69 @@ from cryptography.hazmat.primitives.serialization import load_pem_private_key
 CLOUDFRONT_UPLOADS_DOMAIN = os.environ.get('CLOUDFRONT_UPLOADS_DOMAIN')
 
 
+class SignedUrlCache:
+    "A least-recently-used cache of signed urls, with counts of hits & misses"
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.urls = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        "Return the cached url, or None"
+        with self.lock:
+            url = self.urls.get(key)
+            if url is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.urls.move_to_end(key)
+            return url
+
+    def set(self, key, url):
+        with self.lock:
+            self.urls[key] = url
+            self.urls.move_to_end(key)
+            while len(self.urls) > self.max_size:
+                self.urls.popitem(last=False)
+
+    def pop_stats(self):
+        "Reset the counters, return them as they were before the reset. Cached urls are kept."
+        with self.lock:
+            stats = {'hits': self.hits, 'misses': self.misses}
+            self.hits = 0
+            self.misses = 0
+        return stats
+
+
 class CloudFrontClient:
 
     lifetime = pendulum.duration(hours=48)
 
-    def __init__(self, key_pair_getter, domain=CLOUDFRONT_UPLOADS_DOMAIN):
+    # expirations are rounded up to a multiple of this, so that urls signed for the same path within the same
+    # bucket are identical: they can be served from cache, both here and by browsers & CDNs
+    expires_at_bucket = pendulum.duration(hours=1)
+
+    url_cache_size = 10000
+    url_caching_clients = weakref.WeakSet()
+
+    def __init__(self, key_pair_getter, domain=CLOUDFRONT_UPLOADS_DOMAIN, url_cache_size=None):
         assert domain, "CloudFront domain is required"
         self.domain = domain
         self.key_pair_getter = key_pair_getter
+        self.url_cache = SignedUrlCache(self.url_cache_size if url_cache_size is None else url_cache_size)
+        self.url_caching_clients.add(self)
+
+    @classmethod
+    def pop_url_cache_stats(cls):
+        "Return the hit & miss counts of the signed url caches summed across all clients, and reset them"
+        stats = {'hits': 0, 'misses': 0}
+        for client in list(cls.url_caching_clients):
+            for name, count in client.url_cache.pop_stats().items():
+                stats[name] += count
+        return stats
 
     def get_key_pair(self):
         if not hasattr(self, '_key_pair'):
@@ -54,16 +112,53 @@ class CloudFrontClient:
     def generate_unsigned_url(self, path):
         return f'https://{self.domain}/{path}'
 
+    def get_expires_at(self, now=None):
+        "The expiration of anything signed now: at least `lifetime` away, rounded up to the next bucket"
+        now = now or pendulum.now('utc')
+        bucket_seconds = int(self.expires_at_bucket.total_seconds())
+        expires_at_seconds = now.int_timestamp + int(self.lifetime.total_seconds())
+        return pendulum.from_timestamp(-(-expires_at_seconds // bucket_seconds) * bucket_seconds)
+
     def generate_presigned_url(self, path, methods, expires_at=None):
         # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/cloudfront.html#examples
-        expires_at = expires_at or pendulum.now('utc') + self.lifetime
+        expires_at = expires_at or self.get_expires_at()
+        cache_key = (path, tuple(methods), expires_at.int_timestamp)
+        if signed_url := self.url_cache.get(cache_key):
+            return signed_url
+
         qs = urllib.parse.urlencode([('Method', m) for m in methods])
         url = f'https://{self.domain}/{path}?{qs}'
-        return self.get_cloudfront_signer().generate_presigned_url(url, date_less_than=expires_at)
+        signed_url = self.get_cloudfront_signer().generate_presigned_url(url, date_less_than=expires_at)
+        self.url_cache.set(cache_key, signed_url)
+        return signed_url
+
+    def generate_presigned_urls(self, path_prefix, filenames, expires_at=None):
+        """
+        Read-only urls of each of `filenames` under `path_prefix`, signed once between them with a custom
+        policy over a wildcard resource. Returns a list aligned with `filenames`.
+        """
+        if not filenames:
+            return []
+        expires_at = expires_at or self.get_expires_at()
+        cache_key = (path_prefix + '*', None, expires_at.int_timestamp)
+        if not (signed_qs := self.url_cache.get(cache_key)):
+            # the wildcard also matches any query string appended to a path, Method included,
+            # so the edge only allows reads for urls signed with a custom policy
+            policy = self.generate_cookie_policy(self.generate_unsigned_url(path_prefix + '*'), expires_at)
+            signature = self.get_private_key().sign(policy, PKCS1v15(), SHA1())
+            signed_qs = urllib.parse.urlencode(
+                [
+                    ('Policy', self._encode(policy)),
+                    ('Signature', self._encode(signature)),
+                    ('Key-Pair-Id', self.get_key_pair()['keyId']),
+                ]
+            )
+            self.url_cache.set(cache_key, signed_qs)
+        return [f'{self.generate_unsigned_url(path_prefix + filename)}?{signed_qs}' for filename in filenames]
 
     def generate_presigned_cookies(self, path, expires_at=None):
         # https://gist.github.com/mjohnsullivan/31064b04707923f82484c54981e4749e
-        expires_at = expires_at or pendulum.now('utc') + self.lifetime
+        expires_at = expires_at or self.get_expires_at()
         url = self.generate_unsigned_url(path)
         policy = self.generate_cookie_policy(url, expires_at)
         signature = self.get_private_key().sign(policy, PKCS1v15(), SHA1())
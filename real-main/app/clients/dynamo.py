@@ -1,23 +1,309 @@
 import base64
+import concurrent.futures
+import contextlib
+import contextvars
+import copy
+import itertools
 import json
 import logging
 import os
+import queue
+import random
 import re
+import threading
+import time
+import weakref
 
 import boto3
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
 
 DYNAMO_TABLE = os.environ.get('DYNAMO_TABLE')
 logger = logging.getLogger()
 
+# how often (in seconds) background readers that are ahead of their consumer check if they should stop
+QUEUE_POLL_INTERVAL = 0.1
+
+
+def put_unless_stopped(to_queue, value, stop):
+    "Put value on the queue, blocking while the queue is full. Gives up if `stop` is set. Returns if put."
+    while not stop.is_set():
+        try:
+            to_queue.put(value, timeout=QUEUE_POLL_INTERVAL)
+        except queue.Full:
+            continue
+        return True
+    return False
+
+
+def generate_prefetched(page_generator, prefetch_pages):
+    """
+    Return a generator that yields the pages of `page_generator`, which is run on a background thread
+    that keeps up to `prefetch_pages` pages buffered ahead of the consumer. Closing the returned generator,
+    for example by breaking out of a loop over it, stops the background thread.
+    """
+    pages = queue.Queue(maxsize=prefetch_pages)
+    stop = threading.Event()
+    done = object()
+
+    def prefetch():
+        try:
+            for page in page_generator:
+                if not put_unless_stopped(pages, (page, None), stop):
+                    return
+            put_unless_stopped(pages, (done, None), stop)
+        except Exception as err:
+            put_unless_stopped(pages, (None, err), stop)
+
+    thread = threading.Thread(target=contextvars.copy_context().run, args=(prefetch,), daemon=True)
+    thread.start()
+    try:
+        while True:
+            page, error = pages.get()
+            if error:
+                raise error
+            if page is done:
+                return
+            yield page
+    finally:
+        stop.set()
+        thread.join()
+
+
+class ItemCache(threading.local):
+    """
+    An identity map of items read from the table, keyed by (partitionKey, sortKey) & read consistency.
+    Items are copied going in and coming out, so callers are free to mutate what they get back.
+    Items that do not exist are cached too, as `None`.
+
+    Each thread sees its own cache, so threads processing different items never share cached reads.
+    """
+
+    def __init__(self):
+        self.items = {}
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        "Clear all cached items and reset the counters, return the counters as they were before the reset"
+        stats = {'hits': self.hits, 'misses': self.misses}
+        self.items.clear()
+        self.hits = 0
+        self.misses = 0
+        return stats
+
+    def get(self, key, strongly_consistent=False):
+        "Returns a tuple of (found, item)"
+        # a strongly consistent read can also serve requests for an eventually consistent read
+        consistencies = (True,) if strongly_consistent else (False, True)
+        for consistent in consistencies:
+            if (key, consistent) in self.items:
+                self.hits += 1
+                return True, copy.deepcopy(self.items[(key, consistent)])
+        self.misses += 1
+        return False, None
+
+    def set(self, key, item, strongly_consistent=False):
+        self.items[(key, strongly_consistent)] = copy.deepcopy(item)
+
+    def invalidate(self, key):
+        self.items.pop((key, False), None)
+        self.items.pop((key, True), None)
+
+
+class CapacityRateLimiter:
+    """
+    Paces requests so that consumed capacity units stay under a given rate, averaged over time.
+    Shared between threads: each caller waits its turn, then reports what its request consumed.
+    """
+
+    def __init__(self, capacity_units_per_second):
+        assert capacity_units_per_second > 0, 'Rate cap must be positive'
+        self.capacity_units_per_second = capacity_units_per_second
+        self.next_request_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            delay = self.next_request_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def consumed(self, capacity_units):
+        with self.lock:
+            start = max(self.next_request_at, time.monotonic())
+            self.next_request_at = start + capacity_units / self.capacity_units_per_second
+
+
+class ParallelScan:
+    """
+    A scan of the table split into `total_segments` segments, each scanned by its own thread.
+
+    Items may be consumed with either generator:
+        - `generate_unordered()` yields pages as soon as any segment returns them
+        - `generate_ordered()` yields pages round-robin by segment number, so for a given state of the
+          table the order of results is deterministic. Segments still scan ahead in the background.
+
+    Either way, each segment scans at most `prefetch_pages` pages ahead of the consumer.
+
+    At any point during consumption `resume_token` can be saved, and later passed back to
+    `DynamoClient.parallel_scan` to pick up where the consumer left off. Positions are tracked per
+    segment and per page, so after resuming items from a partially consumed page may be seen again.
+    """
+
+    def __init__(
+        self, client, scan_kwargs, total_segments, resume_token=None, rate_limiter=None, prefetch_pages=1
+    ):
+        self.client = client
+        self.scan_kwargs = scan_kwargs
+        self.total_segments = total_segments
+        self.rate_limiter = rate_limiter
+        self.prefetch_pages = prefetch_pages
+        # per segment, following the convention of `generate_all_scan`: False for not yet started,
+        # the ExclusiveStartKey to continue from, or None for a segment that is done
+        if resume_token:
+            state = client.decode_pagination_token(resume_token)
+            if state['totalSegments'] != total_segments:
+                raise Exception(f'Resume token is for {state["totalSegments"]} segments, not {total_segments}')
+            self.positions = state['positions']
+        else:
+            self.positions = [False] * total_segments
+
+    @property
+    def resume_token(self):
+        "A token to resume this scan from, or None if the consumer has seen every item of the scan"
+        if all(position is None for position in self.positions):
+            return None
+        state = {'totalSegments': self.total_segments, 'positions': self.positions}
+        return self.client.encode_pagination_token(state)
+
+    def generate_unordered(self):
+        "Return a generator that iterates over all results of the scan, in whatever order they arrive"
+        return self._generate(ordered=False)
+
+    def generate_ordered(self):
+        "Return a generator that iterates over all results of the scan, pages round-robin by segment"
+        return self._generate(ordered=True)
+
+    def _generate(self, ordered):
+        pending = [segment for segment, position in enumerate(self.positions) if position is not None]
+        if not pending:
+            return
+        if ordered:
+            queues = {segment: queue.Queue(maxsize=self.prefetch_pages) for segment in pending}
+        else:
+            shared_queue = queue.Queue(maxsize=self.prefetch_pages * len(pending))
+            queues = {segment: shared_queue for segment in pending}
+
+        stop = threading.Event()
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(pending))
+        try:
+            for segment in pending:
+                executor.submit(
+                    contextvars.copy_context().run,
+                    self._scan_segment,
+                    segment,
+                    self.positions[segment],
+                    queues[segment],
+                    stop,
+                )
+            segment_round = []
+            while pending:
+                if ordered:
+                    segment_round = segment_round or list(pending)
+                    page = queues[segment_round.pop(0)].get()
+                else:
+                    page = shared_queue.get()
+                segment, items, last_key, error = page
+                if error:
+                    raise error
+                yield from items
+                # the consumer has asked for more, so it is done with this page
+                self.positions[segment] = last_key
+                if last_key is None:
+                    pending.remove(segment)
+        finally:
+            stop.set()
+            executor.shutdown(wait=True)
+
+    def _scan_segment(self, segment, last_key, pages, stop):
+        try:
+            while last_key is not None and not stop.is_set():
+                start_kwargs = {'ExclusiveStartKey': last_key} if last_key else {}
+                if self.rate_limiter:
+                    self.rate_limiter.wait()
+                resp = self.client.table.scan(
+                    **self.scan_kwargs,
+                    **start_kwargs,
+                    Segment=segment,
+                    TotalSegments=self.total_segments,
+                    ReturnConsumedCapacity='TOTAL',
+                )
+                if self.rate_limiter:
+                    self.rate_limiter.consumed(resp.get('ConsumedCapacity', {}).get('CapacityUnits', 0))
+                last_key = resp.get('LastEvaluatedKey')
+                put_unless_stopped(pages, (segment, resp['Items'], last_key, None), stop)
+        except Exception as err:
+            put_unless_stopped(pages, (segment, [], last_key, err), stop)
+
+
+class CounterBuffer:
+    """
+    Changes to counters, recorded in order per item and attribute, so they can be applied later
+    with a single update per item. Safe to share between threads.
+    """
+
+    def __init__(self):
+        self.items = {}
+        self.recorded_count = 0
+        self.update_count = 0
+        self.lock = threading.Lock()
+
+    def record(self, cache_key, key, attribute_name, delta):
+        with self.lock:
+            _, deltas = self.items.setdefault(cache_key, (key, {}))
+            deltas.setdefault(attribute_name, []).append(delta)
+            self.recorded_count += 1
+
+    def pop(self, cache_key):
+        "Returns a tuple of (key, {attribute_name: [delta, ...]}) or None. Each item popped counts as an update."
+        with self.lock:
+            popped = self.items.pop(cache_key, None)
+            if popped:
+                self.update_count += 1
+            return popped
+
 
 class DynamoClient:
-    def __init__(self, table_name=DYNAMO_TABLE, create_table_schema=None):
+
+    # all clients with item caching enabled, so handlers can clear them between invocations
+    item_caching_clients = weakref.WeakSet()
+
+    # dynamo's limits on number of keys in a single BatchGetItem and BatchWriteItem request
+    batch_get_chunk_size = 100
+    batch_get_max_workers = 8
+    batch_write_chunk_size = 25
+    batch_write_max_workers = 8
+    # retrying of UnprocessedKeys & UnprocessedItems, with jittered exponential backoff (in seconds)
+    batch_max_attempts = 8
+    batch_backoff_base = 0.05
+    batch_backoff_cap = 2
+
+    def __init__(self, table_name=DYNAMO_TABLE, create_table_schema=None, cache_items=False):
         """
         If create_table_schema is not None, then the table will be created
         on-the-fly. Useful when testing with a mocked dynamodb backend.
+
+        If cache_items is True, then results of `get_item` and `get_typed_item` will
+        be cached until the next call to `clear_item_caches`. Writes through this client
+        keep the cache up to date.
         """
         assert table_name, "Table name is required"
         self.table_name = table_name
+        self.item_cache = ItemCache() if cache_items else None
+        self.typed_item_cache = ItemCache() if cache_items else None
+        if cache_items:
+            self.item_caching_clients.add(self)
+        self.counter_buffer = None
 
         boto3_resource = boto3.resource('dynamodb')
 
@@ -29,6 +315,35 @@ class DynamoClient:
         self.boto3_client = boto3.client('dynamodb')
         self.exceptions = self.boto3_client.exceptions
 
+    @classmethod
+    def clear_item_caches(cls):
+        "Clear the item caches of all clients, return the hit & miss counts summed across those caches"
+        stats = {'hits': 0, 'misses': 0}
+        for client in list(cls.item_caching_clients):
+            for cache in (client.item_cache, client.typed_item_cache):
+                for name, count in cache.clear().items():
+                    stats[name] += count
+        return stats
+
+    def cache_key(self, pk):
+        "From a plain or typed primary key to a key for the item cache. None if the pk is not cacheable"
+        values = [pk.get('partitionKey'), pk.get('sortKey')]
+        values = [value.get('S') if isinstance(value, dict) else value for value in values]
+        return tuple(values) if all(isinstance(value, str) for value in values) else None
+
+    def invalidate_cached_item(self, pk):
+        if self.item_cache is None:
+            return
+        if key := self.cache_key(pk):
+            self.item_cache.invalidate(key)
+            self.typed_item_cache.invalidate(key)
+
+    def refresh_cached_item(self, pk, item):
+        "Record the result of a write to an item, as returned by dynamo"
+        self.invalidate_cached_item(pk)
+        if self.item_cache is not None and item is not None and (key := self.cache_key(pk)):
+            self.item_cache.set(key, item)
+
     def add_item(self, query_kwargs):
         "Put an item and return what was putted"
         # ensure query fails if the item already exists
@@ -36,35 +351,134 @@ class DynamoClient:
         if 'ConditionExpression' in query_kwargs:
             cond_exp += ' and (' + query_kwargs['ConditionExpression'] + ')'
         query_kwargs['ConditionExpression'] = cond_exp
+        self.flush_counts(query_kwargs['Item'])
+        self.invalidate_cached_item(query_kwargs['Item'])
         self.table.put_item(**query_kwargs)
         return query_kwargs.get('Item')
 
     def get_item(self, pk, **kwargs):
         "Get an item by its primary key"
-        return self.table.get_item(Key=pk, **kwargs).get('Item')
+        return self._get_item(self.item_cache, self._get_item_uncached, pk, **kwargs)
 
     def get_typed_item(self, typed_pk, **kwargs):
         "Get an typed version of the item by its typed primary key"
+        return self._get_item(self.typed_item_cache, self._get_typed_item_uncached, typed_pk, **kwargs)
+
+    def _get_item_uncached(self, pk, **kwargs):
+        return self.table.get_item(Key=pk, **kwargs).get('Item')
+
+    def _get_typed_item_uncached(self, typed_pk, **kwargs):
         return self.boto3_client.get_item(Key=typed_pk, TableName=self.table_name, **kwargs).get('Item')
 
-    def batch_get_items(self, typed_keys, projection_expression=None):
+    def _get_item(self, cache, getter, pk, **kwargs):
+        # only plain reads of whole items are cached, ie no projections
+        key = self.cache_key(pk) if cache is not None and set(kwargs) <= {'ConsistentRead'} else None
+        if not key:
+            return getter(pk, **kwargs)
+        strongly_consistent = bool(kwargs.get('ConsistentRead'))
+        found, item = cache.get(key, strongly_consistent=strongly_consistent)
+        if not found:
+            item = getter(pk, **kwargs)
+            cache.set(key, item, strongly_consistent=strongly_consistent)
+        return item
+
+    def batch_get_items(self, keys, projection_expression=None):
         """
-        Get a bunch of items in one batch request.
-        Both the input `typed_keys` and the return value should/will be in
-        verbose format, with types.
-        Order *not* maintained.
+        Get a bunch of items by their primary keys, in as many batch requests as needed.
+        Returns a list of items aligned with `keys`, with None for items that do not exist.
+        Duplicate keys are only fetched once. Projections always include the key attributes.
         """
-        assert len(typed_keys) <= 100, "Max 100 items per batch get request"
-        kwargs = {'RequestItems': {self.table_name: {'Keys': typed_keys}}}
+        return self._batch_get_items(keys, projection_expression=projection_expression, typed=False)
+
+    def batch_get_typed_items(self, typed_keys, projection_expression=None):
+        "Same as `batch_get_items`, but both the keys and the returned items are in verbose format, with types"
+        return self._batch_get_items(typed_keys, projection_expression=projection_expression, typed=True)
+
+    def _batch_get_items(self, keys, projection_expression=None, typed=False):
+        if not keys:
+            return []
+        serialize = TypeSerializer().serialize
+        deserialize = TypeDeserializer().deserialize
+        typed_keys = keys if typed else [{k: serialize(v) for k, v in key.items()} for key in keys]
+        key_ids = [json.dumps(typed_key, sort_keys=True) for typed_key in typed_keys]
+        key_names = list(typed_keys[0].keys())
+
+        # only plain reads of whole items are cached, ie no projections
+        cache = self.typed_item_cache if typed else self.item_cache
+        cache = cache if projection_expression is None else None
+
+        items, to_fetch = {}, {}
+        for key_id, typed_key in zip(key_ids, typed_keys):
+            if key_id in items or key_id in to_fetch:
+                continue
+            cache_key = self.cache_key(typed_key) if cache is not None else None
+            found, item = cache.get(cache_key) if cache_key else (False, None)
+            if found:
+                items[key_id] = item
+            else:
+                to_fetch[key_id] = typed_key
+
+        if projection_expression:
+            projected_names = {name.strip() for name in projection_expression.split(',')}
+            missing_names = [name for name in key_names if name not in projected_names]
+            projection_expression = ', '.join([projection_expression, *missing_names])
+
+        fetch_keys = list(to_fetch.values())
+        chunks = [
+            fetch_keys[i : i + self.batch_get_chunk_size]
+            for i in range(0, len(fetch_keys), self.batch_get_chunk_size)
+        ]
+        if len(chunks) > 1:
+            max_workers = min(len(chunks), self.batch_get_max_workers)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [
+                    executor.submit(
+                        contextvars.copy_context().run, self._batch_get_chunk, chunk, projection_expression
+                    )
+                    for chunk in chunks
+                ]
+                chunk_results = [future.result() for future in futures]
+        else:
+            chunk_results = [self._batch_get_chunk(chunk, projection_expression) for chunk in chunks]
+
+        fetched = {}
+        for typed_item in (typed_item for chunk_result in chunk_results for typed_item in chunk_result):
+            key_id = json.dumps({name: typed_item[name] for name in key_names}, sort_keys=True)
+            fetched[key_id] = typed_item if typed else {k: deserialize(v) for k, v in typed_item.items()}
+
+        for key_id, typed_key in to_fetch.items():
+            items[key_id] = fetched.get(key_id)
+            if cache is not None and (cache_key := self.cache_key(typed_key)):
+                cache.set(cache_key, items[key_id])
+        return [items[key_id] for key_id in key_ids]
+
+    def _batch_get_chunk(self, typed_keys, projection_expression=None):
+        "Get a chunk of at most 100 items, retrying any unprocessed keys. Returns typed items in no order"
+        request = {'Keys': typed_keys}
         if projection_expression:
-            kwargs['RequestItems'][self.table_name]['ProjectionExpression'] = projection_expression
-        return self.boto3_client.batch_get_item(**kwargs)['Responses'][self.table_name]
+            request['ProjectionExpression'] = projection_expression
+        typed_items = []
+        for attempt in range(self.batch_max_attempts):
+            if attempt:
+                self.batch_backoff(attempt)
+            resp = self.boto3_client.batch_get_item(RequestItems={self.table_name: request})
+            typed_items.extend(resp['Responses'].get(self.table_name, []))
+            request = resp.get('UnprocessedKeys', {}).get(self.table_name)
+            if not request:
+                return typed_items
+        msg = f'Unable to batch get {len(request["Keys"])} items after {self.batch_max_attempts} attempts'
+        raise Exception(msg)
+
+    def batch_backoff(self, attempt):
+        backoff = min(self.batch_backoff_cap, self.batch_backoff_base * 2 ** attempt)
+        time.sleep(random.uniform(0, backoff))
 
     def update_item(self, query_kwargs, failure_warning=None):
         """
         Update an item and return the new item.
         Set `failure_warning` fail softly with a logged warning rather than raise an exception.
         """
+        self.flush_counts(query_kwargs['Key'])
         # ensure query fails if the item does not exist
         cond_exp = 'attribute_exists(partitionKey)'
         if 'ConditionExpression' in query_kwargs:
@@ -72,11 +486,15 @@ class DynamoClient:
         query_kwargs['ConditionExpression'] = cond_exp
         query_kwargs['ReturnValues'] = 'ALL_NEW'
         try:
-            return self.table.update_item(**query_kwargs).get('Attributes')
+            item = self.table.update_item(**query_kwargs).get('Attributes')
         except self.exceptions.ConditionalCheckFailedException:
+            self.invalidate_cached_item(query_kwargs['Key'])
             if failure_warning is None:
                 raise
             logger.warning(failure_warning)
+        else:
+            self.refresh_cached_item(query_kwargs['Key'], item)
+            return item
 
     def set_attributes(self, key, **attributes):
         """
@@ -84,50 +502,130 @@ class DynamoClient:
         If the item does not exist, create it.
         """
         assert attributes, 'Must provide at least one attribute to set'
+        self.flush_counts(key)
         kwargs = {
             'Key': key,
             'UpdateExpression': 'SET ' + ', '.join([f'{k} = :{k}' for k in attributes.keys()]),
             'ExpressionAttributeValues': {f':{k}': v for k, v in attributes.items()},
             'ReturnValues': 'ALL_NEW',
         }
-        return self.table.update_item(**kwargs).get('Attributes')
+        item = self.table.update_item(**kwargs).get('Attributes')
+        self.refresh_cached_item(key, item)
+        return item
 
-    def increment_count(self, key, attribute_name):
-        "Best-effort attempt to increment a counter. Logs a WARNING upon failure."
-        query_kwargs = {
-            'Key': key,
-            'UpdateExpression': 'ADD #attrName :one',
-            'ExpressionAttributeNames': {'#attrName': attribute_name},
-            'ExpressionAttributeValues': {':one': 1},
-            'ConditionExpression': 'attribute_exists(partitionKey)',
-        }
-        failure_warning = f'Failed to increment {attribute_name} for key `{key}`'
+    def increment_count(self, key, attribute_name, defer=True):
+        """
+        Best-effort attempt to increment a counter. Logs a WARNING upon failure.
+        Inside `buffered_counts`, the increment is deferred unless `defer` is False.
+        """
+        return self._change_count(key, attribute_name, 1, defer=defer)
+
+    def decrement_count(self, key, attribute_name, defer=True):
+        """
+        Best-effort attempt to decrement a counter, without going below zero. Logs a WARNING upon failure.
+        Inside `buffered_counts`, the decrement is deferred unless `defer` is False.
+        """
+        return self._change_count(key, attribute_name, -1, defer=defer)
+
+    def _change_count(self, key, attribute_name, delta, defer=True):
+        cache_key = self.cache_key(key) if defer and self.counter_buffer is not None else None
+        if cache_key is None:
+            return self._change_count_now(key, attribute_name, delta)
+        self.counter_buffer.record(cache_key, key, attribute_name, delta)
+        return None
+
+    def _change_count_now(self, key, attribute_name, delta):
+        if delta > 0:
+            query_kwargs = {
+                'Key': key,
+                'UpdateExpression': 'ADD #attrName :one',
+                'ExpressionAttributeNames': {'#attrName': attribute_name},
+                'ExpressionAttributeValues': {':one': 1},
+                'ConditionExpression': 'attribute_exists(partitionKey)',
+            }
+            failure_warning = f'Failed to increment {attribute_name} for key `{key}`'
+        else:
+            query_kwargs = {
+                'Key': key,
+                'UpdateExpression': 'ADD #attrName :neg_one',
+                'ExpressionAttributeNames': {'#attrName': attribute_name},
+                'ExpressionAttributeValues': {':neg_one': -1, ':zero': 0},
+                'ConditionExpression': 'attribute_exists(partitionKey) AND #attrName > :zero',
+            }
+            failure_warning = f'Failed to decrement {attribute_name} for key `{key}`'
         return self.update_item(query_kwargs, failure_warning=failure_warning)
 
-    def decrement_count(self, key, attribute_name):
-        "Best-effort attempt to decrement a counter. Logs a WARNING upon failure."
+    @contextlib.contextmanager
+    def buffered_counts(self):
+        """
+        Within this context, changes to counters are recorded rather than applied. On exit, the net change
+        to each item's counters is applied with a single update per item. Yields the CounterBuffer.
+        """
+        assert self.counter_buffer is None, 'Buffered counts may not be nested'
+        self.counter_buffer = CounterBuffer()
+        try:
+            yield self.counter_buffer
+        finally:
+            try:
+                for cache_key in list(self.counter_buffer.items.keys()):
+                    self._flush_counts(cache_key)
+            finally:
+                self.counter_buffer = None
+
+    def flush_counts(self, key):
+        "Apply any buffered changes to counters of the item with the given key. Called before any other write."
+        if self.counter_buffer is not None and (cache_key := self.cache_key(key)):
+            self._flush_counts(cache_key)
+
+    def _flush_counts(self, cache_key):
+        popped = self.counter_buffer.pop(cache_key)
+        if not popped:
+            return
+        key, deltas = popped
+
+        # Each decrement only goes through if the counter is positive beforehand. For all of them to go
+        # through, the counter must start at least as high as the lowest point the running total reaches.
+        names, values, adds, conditions = {}, {}, [], []
+        for i, (attribute_name, attribute_deltas) in enumerate(deltas.items()):
+            names[f'#a{i}'] = attribute_name
+            values[f':a{i}'] = sum(attribute_deltas)
+            adds.append(f'#a{i} :a{i}')
+            lowest = min(itertools.accumulate(attribute_deltas))
+            if lowest < 0:
+                values[f':a{i}min'] = -lowest
+                conditions.append(f'#a{i} >= :a{i}min')
         query_kwargs = {
             'Key': key,
-            'UpdateExpression': 'ADD #attrName :neg_one',
-            'ExpressionAttributeNames': {'#attrName': attribute_name},
-            'ExpressionAttributeValues': {':neg_one': -1, ':zero': 0},
-            'ConditionExpression': 'attribute_exists(partitionKey) AND #attrName > :zero',
+            'UpdateExpression': 'ADD ' + ', '.join(adds),
+            'ExpressionAttributeNames': names,
+            'ExpressionAttributeValues': values,
         }
-        failure_warning = f'Failed to decrement {attribute_name} for key `{key}`'
-        return self.update_item(query_kwargs, failure_warning=failure_warning)
+        if conditions:
+            query_kwargs['ConditionExpression'] = ' AND '.join(conditions)
+        try:
+            self.update_item(query_kwargs)
+        except self.exceptions.ConditionalCheckFailedException:
+            # some of the changes would have failed, so play them back one at a time to find out which
+            for attribute_name, attribute_deltas in deltas.items():
+                for delta in attribute_deltas:
+                    self._change_count_now(key, attribute_name, delta)
 
     def batch_put_items(self, generator):
-        "Batch put the items yielded by `generator`. Returns count of how many puts requested."
-        cnt = 0
-        with self.table.batch_writer() as batch:
+        "Batch put the items yielded by `generator`. Returns count of how many items were put."
+
+        def generate_requests():
             for item in generator:
-                batch.put_item(Item=item)
-                cnt += 1
-        return cnt
+                self.flush_counts(item)
+                self.invalidate_cached_item(item)
+                yield {'PutRequest': {'Item': item}}
+
+        return self.batch_write(generate_requests())
 
     def delete_item(self, pk, **kwargs):
         "Delete an item and return what was deleted"
         return_values = kwargs.pop('ReturnValues', 'ALL_OLD')
+        self.flush_counts(pk)
+        self.invalidate_cached_item(pk)
         # return None if nothing was deleted, rather than an empty dict
         return self.table.delete_item(Key=pk, ReturnValues=return_values, **kwargs).get('Attributes') or None
 
@@ -137,13 +635,67 @@ class DynamoClient:
         return self.batch_delete(key_generator)
 
     def batch_delete(self, key_generator):
-        "Batch delete items by keys yielded by `generator`. Returns count of how many deletes requested."
-        cnt = 0
-        with self.table.batch_writer() as batch:
+        "Batch delete items by keys yielded by `generator`. Returns count of how many items were deleted."
+
+        def generate_requests():
             for key in key_generator:
-                batch.delete_item(Key=key)
-                cnt += 1
-        return cnt
+                self.flush_counts(key)
+                self.invalidate_cached_item(key)
+                yield {'DeleteRequest': {'Key': key}}
+
+        return self.batch_write(generate_requests())
+
+    def batch_write(self, request_generator):
+        """
+        Write the PutRequests & DeleteRequests yielded by `request_generator` using BatchWriteItem,
+        with chunks of requests spread over a pool of worker threads. The generator is consumed as a
+        stream: chunks are only pulled from it as workers free up, so memory use stays bounded.
+        Returns count of how many requests were written, raises if any could not be written.
+        """
+        chunks = iter(lambda: list(itertools.islice(request_generator, self.batch_write_chunk_size)), [])
+        first_chunk, second_chunk = next(chunks, None), next(chunks, None)
+        if second_chunk is None:
+            # don't bother with threads for the common case of a small write
+            written, failed = self._batch_write_chunk(first_chunk) if first_chunk else (0, 0)
+        else:
+            written, failed = self._batch_write_chunks(itertools.chain([first_chunk, second_chunk], chunks))
+        if failed:
+            raise Exception(f'Unable to batch write {failed} items after {self.batch_max_attempts} attempts')
+        return written
+
+    def _batch_write_chunks(self, chunks):
+        written, failed = 0, 0
+        # backpressure: at most two chunks per worker are pulled from the input but not yet written
+        in_flight = threading.BoundedSemaphore(self.batch_write_max_workers * 2)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.batch_write_max_workers) as executor:
+            futures = set()
+            for chunk in chunks:
+                in_flight.acquire()
+                future = executor.submit(contextvars.copy_context().run, self._batch_write_chunk, chunk)
+                future.add_done_callback(lambda _: in_flight.release())
+                futures.add(future)
+                done = {future for future in futures if future.done()}
+                for future in done:
+                    chunk_written, chunk_failed = future.result()
+                    written, failed = written + chunk_written, failed + chunk_failed
+                futures -= done
+            for future in concurrent.futures.as_completed(futures):
+                chunk_written, chunk_failed = future.result()
+                written, failed = written + chunk_written, failed + chunk_failed
+        return written, failed
+
+    def _batch_write_chunk(self, requests):
+        "Write a chunk of at most 25 requests, retrying any unprocessed items. Returns (written, failed) counts"
+        client, count = self.table.meta.client, len(requests)
+        for attempt in range(self.batch_max_attempts):
+            if attempt:
+                self.batch_backoff(attempt)
+            resp = client.batch_write_item(RequestItems={self.table_name: requests})
+            unprocessed = resp.get('UnprocessedItems', {}).get(self.table_name, [])
+            if not unprocessed:
+                return count, 0
+            requests = unprocessed
+        return count - len(unprocessed), len(unprocessed)
 
     def encode_pagination_token(self, last_evaluated_key):
         "From a LastEvaluatedKey to a obfucated string"
@@ -176,25 +728,70 @@ class DynamoClient:
         resp = self.table.query(**query_kwargs)
         return resp['Items'][0] if resp['Items'] else None
 
-    def generate_all_query(self, query_kwargs):
-        "Return a generator that iterates over all results of the query"
-        last_key = False
-        while last_key is not None:
-            start_kwargs = {'ExclusiveStartKey': last_key} if last_key else {}
-            resp = self.table.query(**query_kwargs, **start_kwargs)
-            for item in resp['Items']:
-                yield item
-            last_key = resp.get('LastEvaluatedKey')
-
-    def generate_all_scan(self, scan_kwargs):
-        "Return a generator that iterates over all results of the scan"
-        last_key = False
-        while last_key is not None:
-            start_kwargs = {'ExclusiveStartKey': last_key} if last_key else {}
-            resp = self.table.scan(**scan_kwargs, **start_kwargs)
-            for item in resp['Items']:
-                yield item
-            last_key = resp.get('LastEvaluatedKey')
+    def generate_all_query(self, query_kwargs, prefetch_pages=0):
+        """
+        Return a generator that iterates over all results of the query.
+        If prefetch_pages is given, up to that many pages are read ahead of the consumer on a background thread.
+        """
+        with contextlib.closing(self.generate_pages(self.table.query, query_kwargs, prefetch_pages)) as pages:
+            for page in pages:
+                yield from page
+
+    def generate_all_scan(self, scan_kwargs, total_segments=None, prefetch_pages=0):
+        """
+        Return a generator that iterates over all results of the scan.
+        If total_segments is given, the scan is done in parallel and results arrive in no particular order.
+        If prefetch_pages is given, up to that many pages are read ahead of the consumer on background threads.
+        """
+        if total_segments:
+            scan = self.parallel_scan(
+                scan_kwargs, total_segments=total_segments, prefetch_pages=prefetch_pages or 1
+            )
+            return scan.generate_unordered()
+        return self._generate_all_scan(scan_kwargs, prefetch_pages)
+
+    def _generate_all_scan(self, scan_kwargs, prefetch_pages):
+        with contextlib.closing(self.generate_pages(self.table.scan, scan_kwargs, prefetch_pages)) as pages:
+            for page in pages:
+                yield from page
+
+    def generate_pages(self, operation, kwargs, prefetch_pages=0):
+        "Return a generator of pages of items from calling `operation` (table.query or table.scan) until done"
+
+        def generate():
+            last_key = False
+            while last_key is not None:
+                start_kwargs = {'ExclusiveStartKey': last_key} if last_key else {}
+                resp = operation(**kwargs, **start_kwargs)
+                yield resp['Items']
+                last_key = resp.get('LastEvaluatedKey')
+
+        return generate_prefetched(generate(), prefetch_pages) if prefetch_pages else generate()
+
+    def parallel_scan(
+        self,
+        scan_kwargs,
+        total_segments=4,
+        resume_token=None,
+        max_capacity_units_per_second=None,
+        prefetch_pages=1,
+    ):
+        """
+        Prepare a scan split over `total_segments` threads, see ParallelScan.
+        If max_capacity_units_per_second is given, requests across all segments are paced so the
+        scan doesn't starve other traffic of the table's read capacity.
+        """
+        rate_limiter = (
+            CapacityRateLimiter(max_capacity_units_per_second) if max_capacity_units_per_second else None
+        )
+        return ParallelScan(
+            self,
+            scan_kwargs,
+            total_segments,
+            resume_token=resume_token,
+            rate_limiter=rate_limiter,
+            prefetch_pages=prefetch_pages,
+        )
 
     def transact_write_items(self, transact_items, transact_exceptions=None):
         """
@@ -213,7 +810,10 @@ class DynamoClient:
             assert len(transact_items) == len(transact_exceptions)
 
         for ti in transact_items:
-            list(ti.values()).pop()['TableName'] = self.table_name
+            write = list(ti.values()).pop()
+            write['TableName'] = self.table_name
+            self.flush_counts(write.get('Key') or write.get('Item') or {})
+            self.invalidate_cached_item(write.get('Key') or write.get('Item') or {})
 
         try:
             self.boto3_client.transact_write_items(TransactItems=transact_items)
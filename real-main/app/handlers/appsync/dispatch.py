@@ -2,7 +2,8 @@
 import logging
 import os
 
-from app.logging import LogLevelContext, handler_logging
+from app.clients import CloudFrontClient, DynamoClient
+from app.logging import LogLevelContext, handler_logging, log_embedded_metrics
 
 from . import routes
 from .exceptions import ClientException
@@ -36,24 +37,91 @@ def get_gql_details(event):
 
 
 def event_to_extras(event):
-    client = get_client_details(event)
-    gql = get_gql_details(event)
+    # a BatchInvoke sends a list of events, all from resolving the same field for the same request
+    events = event if isinstance(event, list) else [event]
+    client = get_client_details(events[0]) if events else {}
+    gql = get_gql_details(events[0]) if events else {}
+    if isinstance(event, list):
+        gql['batchSize'] = len(events)
     return {'gq': gql, 'client': client}
 
 
+def log_item_cache_stats(field):
+    stats = DynamoClient.clear_item_caches()
+    if stats['hits'] or stats['misses']:
+        with LogLevelContext(logger, logging.INFO):
+            logger.info(f'Dynamo item cache for `{field}`: {stats["hits"]} hits, {stats["misses"]} misses')
+
+
+def log_signed_url_cache_stats(field):
+    stats = CloudFrontClient.pop_url_cache_stats()
+    if stats['hits'] or stats['misses']:
+        hit_rate = 100 * stats['hits'] / (stats['hits'] + stats['misses'])
+        metrics = {
+            'SignedUrlCacheHits': (stats['hits'], 'Count'),
+            'SignedUrlCacheMisses': (stats['misses'], 'Count'),
+            'SignedUrlCacheHitRate': (round(hit_rate, 1), 'Percent'),
+        }
+        # set by lambda
+        function_name = os.environ.get('AWS_LAMBDA_FUNCTION_NAME')
+        dimensions = {'FunctionName': function_name} if function_name else None
+        log_embedded_metrics(logger, 'REAL/AppSync', metrics, dimensions=dimensions, properties={'field': field})
+
+
+def client_error_response(err):
+    msg = 'ClientError: ' + str(err)
+    logger.warning(msg)
+    return {'error': {'message': msg, 'data': err.data, 'info': err.info}}
+
+
+def call_handler(handler, caller_user_id, arguments, source, **kwargs):
+    try:
+        # Once support for direct-to-lambda resolvers lands, would be good to simplify this interface
+        # to match that. https://github.com/sid88in/serverless-appsync-plugin/pull/350
+        resp = handler(caller_user_id, arguments, source=source, **kwargs)
+    except ClientException as err:
+        return client_error_response(err)
+    return {'success': resp}
+
+
+def call_batch_handler(batch_handler, caller_user_id, arguments, sources, **kwargs):
+    try:
+        resps = batch_handler(caller_user_id, arguments, sources, **kwargs)
+    except ClientException as err:
+        return [client_error_response(err)] * len(sources)
+    if len(resps) != len(sources):
+        raise Exception(f'Batch handler returned {len(resps)} results for {len(sources)} sources')
+    return [{'success': resp} for resp in resps]
+
+
 @handler_logging(event_to_extras=event_to_extras)
 def dispatch(event, context):
-    "Top-level dispatch of appsync event to the correct handler"
+    """
+    Top-level dispatch of appsync event to the correct handler.
+
+    Resolvers using the BatchInvoke operation send a list of events, for which a list of responses in the
+    same order is returned. Those are handed to the field's batch handler if it has one, otherwise to its
+    handler one at a time. Likewise, single events for a field with only a batch handler are handed to it
+    as a batch of one.
+
+    Handlers are also passed the `selection_set_list` of the field, the list of subfields the client
+    selected, so they can skip work on those that weren't. It's None if the resolver doesn't forward it.
+    """
+    events = event if isinstance(event, list) else [event]
+    if not events:
+        return []
+
     # it is a sin that python has no dictionary destructing asignment
-    client = get_client_details(event)
-    gql = get_gql_details(event)
+    # all events of a batch are from the same request, so share the caller & client
+    client = get_client_details(events[0])
+    gql = get_gql_details(events[0])
     field = gql.get('field')
     caller_user_id = gql.get('callerUserId')
-    arguments = gql.get('arguments')
-    source = gql.get('source')
+    kwargs = {'context': context, 'client': client, 'selection_set_list': events[0].get('selectionSetList')}
 
     handler = routes.get_handler(field)
-    if not handler:
+    batch_handler = routes.get_batch_handler(field)
+    if not handler and not batch_handler:
         # should not be able to get here
         msg = f'No handler for field `{field}` found'
         logger.exception(msg)
@@ -61,15 +129,22 @@ def dispatch(event, context):
 
     # we suppress INFO logging, except this message
     with LogLevelContext(logger, logging.INFO):
-        logger.info(f'Handling AppSync GQL resolution of `{field}`')
+        batch_msg = f' for a batch of {len(events)}' if isinstance(event, list) else ''
+        logger.info(f'Handling AppSync GQL resolution of `{field}`{batch_msg}')
 
+    # items cached by a previous invocation of this lambda container could be stale
+    DynamoClient.clear_item_caches()
     try:
-        # Once support for direct-to-lambda resolvers lands, would be good to simplify this interface
-        # to match that. https://github.com/sid88in/serverless-appsync-plugin/pull/350
-        resp = handler(caller_user_id, arguments, source=source, context=context, client=client)
-    except ClientException as err:
-        msg = 'ClientError: ' + str(err)
-        logger.warning(msg)
-        return {'error': {'message': msg, 'data': err.data, 'info': err.info}}
-
-    return {'success': resp}
+        if batch_handler:
+            arguments = [e['arguments'] for e in events]
+            sources = [e.get('source') for e in events]
+            resps = call_batch_handler(batch_handler, caller_user_id, arguments, sources, **kwargs)
+        else:
+            resps = [
+                call_handler(handler, caller_user_id, e['arguments'], e.get('source'), **kwargs) for e in events
+            ]
+    finally:
+        log_item_cache_stats(field)
+        log_signed_url_cache_stats(field)
+
+    return resps if isinstance(event, list) else resps[0]
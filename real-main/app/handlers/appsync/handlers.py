@@ -23,7 +23,6 @@ from app.models.post.enums import PostStatus, PostType
 from app.models.post.exceptions import PostException
 from app.models.user.enums import UserStatus
 from app.models.user.exceptions import UserException
-from app.utils import image_size
 
 from .. import xray
 from . import routes
@@ -42,7 +41,7 @@ clients = {
     'appsync': clients.AppSyncClient(),
     'cloudfront': clients.CloudFrontClient(secrets_manager_client.get_cloudfront_key_pair),
     'cognito': clients.CognitoClient(),
-    'dynamo': clients.DynamoClient(),
+    'dynamo': clients.DynamoClient(cache_items=True),
     'facebook': clients.FacebookClient(),
     'google': clients.GoogleClient(secrets_manager_client.get_google_client_ids),
     'pinpoint': clients.PinpointClient(),
@@ -379,19 +378,9 @@ def add_app_store_receipt(caller_user, arguments, **kwargs):
     return True
 
 
-@routes.register('User.photo')
-def user_photo(caller_user_id, arguments, source=None, **kwargs):
-    user = user_manager.init_user(source)
-    native_url = user.get_photo_url(image_size.NATIVE)
-    if not native_url:
-        return None
-    return {
-        'url': native_url,
-        'url64p': user.get_photo_url(image_size.P64),
-        'url480p': user.get_photo_url(image_size.P480),
-        'url1080p': user.get_photo_url(image_size.P1080),
-        'url4k': user.get_photo_url(image_size.K4),
-    }
+@routes.register_batch('User.photo')
+def user_photo(caller_user_id, arguments, sources, **kwargs):
+    return [user_manager.init_user(source).get_photo_urls() for source in sources]
 
 
 @routes.register('Mutation.followUser')
@@ -578,30 +567,23 @@ def add_post(caller_user, arguments, **kwargs):
     return post.serialize(caller_user.id)
 
 
-@routes.register('Post.image')
-def post_image(caller_user_id, arguments, source=None, **kwargs):
-    post = post_manager.get_post(source['postId'])
+@routes.register_batch('Post.image')
+def post_image(caller_user_id, arguments, sources, **kwargs):
+    def image(post):
+        if not post or post.status == PostStatus.DELETING:
+            return None
 
-    if not post or post.status == PostStatus.DELETING:
-        return None
+        if post.type == PostType.TEXT_ONLY:
+            return None
 
-    if post.type == PostType.TEXT_ONLY:
-        return None
+        if post.status not in (PostStatus.COMPLETED, PostStatus.ARCHIVED):
+            return None
 
-    if post.status not in (PostStatus.COMPLETED, PostStatus.ARCHIVED):
-        return None
+        image_item = post.image_item.copy() if post.image_item else {}
+        image_item.update(post.get_image_readonly_urls())
+        return image_item
 
-    image_item = post.image_item.copy() if post.image_item else {}
-    image_item.update(
-        {
-            'url': post.get_image_readonly_url(image_size.NATIVE),
-            'url64p': post.get_image_readonly_url(image_size.P64),
-            'url480p': post.get_image_readonly_url(image_size.P480),
-            'url1080p': post.get_image_readonly_url(image_size.P1080),
-            'url4k': post.get_image_readonly_url(image_size.K4),
-        }
-    )
-    return image_item
+    return [image(post) for post in post_manager.get_posts([source['postId'] for source in sources])]
 
 
 @routes.register('Post.imageUploadUrl')
@@ -619,18 +601,22 @@ def post_image_upload_url(caller_user_id, arguments, source=None, **kwargs):
     return post.get_image_writeonly_url()
 
 
-@routes.register('Post.video')
-def post_video(caller_user_id, arguments, source=None, **kwargs):
-    post = post_manager.get_post(source['postId'])
+@routes.register_batch('Post.video')
+def post_video(caller_user_id, arguments, sources, selection_set_list=None, **kwargs):
+    # signing the cookies is relatively expensive, so skip it unless they were asked for
+    with_cookies = selection_set_list is None or 'accessCookies' in selection_set_list
 
-    statuses = (PostStatus.COMPLETED, PostStatus.ARCHIVED)
-    if not post or post.type != PostType.VIDEO or post.status not in statuses:
-        return None
+    def video(post):
+        statuses = (PostStatus.COMPLETED, PostStatus.ARCHIVED)
+        if not post or post.type != PostType.VIDEO or post.status not in statuses:
+            return None
 
-    return {
-        'urlMasterM3U8': post.get_hls_master_m3u8_url(),
-        'accessCookies': post.get_hls_access_cookies(),
-    }
+        resp = {'urlMasterM3U8': post.get_hls_master_m3u8_url()}
+        if with_cookies:
+            resp['accessCookies'] = post.get_hls_access_cookies()
+        return resp
+
+    return [video(post) for post in post_manager.get_posts([source['postId'] for source in sources])]
 
 
 @routes.register('Post.videoUploadUrl')
@@ -980,18 +966,17 @@ def delete_card(caller_user, arguments, **kwargs):
     return card.serialize(caller_user.id)
 
 
-@routes.register('Card.thumbnail')
-def card_thumbnail(caller_user_id, arguments, source=None, **kwargs):
-    card = card_manager.get_card(source['cardId'])
-    if card and card.post and card.post.type != PostType.TEXT_ONLY:
-        return {
-            'url': card.post.get_image_readonly_url(image_size.NATIVE),
-            'url64p': card.post.get_image_readonly_url(image_size.P64),
-            'url480p': card.post.get_image_readonly_url(image_size.P480),
-            'url1080p': card.post.get_image_readonly_url(image_size.P1080),
-            'url4k': card.post.get_image_readonly_url(image_size.K4),
-        }
-    return None
+@routes.register_batch('Card.thumbnail')
+def card_thumbnail(caller_user_id, arguments, sources, **kwargs):
+    def thumbnail(post):
+        if post and post.type != PostType.TEXT_ONLY:
+            return post.get_image_readonly_urls()
+        return None
+
+    cards = card_manager.get_cards([source['cardId'] for source in sources])
+    post_ids = list(dict.fromkeys(card.post_id for card in cards if card and card.post_id))
+    posts = dict(zip(post_ids, post_manager.get_posts(post_ids)))
+    return [thumbnail(posts[card.post_id] if card and card.post_id else None) for card in cards]
 
 
 @routes.register('Mutation.addAlbum')
@@ -1057,16 +1042,9 @@ def delete_album(caller_user, arguments, **kwargs):
     return album.serialize(caller_user.id)
 
 
-@routes.register('Album.art')
-def album_art(caller_user_id, arguments, source=None, **kwargs):
-    album = album_manager.init_album(source)
-    return {
-        'url': album.get_art_image_url(image_size.NATIVE),
-        'url64p': album.get_art_image_url(image_size.P64),
-        'url480p': album.get_art_image_url(image_size.P480),
-        'url1080p': album.get_art_image_url(image_size.P1080),
-        'url4k': album.get_art_image_url(image_size.K4),
-    }
+@routes.register_batch('Album.art')
+def album_art(caller_user_id, arguments, sources, **kwargs):
+    return [album_manager.init_album(source).get_art_image_urls() for source in sources]
 
 
 @routes.register('Mutation.createDirectChat')
@@ -12,6 +12,9 @@ S3_UPLOADS_BUCKET = os.environ.get('S3_UPLOADS_BUCKET')
 USER_NOTIFICATIONS_ENABLED = os.environ.get('USER_NOTIFICATIONS_ENABLED')
 USER_NOTIFICATIONS_ONLY_USERNAMES = os.environ.get('USER_NOTIFICATIONS_ONLY_USERNAMES')
 
+# number of threads to split the daily full table scan for expired posts over
+EXPIRED_POSTS_SCAN_SEGMENTS = 8
+
 logger = logging.getLogger()
 xray.patch_all()
 
@@ -27,6 +30,9 @@ managers = {}
 appstore_manager = managers.get('appstore') or models.AppStoreManager(clients, managers=managers)
 album_manager = managers.get('album') or models.AlbumManager(clients, managers=managers)
 card_manager = managers.get('card') or models.CardManager(clients, managers=managers)
+cascade_manager = managers.get('cascade') or models.CascadeManager(clients, managers=managers)
+comment_manager = managers.get('comment') or models.CommentManager(clients, managers=managers)
+like_manager = managers.get('like') or models.LikeManager(clients, managers=managers)
 post_manager = managers.get('post') or models.PostManager(clients, managers=managers)
 user_manager = managers.get('user') or models.UserManager(clients, managers=managers)
 
@@ -67,7 +73,7 @@ def delete_recently_expired_posts(event, context):
 @handler_logging
 def delete_older_expired_posts(event, context):
     now = pendulum.now('utc')
-    post_manager.delete_older_expired_posts(now=now)
+    post_manager.delete_older_expired_posts(now=now, total_segments=EXPIRED_POSTS_SCAN_SEGMENTS)
 
 
 @handler_logging
@@ -92,6 +98,13 @@ def clear_expired_user_subscriptions(event, context):
         logger.info(f'Expired user subscriptions cleared: {cnt}')
 
 
+@handler_logging
+def resume_stalled_cascades(event, context):
+    cnt = cascade_manager.resume_stalled_jobs()
+    with LogLevelContext(logger, logging.INFO):
+        logger.info(f'Stalled cascades resumed: {cnt}')
+
+
 # TODO: enable to handle re-verification of apple receipts after temporary failures
 # @handler_logging
 # def verify_receipts(event, context):
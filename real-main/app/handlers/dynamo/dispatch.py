@@ -1,42 +1,448 @@
+import collections.abc
+import concurrent.futures
+import functools
+import itertools
 import logging
-from collections import defaultdict
+
+from boto3.dynamodb.types import DYNAMODB_CONTEXT, TypeDeserializer
 
 logger = logging.getLogger()
 
+# https://stackoverflow.com/a/46738251
+type_deserializer = TypeDeserializer()
+
+
+def deserialize(value):
+    """
+    Deserialize a value in dynamo's typed json format, as found in stream records.
+    The common types are handled directly, the rest are left to boto3's TypeDeserializer.
+    """
+    ((dynamo_type, inner),) = value.items()
+    if dynamo_type == 'S' or dynamo_type == 'BOOL':
+        return inner
+    if dynamo_type == 'N':
+        return DYNAMODB_CONTEXT.create_decimal(inner)
+    if dynamo_type == 'M':
+        return {k: deserialize(v) for k, v in inner.items()}
+    if dynamo_type == 'L':
+        return [deserialize(v) for v in inner]
+    return type_deserializer.deserialize(value)
+
+
+class LazyImage(collections.abc.Mapping):
+    """
+    A read-only view of an item image from a dynamo stream record, which deserializes each attribute
+    the first time it is accessed.
+    """
+
+    def __init__(self, typed_image):
+        self.typed_image = typed_image
+        self.deserialized = {}
+
+    def __getitem__(self, name):
+        if name not in self.deserialized:
+            self.deserialized[name] = deserialize(self.typed_image[name])
+        return self.deserialized[name]
+
+    def get(self, key, default=None):
+        return self[key] if key in self.typed_image else default
+
+    def to_dict(self):
+        "Return a fully deserialized copy of the image, as a dict"
+        deserialized = self.deserialized
+        return {k: deserialized[k] if k in deserialized else deserialize(v) for k, v in self.typed_image.items()}
+
+    def __contains__(self, name):
+        return name in self.typed_image
+
+    def __iter__(self):
+        return iter(self.typed_image)
+
+    def __len__(self):
+        return len(self.typed_image)
+
+
+class Route:
+    """
+    The listeners registered for one (pk_prefix, sk_prefix, event_name).
+
+    Each distinct (attribute name, default value) that any of the listeners filter on is assigned a bit,
+    and each listener is given a mask of the bits it is interested in. A listener with an empty mask has
+    no attribute filter. Which listeners match a given mask of changed conditions is memoized.
+
+    Listeners are also flagged as to whether they are safe to run concurrently with listeners
+    processing records of other partition keys.
+    """
+
+    def __init__(self):
+        self.conditions = []
+        self.listeners = []
+        self.matches_by_mask = {}
+
+    def add(self, handler, attributes, concurrency_safe=False):
+        mask = 0
+        for condition in (attributes or {}).items():
+            # defaults may be unhashable (ex: lists), so search by equality
+            if condition not in self.conditions:
+                self.conditions.append(condition)
+            mask |= 1 << self.conditions.index(condition)
+        self.listeners.append((handler, mask, concurrency_safe))
+        self.matches_by_mask.clear()
+
+    def changed_mask(self, old_item, new_item):
+        "Return a bitmask of which of the conditions have changed between the old & new items"
+        # images with identical typed values need not be deserialized to know they are unchanged
+        lazy = isinstance(old_item, LazyImage) and isinstance(new_item, LazyImage)
+        changed, bit = 0, 1
+        for attr_name, attr_default in self.conditions:
+            if lazy and old_item.typed_image.get(attr_name) == new_item.typed_image.get(attr_name):
+                pass
+            elif old_item.get(attr_name, attr_default) != new_item.get(attr_name, attr_default):
+                changed |= bit
+            bit <<= 1
+        return changed
+
+    def match(self, old_item, new_item, concurrency_safe=None):
+        "If `concurrency_safe` is not None, only listeners with that flag are matched"
+        return [
+            handler
+            for handler, safe in self.match_flagged(old_item, new_item)
+            if concurrency_safe in (None, safe)
+        ]
+
+    def match_flagged(self, old_item, new_item):
+        "Returns a list of (handler, concurrency_safe) of the matching listeners"
+        changed = self.changed_mask(old_item, new_item)
+        if (matches := self.matches_by_mask.get(changed)) is None:
+            matches = [(handler, safe) for handler, mask, safe in self.listeners if not mask or mask & changed]
+            self.matches_by_mask[changed] = matches
+        return list(matches)
+
+
+class ItemLoader:
+    """
+    A cache of the models listeners load by id, such as a related post or user, so that listeners sharing
+    the loader that need the same one share one fetch. Models are fetched with the batch getters registered
+    by kind with the dispatcher, and reflect the table as it was when first loaded.
+    """
+
+    def __init__(self, getters):
+        self.getters = getters
+        self.loaded = {}
+
+    def load(self, kind, item_id):
+        "Return the model of `kind` with `item_id`, or None if it does not exist"
+        return self.load_many(kind, [item_id])[0]
+
+    def load_many(self, kind, item_ids):
+        "Returns a list of models aligned with `item_ids`, with None for those that do not exist"
+        to_load = [item_id for item_id in dict.fromkeys(item_ids) if (kind, item_id) not in self.loaded]
+        if to_load:
+            self.loaded.update(zip([(kind, item_id) for item_id in to_load], self.getters[kind](to_load)))
+        return [self.loaded[(kind, item_id)] for item_id in item_ids]
+
+
+class StreamRecord:
+    """
+    What the listeners of one stream record share: models of the record's old & new items, each
+    initialized the first time it is accessed.
+    """
+
+    def __init__(self, item_id, old_item=None, new_item=None, init_model=None):
+        self.item_id = item_id
+        self.old_item = old_item
+        self.new_item = new_item
+        self.init_model = init_model
+
+    @property
+    def old_model(self):
+        if not hasattr(self, '_old_model'):
+            self._old_model = self.init_model(self.old_item) if self.old_item else None
+        return self._old_model
+
+    @property
+    def new_model(self):
+        if not hasattr(self, '_new_model'):
+            self._new_model = self.init_model(self.new_item) if self.new_item else None
+        return self._new_model
+
+
+class RecordListener:
+    """
+    Registered in place of a handler that takes the StreamRecord shared by the listeners of each
+    record it matches, as `record`, in addition to the usual arguments.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+
+    def __call__(self, item_id, new_item=None, old_item=None, record=None):
+        return self.handler(item_id, new_item=new_item, old_item=old_item, record=record)
+
+    def __repr__(self):
+        return repr(self.handler)
+
+
+class BatchListener:
+    """
+    Registered in place of a batch handler, collects the (item_id, old_item, new_item) of each record
+    the handler matches, so the handler can be called once with all of them.
+    """
+
+    def __init__(self, handler, with_loader=False):
+        self.handler = handler
+        self.with_loader = with_loader
+        self.items = []
+
+    def __call__(self, item_id, new_item=None, old_item=None):
+        self.items.append((item_id, old_item, new_item))
+
+    def __repr__(self):
+        return f'{self.handler!r} (batched)'
+
 
 class DynamoDispatch:
     """
     A dispatcher that holds and allows searching over a catalogue of listener functions
     according to matching conditions which should trigger a call.
+
+    Registrations are compiled into a flat table of routes keyed by (pk_prefix, sk_prefix, event_name),
+    so that a search is one lookup plus one pass over the distinct attribute conditions of that route.
     """
 
     def __init__(self):
-        self.listeners = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+        self.routes = {}
+        self.batch_listeners = []
+        self.model_initializers = {}
+        self.getters = {}
+
+    def register_model(self, pk_prefix, sk_prefix, init_model):
+        "Register how to initialize a model from an item image, for the StreamRecords of that kind of item"
+        self.model_initializers[(pk_prefix, sk_prefix)] = init_model
 
-    def register(self, pk_prefix, sk_prefix, event_names, handler, attributes=None):
+    def register_getter(self, kind, get_many):
+        """
+        Register how ItemLoaders fetch models of `kind`: a function that is passed a list of ids and returns a
+        list of models aligned with them, with None for those that do not exist.
+        """
+        self.getters[kind] = get_many
+
+    def loader(self):
+        return ItemLoader(self.getters)
+
+    def stream_record(self, pk_prefix, sk_prefix, item_id, old_item=None, new_item=None):
+        init_model = self.model_initializers.get((pk_prefix, sk_prefix))
+        return StreamRecord(item_id, old_item, new_item, init_model=init_model)
+
+    def register(
+        self,
+        pk_prefix,
+        sk_prefix,
+        event_names,
+        handler,
+        attributes=None,
+        concurrency_safe=False,
+        with_record=False,
+    ):
         """
         Register a handler.
 
         The `attributes` parameter, if provided, should be a dictionary of {name: default_value}.
         If `attributes` is present handler will only be called if at least one of the
         values of `attributes` have changed when applied to the old & new items.
+
+        The `concurrency_safe` parameter marks a handler whose side effects, for a record of one
+        partition key, do not depend on the order it runs relative to records of other partition keys:
+        it only writes to the record's own partition, applies counter changes that commute, or pushes
+        notifications or syncs keyed by the record itself. The records of a partition key whose
+        handlers are all such may be processed concurrently with those of other keys. The records of
+        other partition keys are processed serially, in stream order.
+
+        The `with_record` parameter marks a handler that is also passed the StreamRecord shared by all
+        the listeners of the record, as `record`, so that they share its models.
         """
+        if with_record:
+            handler = RecordListener(handler)
         for event_name in event_names:
-            self.listeners[pk_prefix][sk_prefix][event_name].append(
-                {'handler': handler, 'attributes': attributes}
+            route = self.routes.setdefault((pk_prefix, sk_prefix, event_name), Route())
+            route.add(handler, attributes, concurrency_safe=concurrency_safe)
+
+    def register_batch(self, pk_prefix, sk_prefix, event_names, handler, attributes=None, with_loader=False):
+        """
+        Register a handler that is called once per batch of records, rather than once per record.
+
+        Records are matched as for `register`. The handler is called with a list of
+        (item_id, old_item, new_item) tuples, in stream order, with None for an absent image.
+        Matching records are collected serially, and the handler called by `pop_batches`.
+
+        The `with_loader` parameter marks a handler that is also passed the ItemLoader shared by the batch
+        handlers of the batch, as `loader`. As earlier handlers may have written to what they loaded, such
+        handlers should only rely on what the batch doesn't change, such as who posted a post.
+        """
+        batch_listener = BatchListener(handler, with_loader=with_loader)
+        self.batch_listeners.append(batch_listener)
+        self.register(pk_prefix, sk_prefix, event_names, batch_listener, attributes)
+
+    def pop_batches(self, loader=None):
+        """
+        Return a list of (handler, items) for the batch handlers that matched any records, and reset them.
+        If `loader` is given, it's bound to the handlers registered `with_loader`.
+        """
+        batches = []
+        for batch_listener in self.batch_listeners:
+            if batch_listener.items:
+                handler = batch_listener.handler
+                if loader and batch_listener.with_loader:
+                    handler = functools.partial(handler, loader=loader)
+                batches.append((handler, batch_listener.items))
+                batch_listener.items = []
+        return batches
+
+    def has_listeners(self, pk_prefix, sk_prefix, event_name):
+        "Is anything registered for this kind of record? If not, there's no need to deserialize its images."
+        return (pk_prefix, sk_prefix, event_name) in self.routes
+
+    def search(self, pk_prefix, sk_prefix, event_name, old_item, new_item, concurrency_safe=None):
+        """
+        Returns a list of matching listener functions.
+        If `concurrency_safe` is not None, only listeners registered with that flag are returned.
+        """
+        route = self.routes.get((pk_prefix, sk_prefix, event_name))
+        return route.match(old_item, new_item, concurrency_safe=concurrency_safe) if route else []
+
+    def search_flagged(self, pk_prefix, sk_prefix, event_name, old_item, new_item):
+        "Returns a list of (listener function, concurrency_safe) of the matching listeners"
+        route = self.routes.get((pk_prefix, sk_prefix, event_name))
+        return route.match_flagged(old_item, new_item) if route else []
+
+    def filter_patterns(self, pk_prefixes=None, max_patterns=5):
+        """
+        Return a list of Lambda event source filter patterns that, between them, match every stream record
+        that any listener is registered for. If `pk_prefixes` is given, only registrations for those are
+        considered, so the records can be split over several consumers.
+
+        Patterns match on pk prefix, sk prefix and event name. There is one per group of pk prefixes that
+        share the same sk prefixes & event names, merged further where needed to fit `max_patterns`, the
+        limit on filters per event source mapping. Merging only ever widens what's matched.
+        https://docs.aws.amazon.com/lambda/latest/dg/invocation-eventfiltering.html
+        """
+        by_pk_prefix = {}
+        for pk_prefix, sk_prefix, event_name in self.routes:
+            if pk_prefixes is None or pk_prefix in pk_prefixes:
+                sk_prefixes, event_names = by_pk_prefix.setdefault(pk_prefix, (set(), set()))
+                sk_prefixes.add(sk_prefix)
+                event_names.add(event_name)
+
+        groups = {}
+        for pk_prefix, (sk_prefixes, event_names) in sorted(by_pk_prefix.items()):
+            groups.setdefault((frozenset(sk_prefixes), frozenset(event_names)), set()).add(pk_prefix)
+        groups = [(pk_prefix_set, set(sks), set(evs)) for (sks, evs), pk_prefix_set in groups.items()]
+
+        def size(group):
+            # how many (pk prefix, sk prefix, event name) combinations the group matches
+            return len(group[0]) * len(group[1]) * len(group[2])
+
+        while len(groups) > max_patterns:
+            # merge the pair of groups that widens what's matched the least
+            i, j = min(
+                itertools.combinations(range(len(groups)), 2),
+                key=lambda ij: size([a | b for a, b in zip(groups[ij[0]], groups[ij[1]])])
+                - size(groups[ij[0]])
+                - size(groups[ij[1]]),
             )
+            merged = tuple(a | b for a, b in zip(groups[i], groups[j]))
+            groups = [group for k, group in enumerate(groups) if k not in (i, j)] + [merged]
+
+        return [
+            {
+                'eventName': sorted(event_names),
+                'dynamodb': {
+                    'Keys': {
+                        'partitionKey': {
+                            'S': [{'prefix': f'{pk_prefix}/'} for pk_prefix in sorted(pk_prefix_set)]
+                        },
+                        'sortKey': {
+                            'S': [
+                                value
+                                for sk_prefix in sorted(sk_prefixes)
+                                for value in (sk_prefix, {'prefix': f'{sk_prefix}/'})
+                            ]
+                        },
+                    },
+                },
+            }
+            for pk_prefix_set, sk_prefixes, event_names in sorted(groups, key=lambda g: sorted(g[0]))
+        ]
+
+    def explain(self, record):
+        """
+        For debugging: given a dynamo stream record, return a description of each listener registered
+        for that kind of record, whether it would be called, and why.
+        """
+        name = record['eventName']
+        pk = deserialize(record['dynamodb']['Keys']['partitionKey'])
+        sk = deserialize(record['dynamodb']['Keys']['sortKey'])
+        old_item = LazyImage(record['dynamodb'].get('OldImage', {}))
+        new_item = LazyImage(record['dynamodb'].get('NewImage', {}))
+        pk_prefix, sk_prefix = pk.split('/')[0], sk.split('/')[0]
+
+        route = self.routes.get((pk_prefix, sk_prefix, name))
+        if not route:
+            return []
+        changed = route.changed_mask(old_item, new_item)
+        explanations = []
+        for handler, mask, _ in route.listeners:
+            attr_names = [route.conditions[bit][0] for bit in range(len(route.conditions)) if mask & (1 << bit)]
+            changed_attr_names = [
+                route.conditions[bit][0] for bit in range(len(route.conditions)) if mask & changed & (1 << bit)
+            ]
+            if not mask:
+                called, reason = True, f'no attribute filter on {name}'
+            elif changed_attr_names:
+                called, reason = True, f'changed: {", ".join(changed_attr_names)}'
+            else:
+                called, reason = False, f'unchanged: {", ".join(attr_names)}'
+            explanations.append({'handler': handler, 'called': called, 'reason': reason})
+        return explanations
+
+
+def process_records_by_partition_key(records, process_record, max_workers, prepare=None, needs_serial=None):
+    """
+    Process a batch of dynamo stream records with `process_record`, which runs all their listeners.
+    If `prepare` is given, each record is passed through it once, and `process_record` & `needs_serial`
+    are passed what it returns rather than the record.
+
+    If `max_workers` is greater than one, records are grouped by partition key, and the records of each
+    group are processed in stream order by one thread, so listeners of one key never overtake each other.
+    Groups with a record for which `needs_serial` is true, as it has listeners with side effects across
+    partition keys, are processed by the calling thread, interleaved in stream order. The other groups
+    are handed to a pool of that many threads. Otherwise, each record is processed in turn.
+    """
+    prepared = [(record, prepare(record) if prepare else record) for record in records]
+    groups = {}
+    for record, prepared_record in prepared:
+        groups.setdefault(record['dynamodb']['Keys']['partitionKey']['S'], []).append(prepared_record)
+
+    if max_workers <= 1 or len(groups) <= 1:
+        for _, prepared_record in prepared:
+            process_record(prepared_record)
+        return
+
+    serial_keys = {key for key, group in groups.items() if needs_serial and any(map(needs_serial, group))}
+    concurrent_groups = [group for key, group in groups.items() if key not in serial_keys]
+    if not concurrent_groups:
+        for _, prepared_record in prepared:
+            process_record(prepared_record)
+        return
+
+    def process_group(group):
+        for prepared_record in group:
+            process_record(prepared_record)
 
-    def search(self, pk_prefix, sk_prefix, event_name, old_item, new_item):
-        "Returns a set of matching listener functions"
-        matches = []
-        for listener in self.listeners[pk_prefix][sk_prefix][event_name]:
-            if not listener['attributes']:
-                matches.append(listener['handler'])
-                continue
-            for attr_name, attr_default in listener['attributes'].items():
-                old_value = old_item.get(attr_name, attr_default)
-                new_value = new_item.get(attr_name, attr_default)
-                if old_value != new_value:
-                    matches.append(listener['handler'])
-                    break
-        return matches
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(max_workers, len(concurrent_groups))) as executor:
+        futures = [executor.submit(process_group, group) for group in concurrent_groups]
+        for record, prepared_record in prepared:
+            if record['dynamodb']['Keys']['partitionKey']['S'] in serial_keys:
+                process_record(prepared_record)
+        for future in futures:
+            future.result()
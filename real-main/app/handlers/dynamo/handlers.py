@@ -1,7 +1,7 @@
+import collections
 import logging
 import os
-
-from boto3.dynamodb.types import TypeDeserializer
+import threading
 
 from app import clients, models
 from app.handlers import xray
@@ -9,30 +9,50 @@ from app.logging import LogLevelContext, handler_logging
 from app.models.follower.enums import FollowStatus
 from app.models.user.enums import UserStatus
 
-from .dispatch import DynamoDispatch
+from .dispatch import DynamoDispatch, LazyImage, RecordListener, deserialize, process_records_by_partition_key
+from .metrics import ListenerMetrics, count_call, counting_calls
 
 DYNAMO_FEED_TABLE = os.environ.get('DYNAMO_FEED_TABLE')
 S3_UPLOADS_BUCKET = os.environ.get('S3_UPLOADS_BUCKET')
 
+# number of threads to process records of different partition keys with, one to process serially
+DYNAMO_STREAM_MAX_WORKERS = int(os.environ.get('DYNAMO_STREAM_MAX_WORKERS', 1))
+# listener calls that take longer than this are logged along with the key of the record
+DYNAMO_STREAM_SLOW_LISTENER_SECONDS = float(os.environ.get('DYNAMO_STREAM_SLOW_LISTENER_SECONDS', 1))
+
 logger = logging.getLogger()
+
+# a stream record, parsed, with the listeners it matches, each a tuple of (listener, concurrency_safe)
+MatchedRecord = collections.namedtuple(
+    'MatchedRecord',
+    ['event_name', 'pk', 'sk', 'pk_prefix', 'sk_prefix', 'item_id', 'old_image', 'new_image', 'listeners'],
+)
+
 xray.patch_all()
 
 clients = {
     'appstore': clients.AppStoreClient(),
     'appsync': clients.AppSyncClient(),
     'cognito': clients.CognitoClient(),
-    'dynamo': clients.DynamoClient(),
+    'dynamo': clients.DynamoClient(cache_items=True),
     'dynamo_feed': clients.DynamoClient(table_name=DYNAMO_FEED_TABLE),
     'elasticsearch': clients.ElasticSearchClient(),
     'pinpoint': clients.PinpointClient(),
     's3_uploads': clients.S3Client(S3_UPLOADS_BUCKET),
 }
 
+# calls to other services are counted against the listener that made them
+for dynamo_client in (clients['dynamo'], clients['dynamo_feed']):
+    for boto3_client in (dynamo_client.table.meta.client, dynamo_client.boto3_client):
+        boto3_client.meta.events.register('before-call.dynamodb', lambda **kwargs: count_call('dynamo'))
+clients['appsync'].execute = counting_calls('appsync', clients['appsync'].execute)
+
 managers = {}
 album_manager = managers.get('album') or models.AlbumManager(clients, managers=managers)
 appstore_manager = managers.get('appstore_receipt') or models.AppStoreManager(clients, managers=managers)
 block_manager = managers.get('block') or models.BlockManager(clients, managers=managers)
 card_manager = managers.get('card') or models.CardManager(clients, managers=managers)
+cascade_manager = managers.get('cascade') or models.CascadeManager(clients, managers=managers)
 chat_manager = managers.get('chat') or models.ChatManager(clients, managers=managers)
 chat_message_manager = managers.get('chat_message') or models.ChatMessageManager(clients, managers=managers)
 comment_manager = managers.get('comment') or models.CommentManager(clients, managers=managers)
@@ -43,13 +63,17 @@ post_manager = managers.get('post') or models.PostManager(clients, managers=mana
 screen_manager = managers.get('screen') or models.ScreenManager(clients, managers=managers)
 user_manager = managers.get('user') or models.UserManager(clients, managers=managers)
 
-# https://stackoverflow.com/a/46738251
-deserialize = TypeDeserializer().deserialize
-
 dispatch = DynamoDispatch()
 register = dispatch.register
+register_batch = dispatch.register_batch
+
+# models of the items of stream records, and of related items, that listeners may share
+dispatch.register_model('comment', '-', comment_manager.init_comment)
+dispatch.register_model('post', '-', post_manager.init_post)
+dispatch.register_getter('post', post_manager.get_posts)
+dispatch.register_getter('user', user_manager.get_users)
 
-register('album', '-', ['INSERT'], user_manager.on_album_add_update_album_count)
+register_batch('album', '-', ['INSERT'], user_manager.on_album_add_update_album_count)
 register('album', '-', ['INSERT', 'MODIFY'], album_manager.on_album_add_edit_sync_delete_at)
 register(
     'album',
@@ -60,50 +84,52 @@ register(
 )
 register('album', '-', ['REMOVE'], album_manager.on_album_delete_delete_album_art)
 register('album', '-', ['REMOVE'], post_manager.on_album_delete_remove_posts)
-register('album', '-', ['REMOVE'], user_manager.on_album_delete_update_album_count)
+register_batch('album', '-', ['REMOVE'], user_manager.on_album_delete_update_album_count)
 # TODO: enable once receipt to auto-verify receipts upon upload
 # register('appStoreReceipt', '-', ['INSERT'], appstore_manager.on_receipt_add_verify)
 register('card', '-', ['INSERT'], card_manager.on_card_add)
-register('card', '-', ['INSERT'], user_manager.on_card_add_increment_count)
+register_batch('card', '-', ['INSERT'], user_manager.on_card_add_increment_count)
 register('card', '-', ['MODIFY'], card_manager.on_card_edit)
 register('card', '-', ['REMOVE'], card_manager.on_card_delete)
-register('card', '-', ['REMOVE'], user_manager.on_card_delete_decrement_count)
+register_batch('card', '-', ['REMOVE'], user_manager.on_card_delete_decrement_count)
+register('cascade', 'job', ['INSERT', 'MODIFY'], cascade_manager.on_job_add_edit_run_slice)
 register('chat', '-', ['REMOVE'], chat_manager.on_chat_delete_delete_memberships)
 register('chat', '-', ['REMOVE'], chat_manager.on_item_delete_delete_flags)
 register('chat', '-', ['REMOVE'], chat_manager.on_item_delete_delete_views)
 register('chat', '-', ['REMOVE'], chat_message_manager.on_chat_delete_delete_messages)
 register('chat', 'flag', ['INSERT'], chat_manager.on_flag_add)
 register('chat', 'flag', ['REMOVE'], chat_manager.on_flag_delete)
-register('chat', 'member', ['INSERT'], user_manager.on_chat_member_add_update_chat_count)
-register(
+register_batch('chat', 'member', ['INSERT'], user_manager.on_chat_member_add_update_chat_count)
+register_batch(
     'chat',
     'member',
     ['INSERT', 'MODIFY', 'REMOVE'],
     user_manager.sync_chats_with_unviewed_messages_count,
     {'messagesUnviewedCount': 0},
 )
-register('chat', 'member', ['REMOVE'], user_manager.on_chat_member_delete_update_chat_count)
+register_batch('chat', 'member', ['REMOVE'], user_manager.on_chat_member_delete_update_chat_count)
 register('chat', 'view', ['INSERT', 'MODIFY'], chat_manager.sync_member_messages_unviewed_count, {'viewCount': 0})
 register('chatMessage', '-', ['INSERT'], chat_manager.on_chat_message_add)
-register('chatMessage', '-', ['INSERT'], user_manager.sync_chat_message_creation_count)
+register_batch('chatMessage', '-', ['INSERT'], user_manager.sync_chat_message_creation_count)
 register('chatMessage', '-', ['REMOVE'], chat_manager.on_chat_message_delete)
 register('chatMessage', '-', ['REMOVE'], chat_message_manager.on_item_delete_delete_flags)
-register('chatMessage', '-', ['REMOVE'], user_manager.sync_chat_message_deletion_count)
+register_batch('chatMessage', '-', ['REMOVE'], user_manager.sync_chat_message_deletion_count)
 register('chatMessage', 'flag', ['INSERT'], chat_message_manager.on_flag_add)
 register('chatMessage', 'flag', ['REMOVE'], chat_message_manager.on_flag_delete)
-register('comment', '-', ['INSERT'], post_manager.on_comment_add)
-register('comment', '-', ['INSERT'], user_manager.on_comment_add)
+register('comment', '-', ['INSERT'], post_manager.on_comment_add, with_record=True)
+register_batch('comment', '-', ['INSERT'], user_manager.on_comment_add)
 register(
     'comment',
     '-',
     ['INSERT', 'MODIFY'],
     card_manager.on_comment_text_tags_change_update_card,
     {'textTags': []},
+    with_record=True,
 )
-register('comment', '-', ['REMOVE'], card_manager.on_comment_delete_delete_cards)
+register_batch('comment', '-', ['REMOVE'], card_manager.on_comment_delete_delete_cards)
 register('comment', '-', ['REMOVE'], comment_manager.on_item_delete_delete_flags)
-register('comment', '-', ['REMOVE'], post_manager.on_comment_delete)
-register('comment', '-', ['REMOVE'], user_manager.on_comment_delete)
+register('comment', '-', ['REMOVE'], post_manager.on_comment_delete, with_record=True)
+register_batch('comment', '-', ['REMOVE'], user_manager.on_comment_delete)
 register('comment', 'flag', ['INSERT'], comment_manager.on_flag_add)
 register('comment', 'flag', ['REMOVE'], comment_manager.on_flag_delete)
 register(
@@ -120,12 +146,13 @@ register(
     card_manager.on_post_likes_count_change_update_card,
     {'anonymousLikeCount': 0, 'onymousLikeCount': 0},
 )
-register(
+register_batch(
     'post',
     '-',
     ['INSERT', 'MODIFY'],
     card_manager.on_post_original_post_id_change_update_card,
     {'originalPostId': None},
+    with_loader=True,
 )
 register(
     'post',
@@ -133,6 +160,7 @@ register(
     ['INSERT', 'MODIFY'],
     card_manager.on_post_text_tags_change_update_card,
     {'textTags': []},
+    with_record=True,
 )
 register(
     'post',
@@ -155,9 +183,23 @@ register(
     post_manager.on_post_verification_hidden_change_update_is_verified,
     {'verificationHidden': False},
 )
-register('post', '-', ['MODIFY'], post_manager.on_post_status_change_fire_gql_notifications, {'postStatus': None})
-register('post', '-', ['MODIFY'], user_manager.on_post_status_change_sync_counts, {'postStatus': None})
-register('post', '-', ['REMOVE'], card_manager.on_post_delete_delete_cards)
+register(
+    'post',
+    '-',
+    ['MODIFY'],
+    post_manager.on_post_status_change_fire_gql_notifications,
+    {'postStatus': None},
+    concurrency_safe=True,
+    with_record=True,
+)
+register_batch(
+    'post',
+    '-',
+    ['MODIFY'],
+    user_manager.on_post_status_change_sync_counts,
+    {'postStatus': None},
+)
+register_batch('post', '-', ['REMOVE'], card_manager.on_post_delete_delete_cards)
 register('post', '-', ['REMOVE'], post_manager.on_item_delete_delete_flags)
 register('post', '-', ['REMOVE'], post_manager.on_item_delete_delete_views)
 register(
@@ -169,9 +211,9 @@ register(
 )
 register('post', 'flag', ['INSERT'], post_manager.on_flag_add)
 register('post', 'flag', ['REMOVE'], post_manager.on_flag_delete)
-register('post', 'like', ['INSERT'], post_manager.on_like_add)
-register('post', 'like', ['REMOVE'], post_manager.on_like_delete)
-register(
+register_batch('post', 'like', ['INSERT'], post_manager.on_like_add)
+register_batch('post', 'like', ['REMOVE'], post_manager.on_like_delete)
+register_batch(
     'post',
     'view',
     ['INSERT', 'MODIFY'],
@@ -185,7 +227,13 @@ register(
     post_manager.on_post_view_count_change_update_counts,
     {'viewCount': 0},
 )
-register('post', 'view', ['INSERT', 'REMOVE'], post_manager.on_post_view_add_delete_sync_viewed_by_counts)
+register_batch(
+    'post',
+    'view',
+    ['INSERT', 'REMOVE'],
+    post_manager.on_post_view_add_delete_sync_viewed_by_counts,
+    with_loader=True,
+)
 register(
     'user',
     'follower',
@@ -199,6 +247,7 @@ register(
     ['INSERT', 'MODIFY', 'REMOVE'],
     follower_manager.on_first_story_post_id_change_fire_gql_notifications,
     {'postId': None},
+    concurrency_safe=True,
 )
 register(
     'user',
@@ -214,7 +263,7 @@ register(
     like_manager.on_user_follow_status_change_sync_likes,
     {'followStatus': FollowStatus.NOT_FOLLOWING},
 )
-register(
+register_batch(
     'user',
     'follower',
     ['INSERT', 'MODIFY', 'REMOVE'],
@@ -263,15 +312,31 @@ register(
     ['INSERT', 'MODIFY'],
     user_manager.fire_gql_subscription_chats_with_unviewed_messages_count,
     {'chatsWithUnviewedMessagesCount': 0},
+    concurrency_safe=True,
+)
+register(
+    'user',
+    'profile',
+    ['INSERT', 'MODIFY'],
+    user_manager.sync_pinpoint_email,
+    {'email': None},
+    concurrency_safe=True,
+)
+register(
+    'user',
+    'profile',
+    ['INSERT', 'MODIFY'],
+    user_manager.sync_pinpoint_phone,
+    {'phoneNumber': None},
+    concurrency_safe=True,
 )
-register('user', 'profile', ['INSERT', 'MODIFY'], user_manager.sync_pinpoint_email, {'email': None})
-register('user', 'profile', ['INSERT', 'MODIFY'], user_manager.sync_pinpoint_phone, {'phoneNumber': None})
 register(
     'user',
     'profile',
     ['INSERT', 'MODIFY'],
     user_manager.sync_pinpoint_user_status,
     {'userStatus': UserStatus.ACTIVE},
+    concurrency_safe=True,
 )
 register(
     'user',
@@ -279,6 +344,7 @@ register(
     ['INSERT', 'MODIFY'],
     user_manager.sync_elasticsearch,
     {'username': None, 'fullName': None, 'lastManuallyReindexedAt': None},
+    concurrency_safe=True,
 )
 register(
     'user',
@@ -297,7 +363,7 @@ register(
 register('user', 'profile', ['REMOVE'], album_manager.on_user_delete_delete_all_by_user)
 register('user', 'profile', ['REMOVE'], appstore_manager.on_user_delete_delete_receipts)
 register('user', 'profile', ['REMOVE'], block_manager.on_user_delete_unblock_all_blocks)
-register('user', 'profile', ['REMOVE'], card_manager.on_user_delete_delete_cards)
+register_batch('user', 'profile', ['REMOVE'], card_manager.on_user_delete_delete_cards)
 register('user', 'profile', ['REMOVE'], chat_manager.on_user_delete_delete_flags)
 register('user', 'profile', ['REMOVE'], chat_manager.on_user_delete_delete_views)
 register('user', 'profile', ['REMOVE'], chat_manager.on_user_delete_leave_all_chats)
@@ -316,26 +382,104 @@ register('user', 'profile', ['REMOVE'], user_manager.on_user_delete_delete_cogni
 
 @handler_logging
 def process_records(event, context):
-    for record in event['Records']:
+    item_cache_stats = collections.Counter()
+    item_cache_stats_lock = threading.Lock()
+    listener_metrics = ListenerMetrics(slow_seconds=DYNAMO_STREAM_SLOW_LISTENER_SECONDS)
 
-        name = record['eventName']
-        pk = deserialize(record['dynamodb']['Keys']['partitionKey'])
-        sk = deserialize(record['dynamodb']['Keys']['sortKey'])
-        old_item = {k: deserialize(v) for k, v in record['dynamodb'].get('OldImage', {}).items()}
-        new_item = {k: deserialize(v) for k, v in record['dynamodb'].get('NewImage', {}).items()}
+    def process_record_with_item_cache(matched):
+        # other writers may have changed items since the last record, so the item cache is scoped to a record
+        try:
+            process_record(matched, listener_metrics)
+        finally:
+            stats = clients['dynamo'].clear_item_caches()
+            with item_cache_stats_lock:
+                item_cache_stats.update(stats)
+
+    clients['dynamo'].clear_item_caches()
+    dispatch.pop_batches()  # discard anything left over from an invocation that failed part way through
+    # notifications are coalesced & queued across the batch, and sent concurrently at the end
+    with clients['appsync'].deferred_sends() as notification_coalescer:
+        # changes to counters are coalesced across the batch, and applied once per item at the end
+        with clients['dynamo'].buffered_counts() as counter_buffer:
+            process_records_by_partition_key(
+                event['Records'],
+                process_record_with_item_cache,
+                max_workers=DYNAMO_STREAM_MAX_WORKERS,
+                prepare=match_record,
+                needs_serial=has_serial_listeners,
+            )
+            # batch handlers that take it share one loader, so the models they need are fetched once
+            for func, items in dispatch.pop_batches(loader=dispatch.loader()):
+                with LogLevelContext(logger, logging.INFO):
+                    logger.info(f'Batch of {len(items)} records running: {func}')
+                try:
+                    with listener_metrics.measure(func, f'batch of {len(items)} records'):
+                        func(items)
+                except Exception as err:
+                    logger.exception(str(err))
+                item_cache_stats.update(clients['dynamo'].clear_item_caches())
+        appsync_sent_count, appsync_failed_count = clients['appsync'].flush()
+
+    with LogLevelContext(logger, logging.INFO):
+        logger.info(f'Dynamo item cache: {item_cache_stats["hits"]} hits, {item_cache_stats["misses"]} misses')
+        logger.info(
+            f'Dynamo counters: {counter_buffer.recorded_count} changes applied in {counter_buffer.update_count} updates'
+        )
+        logger.info(
+            f'Appsync notifications: {notification_coalescer.recorded_count} fired, '
+            f'{notification_coalescer.suppressed_count} suppressed as duplicates'
+        )
+        logger.info(f'Appsync requests: {appsync_sent_count} sent, {appsync_failed_count} failed')
+    listener_metrics.log(
+        len(event['Records']),
+        extra_metrics={
+            'NotificationsFired': (notification_coalescer.recorded_count, 'Count'),
+            'NotificationsSuppressed': (notification_coalescer.suppressed_count, 'Count'),
+        },
+    )
 
-        with LogLevelContext(logger, logging.INFO):
-            logger.info(f'{name}: `{pk}` / `{sk}` starting processing')
 
-        # we still have some pks in an old (& deprecated) format with more than one item_id in the pk
-        pk_prefix, item_id = pk.split('/')[:2]
-        sk_prefix = sk.split('/')[0]
+def match_record(record):
+    """
+    Parse a stream record and search for its listeners, once for both deciding how it may be processed
+    and processing it. Only the attributes listeners filter on are deserialized.
+    """
+    name = record['eventName']
+    pk = deserialize(record['dynamodb']['Keys']['partitionKey'])
+    sk = deserialize(record['dynamodb']['Keys']['sortKey'])
+    # we still have some pks in an old (& deprecated) format with more than one item_id in the pk
+    pk_prefix, item_id = pk.split('/')[:2]
+    sk_prefix = sk.split('/')[0]
+    old_image = LazyImage(record['dynamodb'].get('OldImage', {}))
+    new_image = LazyImage(record['dynamodb'].get('NewImage', {}))
+    listeners = []
+    if dispatch.has_listeners(pk_prefix, sk_prefix, name):
+        listeners = dispatch.search_flagged(pk_prefix, sk_prefix, name, old_image, new_image)
+    return MatchedRecord(name, pk, sk, pk_prefix, sk_prefix, item_id, old_image, new_image, listeners)
 
-        item_kwargs = {k: v for k, v in {'new_item': new_item, 'old_item': old_item}.items() if v}
-        for func in dispatch.search(pk_prefix, sk_prefix, name, old_item, new_item):
-            with LogLevelContext(logger, logging.INFO):
-                logger.info(f'{name}: `{pk}` / `{sk}` running: {func}')
-            try:
-                func(item_id, **item_kwargs)
-            except Exception as err:
-                logger.exception(str(err))
+
+def has_serial_listeners(matched):
+    "Does the record have any listeners not registered as safe to run concurrently across partition keys?"
+    return not all(concurrency_safe for _, concurrency_safe in matched.listeners)
+
+
+def process_record(matched, listener_metrics):
+    name, pk, sk = matched.event_name, matched.pk, matched.sk
+    with LogLevelContext(logger, logging.INFO):
+        logger.info(f'{name}: `{pk}` / `{sk}` starting processing')
+    if not matched.listeners:
+        return
+
+    images = {'new_item': matched.new_image, 'old_item': matched.old_image}
+    item_kwargs = {k: v.to_dict() for k, v in images.items() if v}
+    # listeners that take it share one set of models of the items per record
+    stream_record = dispatch.stream_record(matched.pk_prefix, matched.sk_prefix, matched.item_id, **item_kwargs)
+    for func, _ in matched.listeners:
+        with LogLevelContext(logger, logging.INFO):
+            logger.info(f'{name}: `{pk}` / `{sk}` running: {func}')
+        kwargs = {**item_kwargs, 'record': stream_record} if isinstance(func, RecordListener) else item_kwargs
+        try:
+            with listener_metrics.measure(func, f'{name}: `{pk}` / `{sk}`'):
+                func(matched.item_id, **kwargs)
+        except Exception as err:
+            logger.exception(str(err))
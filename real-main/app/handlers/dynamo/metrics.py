@@ -0,0 +1,147 @@
+import collections
+import contextlib
+import contextvars
+import functools
+import logging
+import math
+import os
+import threading
+import time
+
+from app.logging import log_embedded_metrics
+
+from .dispatch import BatchListener, RecordListener
+
+logger = logging.getLogger()
+
+# the listener call in progress, if any, which calls made to other services are counted against
+current_call = contextvars.ContextVar('current_call', default=None)
+
+
+def listener_name(func):
+    "A name for a listener that is readable and stable across invocations, unlike its repr"
+    if isinstance(func, BatchListener):
+        return f'{listener_name(func.handler)} (batched)'
+    if isinstance(func, RecordListener):
+        return listener_name(func.handler)
+    if isinstance(func, functools.partial):
+        # keyword arguments are those bound per batch, such as the loader, so are left out
+        name = listener_name(func.func)
+        return f'{name}({", ".join(map(repr, func.args))})' if func.args else name
+    if (owner := getattr(func, '__self__', None)) is not None:
+        return f'{type(owner).__name__}.{func.__name__}'
+    return getattr(func, '__qualname__', None) or repr(func)
+
+
+def count_call(service):
+    "Count a call to `service` against the listener call in progress, if any"
+    if (call := current_call.get()) is not None:
+        with call.lock:
+            call.service_calls[service] += 1
+
+
+def counting_calls(service, func):
+    "Wrap `func` so each call to it is counted as a call to `service`"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        count_call(service)
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+class ListenerCall:
+    "Counts of the calls to other services made by one call of a listener, possibly from several threads"
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.service_calls = collections.Counter()
+
+
+class ListenerMetrics:
+    """
+    Collects the timing of each listener call over a batch of stream records, along with the count of
+    calls it made to other services, and logs them all at the end of the batch as one line in CloudWatch's
+    Embedded Metric Format. The totals for the batch are metrics, the stats per listener are properties.
+
+    A listener call that takes longer than `slow_seconds` is logged as it happens, with the record's key.
+    """
+
+    namespace = 'REAL/DynamoStream'
+    services = {'dynamo': 'DynamoCalls', 'appsync': 'AppSyncCalls'}
+
+    def __init__(self, slow_seconds=None):
+        self.slow_seconds = slow_seconds
+        self.lock = threading.Lock()
+        self.durations = collections.defaultdict(list)
+        self.error_counts = collections.Counter()
+        self.slow_counts = collections.Counter()
+        self.service_calls = collections.defaultdict(collections.Counter)
+
+    @contextlib.contextmanager
+    def measure(self, func, record_key):
+        "Time a call to listener `func` made for the record with `record_key`, counting its calls to services"
+        call = ListenerCall()
+        token = current_call.set(call)
+        failed = False
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            failed = True
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            current_call.reset(token)
+            name = listener_name(func)
+            slow = self.slow_seconds is not None and seconds > self.slow_seconds
+            with self.lock:
+                self.durations[name].append(seconds)
+                self.error_counts[name] += failed
+                self.slow_counts[name] += slow
+                self.service_calls[name].update(call.service_calls)
+            if slow:
+                logger.warning(f'Slow listener took {seconds:.3f} seconds on {record_key}: {name}')
+
+    def summary(self):
+        "Return a dict of {listener name: stats}, times in milliseconds, slowest listener in total first"
+        summary = {}
+        for name, durations in sorted(self.durations.items(), key=lambda kv: sum(kv[1]), reverse=True):
+            durations = sorted(durations)
+            summary[name] = {
+                'count': len(durations),
+                'totalMs': round(sum(durations) * 1000, 3),
+                'maxMs': round(durations[-1] * 1000, 3),
+                # nearest-rank percentile
+                'p95Ms': round(durations[math.ceil(len(durations) * 0.95) - 1] * 1000, 3),
+                'errors': self.error_counts[name],
+                'slow': self.slow_counts[name],
+                **{service: self.service_calls[name][service] for service in self.services},
+            }
+        return summary
+
+    def log(self, record_count, extra_metrics=None):
+        """
+        Log the metrics collected for a batch of `record_count` records, as one line. Any `extra_metrics`,
+        a dict of {metric name: (value, unit)} collected elsewhere over the batch, are logged with them.
+        """
+        summary = self.summary()
+        metrics = {
+            'Records': (record_count, 'Count'),
+            'ListenerCalls': (sum(stats['count'] for stats in summary.values()), 'Count'),
+            'ListenerTime': (round(sum(stats['totalMs'] for stats in summary.values()), 3), 'Milliseconds'),
+            'ListenerErrors': (sum(stats['errors'] for stats in summary.values()), 'Count'),
+            'SlowListenerCalls': (sum(stats['slow'] for stats in summary.values()), 'Count'),
+            **{
+                metric_name: (sum(stats[service] for stats in summary.values()), 'Count')
+                for service, metric_name in self.services.items()
+            },
+            **(extra_metrics or {}),
+        }
+        # set by lambda
+        function_name = os.environ.get('AWS_LAMBDA_FUNCTION_NAME')
+        dimensions = {'FunctionName': function_name} if function_name else None
+        log_embedded_metrics(
+            logger, self.namespace, metrics, dimensions=dimensions, properties={'listeners': summary}
+        )
@@ -1,5 +1,7 @@
 import json
 import logging
+import threading
+import time
 
 
 def handler_logging(*args, event_to_extras=None):
@@ -44,18 +46,62 @@ def handler_logging(*args, event_to_extras=None):
         return outer_wrapper
 
 
+def log_embedded_metrics(logger, namespace, metrics, dimensions=None, properties=None):
+    """
+    Log one line in CloudWatch's Embedded Metric Format, from which CloudWatch extracts metrics.
+
+    `metrics` is a dict of {name: (value, unit)}, `dimensions` a dict of {name: value} to apply to all
+    the metrics, and `properties` a dict of any other data to include, searchable with Logs Insights.
+    https://docs.aws.amazon.com/AmazonCloudWatch/latest/monitoring/CloudWatch_Embedded_Metric_Format_Specification.html
+    """
+    dimensions = dimensions or {}
+    doc = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [
+                {
+                    'Namespace': namespace,
+                    'Dimensions': [list(dimensions)],
+                    'Metrics': [{'Name': name, 'Unit': unit} for name, (_, unit) in metrics.items()],
+                }
+            ],
+        },
+        **dimensions,
+        **(properties or {}),
+        **{name: value for name, (value, _) in metrics.items()},
+    }
+    with LogLevelContext(logger, logging.INFO):
+        logger.info(f'Embedded metrics: {json.dumps(doc)}', extra={'embedded_metrics': doc})
+
+
 # https://docs.python.org/3/howto/logging-cookbook.html#using-a-context-manager-for-selective-logging
 class LogLevelContext:
+    """
+    The logger's level is global, so when contexts overlap across threads, the level in effect
+    before the first one was entered is restored only once the last one has exited. Overlapping
+    contexts are expected to use the same level.
+    """
+
+    lock = threading.Lock()
+    entered = {}  # logger -> (count of contexts entered, level before the first)
+
     def __init__(self, logger, level):
         self.logger = logger
         self.level = level
 
     def __enter__(self):
-        self.old_level = self.logger.level
-        self.logger.setLevel(self.level)
+        with self.lock:
+            count, old_level = self.entered.get(self.logger, (0, self.logger.level))
+            self.entered[self.logger] = (count + 1, old_level)
+            self.logger.setLevel(self.level)
 
     def __exit__(self, et, ev, tb):
-        self.logger.setLevel(self.old_level)
+        with self.lock:
+            count, old_level = self.entered.pop(self.logger)
+            if count > 1:
+                self.entered[self.logger] = (count - 1, old_level)
+            else:
+                self.logger.setLevel(old_level)
 
 
 # https://github.com/python/cpython/blob/v3.8.3/Lib/logging/__init__.py#L510
@@ -78,6 +124,10 @@ class CloudWatchFormatter(logging.Formatter):
         # Fail softly so we can still use this formatter outside the lambda exe context
         request_id = getattr(record, 'aws_request_id', None)
 
+        # CloudWatch only extracts embedded metrics from log lines that are a bare json object
+        if (embedded_metrics := getattr(record, 'embedded_metrics', None)) is not None:
+            return json.dumps({**embedded_metrics, 'requestId': request_id})
+
         # Dict order here is maintained (though not guaranteed) all the way out to the CloudWatch log interface
         # Level and RequestId are placed in a prefix to the log record in front of this data dict
         # Placing `message` first in the data dict makes the first part of it visible in the CloudWatch summary table
@@ -1,5 +1,7 @@
 import logging
 
+from app.models.block.enums import AccessAction, AccessDenial
+
 from .exceptions import FlagException
 
 logger = logging.getLogger()
@@ -11,13 +13,16 @@ class FlagModelMixin:
         if flag_dynamo:
             self.flag_dynamo = flag_dynamo
 
-    def flag(self, user):
+    def flag(self, user, access=None):
+        "The `access` of the user to the owner of the model may be passed in, if already checked"
+        access = access or self.block_manager.access_policy.check(user.id, self.user_id, AccessAction.FLAG)
+
         # can't flag a model of a user that has blocked us
-        if self.block_manager.is_blocked(self.user_id, user.id):
+        if access.denial == AccessDenial.BLOCKED_BY_TARGET:
             raise FlagException(f'User has been blocked by owner of {self.item_type} `{self.id}`')
 
         # can't flag a model of a user we have blocked
-        if self.block_manager.is_blocked(user.id, self.user_id):
+        if access.denial == AccessDenial.BLOCKING_TARGET:
             raise FlagException(f'User has blocked owner of {self.item_type} `{self.id}`')
 
         # cant flag our own model
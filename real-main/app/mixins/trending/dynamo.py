@@ -99,11 +99,11 @@ class TrendingDynamo:
         except self.client.exceptions.ConditionalCheckFailedException as err:
             raise exceptions.TrendingDNEOrAttributeMismatch(self.item_type, item_id) from err
 
-    def generate_items(self):
+    def generate_items(self, prefetch_pages=0):
         "Ordered with lowest score first."
         query_kwargs = {
             'KeyConditionExpression': 'gsiA4PartitionKey = :gsia1pk',
             'ExpressionAttributeValues': {':gsia1pk': f'{self.item_type}/trending'},
             'IndexName': 'GSI-A4',
         }
-        return self.client.generate_all_query(query_kwargs)
+        return self.client.generate_all_query(query_kwargs, prefetch_pages=prefetch_pages)
@@ -28,7 +28,7 @@ class TrendingManagerMixin:
         now = now or pendulum.now('utc')
         # iterates from lowest score upward, deflate and count each one
         total_count, deflated_count = 0, 0
-        for item in self.trending_dynamo.generate_items():
+        for item in self.trending_dynamo.generate_items(prefetch_pages=2):
             deflated = self.trending_deflate_item(item, now=now)
             deflated_count += int(deflated)
             total_count += 1
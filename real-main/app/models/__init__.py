@@ -3,6 +3,7 @@ __all__ = [
     'AppStoreManager',
     'BlockManager',
     'CardManager',
+    'CascadeManager',
     'ChatManager',
     'ChatMessageManager',
     'CommentManager',
@@ -18,6 +19,7 @@ from .album.manager import AlbumManager
 from .appstore.manager import AppStoreManager
 from .block.manager import BlockManager
 from .card.manager import CardManager
+from .cascade.manager import CascadeManager
 from .chat.manager import ChatManager
 from .chat_message.manager import ChatMessageManager
 from .comment.manager import CommentManager
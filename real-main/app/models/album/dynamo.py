@@ -152,7 +152,7 @@ class AlbumDynamo:
         )
 
     def increment_rank_count(self, album_id):
-        return self.client.increment_count(self.pk(album_id), 'rankCount')
+        return self.client.increment_count(self.pk(album_id), 'rankCount', defer=False)
 
     def generate_by_user(self, user_id):
         query_kwargs = {
@@ -28,6 +28,11 @@ class AlbumManager:
         album_item = self.dynamo.get_album(album_id)
         return self.init_album(album_item) if album_item else None
 
+    def get_albums(self, album_ids):
+        "Batch get albums. Returns a list aligned with `album_ids`, with None for albums that do not exist"
+        album_items = self.dynamo.client.batch_get_items([self.dynamo.pk(album_id) for album_id in album_ids])
+        return [self.init_album(album_item) if album_item else None for album_item in album_items]
+
     def init_album(self, album_item):
         return Album(
             album_item,
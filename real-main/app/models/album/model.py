@@ -50,7 +50,8 @@ class Album:
 
     def serialize(self, caller_user_id):
         resp = self.item.copy()
-        resp['ownedBy'] = self.user_manager.get_user(self.user_id).serialize(caller_user_id)
+        user = self.user_manager.get_user(self.user_id)
+        resp['ownedBy'] = self.user_manager.serialize_many(caller_user_id, [user])[0]
         return resp
 
     def update(self, name=None, description=None):
@@ -83,6 +84,16 @@ class Album:
             return self.cloudfront_client.generate_presigned_url(art_image_path, ['GET', 'HEAD'])
         return f'https://{self.frontend_resources_domain}/default-album-art/{size.filename}'
 
+    def get_art_image_urls(self):
+        "The urls of all sizes of the art image, by graphql field name, signed once between them"
+        if art_hash := self.item.get('artHash'):
+            filenames = [size.filename for size in image_size.JPEGS]
+            path_prefix = '/'.join([self.get_art_image_path_prefix(), art_hash, ''])
+            urls = self.cloudfront_client.generate_presigned_urls(path_prefix, filenames)
+        else:
+            urls = [self.get_art_image_url(size) for size in image_size.JPEGS]
+        return {image_size.URL_FIELDS[size]: url for size, url in zip(image_size.JPEGS, urls)}
+
     def get_art_image_path_prefix(self):
         return '/'.join([self.user_id, 'album', self.id])
 
@@ -120,7 +131,7 @@ class Album:
         if new_art_hash == old_art_hash:
             return self  # no changes
 
-        posts = [self.post_manager.get_post(post_id) for post_id in post_ids]
+        posts = self.post_manager.get_posts(post_ids)
         if len(posts) == 0:
             new_native_image = None
         elif len(posts) == 1:
@@ -0,0 +1,77 @@
+import collections
+import logging
+
+from app.models.follower.enums import FollowStatus
+from app.models.user.enums import UserPrivacyStatus
+
+from .enums import AccessAction, AccessDenial
+
+logger = logging.getLogger()
+
+# the outcome of an access check, along with the items fetched for it, so callers needn't fetch them again
+Access = collections.namedtuple('Access', ['denial', 'target_user_item', 'follow_item'])
+
+
+class AccessPolicy:
+    """
+    Checks whether one user may act on another user or on something of theirs, such as liking their post.
+
+    The block items in both directions, the actor's follow item of the target and the target user's item
+    are all fetched with one batch get, and then the rules of the action are evaluated in order. Actors
+    are never denied access to themselves.
+    """
+
+    # the rules of each action, in the order they're evaluated, the first that fails denying access
+    rules = {
+        AccessAction.LIKE: (
+            AccessDenial.BLOCKED_BY_TARGET,
+            AccessDenial.BLOCKING_TARGET,
+            AccessDenial.NOT_FOLLOWER,
+        ),
+        AccessAction.COMMENT: (
+            AccessDenial.BLOCKED_BY_TARGET,
+            AccessDenial.BLOCKING_TARGET,
+            AccessDenial.NOT_FOLLOWER,
+        ),
+        AccessAction.FLAG: (AccessDenial.BLOCKED_BY_TARGET, AccessDenial.BLOCKING_TARGET),
+        AccessAction.FLAG_POST: (
+            AccessDenial.NOT_FOLLOWER,
+            AccessDenial.BLOCKED_BY_TARGET,
+            AccessDenial.BLOCKING_TARGET,
+        ),
+        AccessAction.FOLLOW: (AccessDenial.BLOCKED_BY_TARGET, AccessDenial.BLOCKING_TARGET),
+        AccessAction.CHAT: (AccessDenial.BLOCKING_TARGET, AccessDenial.BLOCKED_BY_TARGET),
+    }
+
+    def __init__(self, block_manager, follower_manager, user_manager):
+        self.block_manager = block_manager
+        self.follower_manager = follower_manager
+        self.user_manager = user_manager
+
+    def check(self, actor_user_id, target_user_id, action):
+        "Returns an Access, the `denial` of which is None if the actor may take `action` on the target user"
+        assert action in AccessAction._ALL, f'Unrecognized access action `{action}`'
+        if actor_user_id == target_user_id:
+            target_user_item = self.user_manager.dynamo.get_user(target_user_id)
+            return Access(denial=None, target_user_item=target_user_item, follow_item=None)
+
+        # block, follow & user items live in the same table, so they can all be fetched together
+        keys = [
+            self.block_manager.dynamo.pk(target_user_id, actor_user_id),
+            self.block_manager.dynamo.pk(actor_user_id, target_user_id),
+            self.follower_manager.dynamo.pk(actor_user_id, target_user_id),
+            self.user_manager.dynamo.pk(target_user_id),
+        ]
+        items = self.user_manager.dynamo.client.batch_get_items(keys)
+        blocker_item, blocked_item, follow_item, target_user_item = items
+        failed = {
+            AccessDenial.BLOCKED_BY_TARGET: bool(blocker_item),
+            AccessDenial.BLOCKING_TARGET: bool(blocked_item),
+            AccessDenial.NOT_FOLLOWER: (
+                bool(target_user_item)
+                and target_user_item.get('privacyStatus') == UserPrivacyStatus.PRIVATE
+                and (follow_item or {}).get('followStatus') != FollowStatus.FOLLOWING
+            ),
+        }
+        denial = next((rule for rule in self.rules[action] if failed[rule]), None)
+        return Access(denial=denial, target_user_item=target_user_item, follow_item=follow_item)
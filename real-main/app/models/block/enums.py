@@ -4,3 +4,22 @@ class BlockStatus:
     SELF = 'SELF'
 
     _ALL = (NOT_BLOCKING, BLOCKING, SELF)
+
+
+class AccessAction:
+    LIKE = 'LIKE'
+    COMMENT = 'COMMENT'
+    FLAG = 'FLAG'
+    FLAG_POST = 'FLAG_POST'
+    FOLLOW = 'FOLLOW'
+    CHAT = 'CHAT'
+
+    _ALL = (LIKE, COMMENT, FLAG, FLAG_POST, FOLLOW, CHAT)
+
+
+class AccessDenial:
+    BLOCKED_BY_TARGET = 'BLOCKED_BY_TARGET'  # the target user blocks the actor
+    BLOCKING_TARGET = 'BLOCKING_TARGET'  # the actor blocks the target user
+    NOT_FOLLOWER = 'NOT_FOLLOWER'  # the target user is private, and the actor is not following them
+
+    _ALL = (BLOCKED_BY_TARGET, BLOCKING_TARGET, NOT_FOLLOWER)
@@ -2,6 +2,7 @@ import logging
 
 from app import models
 
+from .access import AccessPolicy
 from .dynamo import BlockDynamo
 from .enums import BlockStatus
 from .exceptions import NotBlocked
@@ -16,6 +17,8 @@ class BlockManager:
         self.chat_manager = managers.get('chat') or models.ChatManager(clients, managers=managers)
         self.follower_manager = managers.get('follower') or models.FollowerManager(clients, managers=managers)
         self.like_manager = managers.get('like') or models.LikeManager(clients, managers=managers)
+        self.user_manager = managers.get('user') or models.UserManager(clients, managers=managers)
+        self.access_policy = AccessPolicy(self, self.follower_manager, self.user_manager)
 
         self.clients = clients
         if 'dynamo' in clients:
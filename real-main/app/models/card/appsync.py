@@ -1,7 +1,5 @@
 import logging
 
-import gql
-
 logger = logging.getLogger()
 
 
@@ -10,8 +8,7 @@ class CardAppSync:
         self.client = appsync_client
 
     def trigger_notification(self, notification_type, user_id, card_id, title, action, sub_title=None):
-        mutation = gql.gql(
-            '''
+        mutation = '''
             mutation TriggerCardNotification ($input: CardNotificationInput!) {
                 triggerCardNotification (input: $input) {
                     userId
@@ -25,7 +22,6 @@ class CardAppSync:
                 }
             }
         '''
-        )
         input_obj = {
             'userId': user_id,
             'type': notification_type,
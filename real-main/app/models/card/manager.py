@@ -1,5 +1,6 @@
+import itertools
 import logging
-from functools import partialmethod
+from functools import partial, partialmethod
 
 import pendulum
 
@@ -34,6 +35,11 @@ class CardManager:
         item = self.dynamo.get_card(card_id, strongly_consistent=strongly_consistent)
         return self.init_card(item) if item else None
 
+    def get_cards(self, card_ids):
+        "Batch get cards. Returns a list aligned with `card_ids`, with None for cards that do not exist"
+        items = self.dynamo.client.batch_get_items([self.dynamo.pk(card_id) for card_id in card_ids])
+        return [self.init_card(item) if item else None for item in items]
+
     def init_card(self, item):
         kwargs = {
             'appsync': getattr(self, 'appsync', None),
@@ -96,11 +102,12 @@ class CardManager:
         # send on notifcations for cards for those users
         now = pendulum.now('utc')
         total_count, success_count = 0, 0
-        for card_id in self.dynamo.generate_card_ids_by_notify_user_at(now, only_user_ids=only_user_ids):
-            card = self.get_card(card_id)
-            success_count += card.notify_user()
-            total_count += 1
-            card.clear_notify_user_at()
+        card_ids_gen = self.dynamo.generate_card_ids_by_notify_user_at(now, only_user_ids=only_user_ids)
+        while card_ids := list(itertools.islice(card_ids_gen, self.dynamo.client.batch_get_chunk_size)):
+            for card in filter(None, self.get_cards(card_ids)):
+                success_count += card.notify_user()
+                total_count += 1
+                card.clear_notify_user_at()
         return total_count, success_count
 
     def on_card_add(self, card_id, new_item):
@@ -112,15 +119,23 @@ class CardManager:
     def on_card_delete(self, card_id, old_item):
         self.init_card(old_item).trigger_notification(CardNotificationType.DELETED)
 
-    def on_post_delete_delete_cards(self, post_id, old_item):
-        self.delete_by_post(post_id)
+    def on_post_delete_delete_cards(self, items):
+        key_generator = itertools.chain.from_iterable(
+            self.dynamo.generate_card_keys_by_post(post_id) for post_id, _, _ in items
+        )
+        self.dynamo.client.batch_delete_items(key_generator)
 
-    def on_comment_delete_delete_cards(self, comment_id, old_item):
-        self.delete_by_comment(comment_id)
+    def on_comment_delete_delete_cards(self, items):
+        key_generator = itertools.chain.from_iterable(
+            self.dynamo.generate_card_keys_by_comment(comment_id) for comment_id, _, _ in items
+        )
+        self.dynamo.client.batch_delete_items(key_generator)
 
-    def on_user_delete_delete_cards(self, user_id, old_item):
-        generator = self.dynamo.generate_cards_by_user(user_id, pks_only=True)
-        self.dynamo.client.batch_delete_items(generator)
+    def on_user_delete_delete_cards(self, items):
+        key_generator = itertools.chain.from_iterable(
+            self.dynamo.generate_cards_by_user(user_id, pks_only=True) for user_id, _, _ in items
+        )
+        self.dynamo.client.batch_delete_items(key_generator)
 
     def on_user_count_change_sync_card(self, dynamo_attr, card_template_class, user_id, new_item, old_item=None):
         cnt = new_item.get(dynamo_attr, 0)
@@ -141,27 +156,50 @@ class CardManager:
         templates.ChatCardTemplate,
     )
 
-    def on_post_original_post_id_change_update_card(self, post_id, new_item, old_item=None):
-        if original_post_id := new_item.get('originalPostId'):
-            if original_post := self.post_manager.get_post(original_post_id):
-                post = self.post_manager.init_post(new_item)
-                card_template = templates.PostRepostCardTemplate(original_post.user_id, post)
-                self.add_or_update_card(card_template)
-            else:
-                logger.warning(f'Original post `{original_post_id}` not found')
-
-        if original_post_id := (old_item or {}).get('originalPostId'):
-            if original_post := self.post_manager.get_post(original_post_id):
-                card_id = templates.PostRepostCardTemplate.get_card_id(original_post.user_id, post_id)
-                self.dynamo.delete_card(card_id)
-            else:
-                logger.warning(f'Original post `{original_post_id}` not found')
-
-    def on_post_view_count_change_update_cards(self, post_id, new_item, old_item=None):
-        if new_item.get('viewCount', 0) <= (old_item or {}).get('viewCount', 0):
-            return  # view count did not increase
-        _, viewed_by_user_id = new_item['sortKey'].split('/')
-        self.delete_by_post(post_id, user_id=viewed_by_user_id)
+    def on_post_original_post_id_change_update_card(self, items, loader=None):
+        original_post_ids = list(
+            dict.fromkeys(
+                original_post_id
+                for _, old_item, new_item in items
+                for original_post_id in (new_item.get('originalPostId'), (old_item or {}).get('originalPostId'))
+                if original_post_id
+            )
+        )
+        get_posts = partial(loader.load_many, 'post') if loader else self.post_manager.get_posts
+        original_posts = dict(zip(original_post_ids, get_posts(original_post_ids)))
+
+        for post_id, old_item, new_item in items:
+            try:
+                if original_post_id := new_item.get('originalPostId'):
+                    if original_post := original_posts[original_post_id]:
+                        post = self.post_manager.init_post(new_item)
+                        card_template = templates.PostRepostCardTemplate(original_post.user_id, post)
+                        self.add_or_update_card(card_template)
+                    else:
+                        logger.warning(f'Original post `{original_post_id}` not found')
+
+                if original_post_id := (old_item or {}).get('originalPostId'):
+                    if original_post := original_posts[original_post_id]:
+                        card_id = templates.PostRepostCardTemplate.get_card_id(original_post.user_id, post_id)
+                        self.dynamo.delete_card(card_id)
+                    else:
+                        logger.warning(f'Original post `{original_post_id}` not found')
+            except Exception as err:
+                logger.exception(str(err))
+
+    def on_post_view_count_change_update_cards(self, items):
+        post_and_user_ids = {}  # a dict rather than a set to keep stream order, each pair only once
+        for post_id, old_item, new_item in items:
+            if new_item.get('viewCount', 0) <= (old_item or {}).get('viewCount', 0):
+                continue  # view count did not increase
+            _, viewed_by_user_id = new_item['sortKey'].split('/')
+            post_and_user_ids[(post_id, viewed_by_user_id)] = None
+
+        key_generator = itertools.chain.from_iterable(
+            self.dynamo.generate_card_keys_by_post(post_id, user_id=user_id)
+            for post_id, user_id in post_and_user_ids
+        )
+        self.dynamo.client.batch_delete_items(key_generator)
 
     def on_post_comments_unviewed_count_change_update_card(self, post_id, new_item, old_item=None):
         new_cnt = new_item.get('commentsUnviewedCount', 0)
@@ -181,12 +219,12 @@ class CardManager:
             self.add_or_update_card(card_template)
 
     def on_text_tags_change_update_card(
-        self, manager_name, init_name, card_template_class, item_id, new_item, old_item=None
+        self, manager_name, init_name, card_template_class, item_id, new_item, old_item=None, record=None
     ):
         new_tagged_user_ids = [t['userId'] for t in new_item.get('textTags', [])]
         old_tagged_user_ids = [t['userId'] for t in (old_item or {}).get('textTags', [])]
         newly_tagged_user_ids = set(new_tagged_user_ids) - set(old_tagged_user_ids)
-        model = getattr(getattr(self, manager_name), init_name)(new_item)
+        model = record.new_model if record else getattr(getattr(self, manager_name), init_name)(new_item)
         for user_id in newly_tagged_user_ids:
             card_template = card_template_class(user_id, model)
             self.add_or_update_card(card_template)
@@ -0,0 +1,75 @@
+import logging
+
+import pendulum
+from boto3.dynamodb.conditions import Key
+
+logger = logging.getLogger()
+
+
+class CascadeDynamo:
+    def __init__(self, dynamo_client):
+        self.client = dynamo_client
+
+    def pk(self, name, item_id):
+        return {'partitionKey': f'cascade/{item_id}', 'sortKey': f'job/{name}'}
+
+    def get_job(self, name, item_id, strongly_consistent=False):
+        return self.client.get_item(self.pk(name, item_id), ConsistentRead=strongly_consistent)
+
+    def get_jobs(self, job_pks):
+        "Batch get jobs by their pks. Returns a list aligned with `job_pks`, with None for jobs that are gone"
+        return self.client.batch_get_items(job_pks)
+
+    def add_job(self, name, item_id, next_token, now=None):
+        "Add a job to continue cascade `name` for `item_id` from `next_token`. Returns None if already exists."
+        now = now or pendulum.now('utc')
+        now_str = now.to_iso8601_string()
+        query_kwargs = {
+            'Item': {
+                **self.pk(name, item_id),
+                'schemaVersion': 0,
+                'gsiK1PartitionKey': 'cascade',
+                'gsiK1SortKey': now_str,
+                'cascadeName': name,
+                'itemId': item_id,
+                'nextToken': next_token,
+                'sliceCount': 0,
+                'createdAt': now_str,
+                'lastSliceAt': now_str,
+            },
+        }
+        try:
+            return self.client.add_item(query_kwargs)
+        except self.client.exceptions.ConditionalCheckFailedException:
+            logger.warning(f'Cascade job `{name}` for `{item_id}` already exists')
+            return None
+
+    def advance_job(self, name, item_id, from_token, to_token, now=None):
+        """
+        Move the job's resume cursor from `from_token` to `to_token`, after a slice has been run.
+        Returns None if some other worker already moved it on.
+        """
+        now = now or pendulum.now('utc')
+        now_str = now.to_iso8601_string()
+        query_kwargs = {
+            'Key': self.pk(name, item_id),
+            'UpdateExpression': 'SET nextToken = :tt, lastSliceAt = :now, gsiK1SortKey = :now ADD sliceCount :one',
+            'ConditionExpression': 'nextToken = :ft',
+            'ExpressionAttributeValues': {':ft': from_token, ':tt': to_token, ':now': now_str, ':one': 1},
+        }
+        failure_warning = f'Cascade job `{name}` for `{item_id}` already advanced from `{from_token}`'
+        return self.client.update_item(query_kwargs, failure_warning=failure_warning)
+
+    def delete_job(self, name, item_id):
+        return self.client.delete_item(self.pk(name, item_id))
+
+    def generate_job_pks_stalled_since(self, cut_off_at):
+        "Generate the pks of jobs that have not had a slice run since `cut_off_at`"
+        query_kwargs = {
+            'KeyConditionExpression': (
+                Key('gsiK1PartitionKey').eq('cascade') & Key('gsiK1SortKey').lt(cut_off_at.to_iso8601_string())
+            ),
+            'IndexName': 'GSI-K1',
+            'ProjectionExpression': 'partitionKey, sortKey',
+        }
+        return self.client.generate_all_query(query_kwargs)
@@ -0,0 +1,77 @@
+import logging
+
+import pendulum
+
+from app.logging import LogLevelContext
+
+from .dynamo import CascadeDynamo
+
+logger = logging.getLogger()
+
+
+class CascadeManager:
+    """
+    Runs cascades of work that may be too big to finish in one go, such as deleting everything a user has
+    ever posted, in bounded slices.
+
+    A cascade is registered by name with a function `run_slice(item_id, limit, next_token)` that processes
+    up to `limit` of the remaining work, and returns a token to resume from or None if there's none left.
+    The first slice is run inline. If there's more to do, a job holding the resume token is added to the
+    table, and the dynamo stream runs the rest a slice at a time as the job advances. Jobs that have stalled,
+    say because a slice failed, are resumed periodically.
+    """
+
+    default_slice_size = 25
+    stalled_after = pendulum.duration(minutes=15)
+
+    def __init__(self, clients, managers=None):
+        managers = managers or {}
+        managers['cascade'] = self
+        self.cascades = {}  # name -> (run_slice, slice_size)
+
+        self.clients = clients
+        if 'dynamo' in clients:
+            self.dynamo = CascadeDynamo(clients['dynamo'])
+
+    def register(self, name, run_slice, slice_size=None):
+        self.cascades[name] = (run_slice, slice_size or self.default_slice_size)
+
+    def run(self, name, item_id, now=None):
+        "Run the first slice of a cascade, and queue a job to continue it if there's more"
+        run_slice, slice_size = self.cascades[name]
+        next_token = run_slice(item_id, slice_size, None)
+        if next_token:
+            self.dynamo.add_job(name, item_id, next_token, now=now)
+
+    def run_job_slice(self, name, item_id, next_token, now=None):
+        "Run the next slice of a queued job, and then record the job's progress or remove it if done"
+        run_slice, slice_size = self.cascades[name]
+        to_token = run_slice(item_id, slice_size, next_token)
+        if to_token:
+            self.dynamo.advance_job(name, item_id, next_token, to_token, now=now)
+        else:
+            self.dynamo.delete_job(name, item_id)
+            with LogLevelContext(logger, logging.INFO):
+                logger.info(f'Cascade `{name}` for `{item_id}` completed')
+
+    def on_job_add_edit_run_slice(self, item_id, new_item, old_item=None):
+        # each slice advances the job, which triggers the next slice
+        self.run_job_slice(new_item['cascadeName'], item_id, new_item['nextToken'])
+
+    def resume_stalled_jobs(self, now=None):
+        "Run the next slice of jobs that haven't progressed recently. Returns count of jobs resumed."
+        now = now or pendulum.now('utc')
+        count = 0
+        job_pks = list(self.dynamo.generate_job_pks_stalled_since(now - self.stalled_after))
+        for job_item in filter(None, self.dynamo.get_jobs(job_pks)):
+            name, item_id = job_item['cascadeName'], job_item['itemId']
+            logger.warning(
+                f'Resuming stalled cascade `{name}` for `{item_id}` after {job_item["sliceCount"]} slices'
+            )
+            try:
+                self.run_job_slice(name, item_id, job_item['nextToken'], now=now)
+            except Exception as err:
+                logger.exception(f'Cascade `{name}` for `{item_id}` failed: {err}')
+            else:
+                count += 1
+        return count
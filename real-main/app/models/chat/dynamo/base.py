@@ -94,7 +94,7 @@ class ChatDynamo:
         return self.client.update_item(query_kwargs, failure_warning=msg)
 
     def increment_flag_count(self, chat_id):
-        return self.client.increment_count(self.pk(chat_id), 'flagCount')
+        return self.client.increment_count(self.pk(chat_id), 'flagCount', defer=False)
 
     def decrement_flag_count(self, chat_id):
         return self.client.decrement_count(self.pk(chat_id), 'flagCount')
@@ -7,6 +7,7 @@ from app import models
 from app.mixins.base import ManagerBase
 from app.mixins.flag.manager import FlagManagerMixin
 from app.mixins.view.manager import ViewManagerMixin
+from app.models.block.enums import AccessAction, AccessDenial
 
 from .dynamo import ChatDynamo, ChatMemberDynamo
 from .enums import ChatType
@@ -42,6 +43,11 @@ class ChatManager(FlagManagerMixin, ViewManagerMixin, ManagerBase):
         item = self.dynamo.get(chat_id, strongly_consistent=strongly_consistent)
         return self.init_chat(item) if item else None
 
+    def get_chats(self, chat_ids):
+        "Batch get chats. Returns a list aligned with `chat_ids`, with None for chats that do not exist"
+        items = self.dynamo.client.batch_get_items([self.dynamo.pk(chat_id) for chat_id in chat_ids])
+        return [self.init_chat(item) for item in items]
+
     def get_direct_chat(self, user_id_1, user_id_2):
         item = self.dynamo.get_direct_chat(user_id_1, user_id_2)
         return self.init_chat(item) if item else None
@@ -66,9 +72,10 @@ class ChatManager(FlagManagerMixin, ViewManagerMixin, ManagerBase):
             raise ChatException(f'User `{created_by_user_id}` cannot open direct chat with themselves')
 
         # can't chat if there's a blocking relationship, either direction
-        if self.block_manager.is_blocked(created_by_user_id, with_user_id):
+        access = self.block_manager.access_policy.check(created_by_user_id, with_user_id, AccessAction.CHAT)
+        if access.denial == AccessDenial.BLOCKING_TARGET:
             raise ChatException(f'User `{created_by_user_id}` has blocked user `{with_user_id}`')
-        if self.block_manager.is_blocked(with_user_id, created_by_user_id):
+        if access.denial == AccessDenial.BLOCKED_BY_TARGET:
             raise ChatException(f'User `{created_by_user_id}` has been blocked by `{with_user_id}`')
 
         # can't add a chat if one already exists between the two users
@@ -127,8 +134,9 @@ class ChatManager(FlagManagerMixin, ViewManagerMixin, ManagerBase):
                 chat.leave(user)
 
     def record_views(self, chat_ids, user_id, viewed_at=None):
-        for chat_id, view_count in dict(collections.Counter(chat_ids)).items():
-            chat = self.get_chat(chat_id)
+        grouped_chat_ids = dict(collections.Counter(chat_ids))
+        chats = self.get_chats(list(grouped_chat_ids.keys()))
+        for chat, (chat_id, view_count) in zip(chats, grouped_chat_ids.items()):
             if not chat:
                 logger.warning(f'Cannot record view(s) by user `{user_id}` on DNE chat `{chat_id}`')
             elif not chat.is_member(user_id):
@@ -1,7 +1,5 @@
 import logging
 
-import gql
-
 logger = logging.getLogger()
 
 
@@ -9,50 +7,75 @@ class ChatMessageAppSync:
     def __init__(self, appsync_client):
         self.client = appsync_client
 
-    def trigger_notification(self, notification_type, user_id, message):
-        mutation = gql.gql(
-            '''
-            mutation TriggerChatMessageNotification ($input: ChatMessageNotificationInput!) {
-                triggerChatMessageNotification (input: $input) {
+    notification_selection = '''
+        userId
+        type
+        message {
+            messageId
+            chat {
+                chatId
+            }
+            authorUserId
+            author {
+                userId
+                username
+                photo {
+                    url64p
+                }
+            }
+            text
+            textTaggedUsers {
+                tag
+                user {
                     userId
-                    type
-                    message {
-                        messageId
-                        chat {
-                            chatId
-                        }
-                        authorUserId
-                        author {
-                            userId
-                            username
-                            photo {
-                                url64p
-                            }
-                        }
-                        text
-                        textTaggedUsers {
-                            tag
-                            user {
-                                userId
-                            }
-                        }
-                        createdAt
-                        lastEditedAt
-                    }
                 }
             }
+            createdAt
+            lastEditedAt
+        }
+    '''
+
+    def trigger_notification(self, notification_type, user_id, message):
+        mutation = f'''
+            mutation TriggerChatMessageNotification ($input: ChatMessageNotificationInput!) {{
+                triggerChatMessageNotification (input: $input) {{
+                    {self.notification_selection}
+                }}
+            }}
         '''
+        input_obj = self.notification_input(notification_type, user_id, message)
+        self.client.send(mutation, {'input': input_obj})
+
+    def trigger_notifications(self, notification_type, user_ids, message):
+        """
+        Trigger the notification for each of `user_ids`, in as few requests as possible.
+        If any fail, an exception is raised once all have been sent, those of the others having gone through.
+        """
+        # the relationships of all the recipients to the author are fetched together
+        relationships = message.get_author_relationships(user_ids)
+        input_objs = [
+            self.notification_input(notification_type, user_id, message, relationship=relationship)
+            for user_id, relationship in zip(user_ids, relationships)
+        ]
+        failures = self.client.send_batch(
+            'triggerChatMessageNotification',
+            'ChatMessageNotificationInput',
+            input_objs,
+            self.notification_selection,
         )
-        input_obj = {
+        if failures:
+            raise Exception(f'Appsync chat message notifications failed: `{failures}`')
+
+    def notification_input(self, notification_type, user_id, message, relationship=None):
+        return {
             'userId': user_id,
             'messageId': message.id,
             'chatId': message.chat_id,
             'authorUserId': message.user_id,
-            'authorEncoded': message.get_author_encoded(user_id),
+            'authorEncoded': message.get_author_encoded(user_id, relationship=relationship),
             'type': notification_type,
             'text': message.item['text'],
             'textTaggedUserIds': message.item.get('textTags', []),
             'createdAt': message.item['createdAt'],
             'lastEditedAt': message.item.get('lastEditedAt'),
         }
-        self.client.send(mutation, {'input': input_obj})
@@ -50,7 +50,7 @@ class ChatMessageDynamo:
         return self.client.update_item(query_kwargs)
 
     def increment_flag_count(self, message_id):
-        return self.client.increment_count(self.pk(message_id), 'flagCount')
+        return self.client.increment_count(self.pk(message_id), 'flagCount', defer=False)
 
     def decrement_flag_count(self, message_id):
         return self.client.decrement_count(self.pk(message_id), 'flagCount')
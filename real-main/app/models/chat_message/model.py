@@ -1,4 +1,5 @@
 import decimal
+import itertools
 import json
 import logging
 
@@ -67,7 +68,7 @@ class ChatMessage(FlagModelMixin):
 
     def serialize(self, caller_user_id):
         resp = self.item.copy()
-        resp['author'] = self.user_manager.get_user(self.user_id).serialize(caller_user_id)
+        resp['author'] = self.user_manager.serialize_many(caller_user_id, [self.author])[0]
         return resp
 
     def edit(self, text, now=None):
@@ -99,32 +100,35 @@ class ChatMessage(FlagModelMixin):
         dynamo may not have converged yet.
         """
         user_ids = user_ids or []
-        already_notified_user_ids = set([self.user_id])  # don't notify the msg author
-
-        for user_id in user_ids:
-            if user_id in already_notified_user_ids:
-                continue
-            self.appsync.trigger_notification(notification_type, user_id, self)
-            already_notified_user_ids.add(user_id)
-
-        for user_id in self.chat_manager.member_dynamo.generate_user_ids_by_chat(self.chat_id):
-            if user_id in already_notified_user_ids:
-                continue
-            self.appsync.trigger_notification(notification_type, user_id, self)
+        member_user_ids = self.chat_manager.member_dynamo.generate_user_ids_by_chat(self.chat_id)
+        # dedupe, keeping order, and don't notify the msg author
+        notify_user_ids = [
+            user_id
+            for user_id in dict.fromkeys(itertools.chain(user_ids, member_user_ids))
+            if user_id != self.user_id
+        ]
+        self.appsync.trigger_notifications(notification_type, notify_user_ids, self)
+
+    def get_author_relationships(self, user_ids):
+        "Relationships of each of `user_ids` to the author, fetched in batch. All None if there is no author."
+        if not self.user_id:
+            return [None] * len(user_ids)
+        pairs = [(user_id, self.user_id) for user_id in user_ids]
+        return self.user_manager.relationship_service.get_pair_relationships(pairs)
 
-    def get_author_encoded(self, user_id):
+    def get_author_encoded(self, user_id, relationship=None):
         """
         Return the author in a serialized, stringified form if they exist and there is no
         blocking relationship between the given user and the author.
+        The given user's `relationship` to the author may be passed in, if already fetched in batch.
         """
         if not self.author:
             return None
-        serialized = self.author.serialize(user_id)
-        if serialized['blockerStatus'] == BlockStatus.BLOCKING:
-            return None
-        serialized['blockedStatus'] = self.block_manager.get_block_status(user_id, self.author.id)
-        if serialized['blockedStatus'] == BlockStatus.BLOCKING:
+        relationship = relationship or self.get_author_relationships([user_id])[0]
+        if BlockStatus.BLOCKING in (relationship['blockerStatus'], relationship['blockedStatus']):
             return None
+        serialized = self.author.serialize(user_id, relationship=relationship)
+        serialized['blockedStatus'] = relationship['blockedStatus']
         return json.dumps(serialized, cls=DecimalJsonEncoder)
 
     def is_crowdsourced_forced_removal_criteria_met(self):
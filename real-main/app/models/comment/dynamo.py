@@ -49,17 +49,17 @@ class CommentDynamo:
         return self.client.delete_item(self.pk(comment_id))
 
     def increment_flag_count(self, comment_id):
-        return self.client.increment_count(self.pk(comment_id), 'flagCount')
+        return self.client.increment_count(self.pk(comment_id), 'flagCount', defer=False)
 
     def decrement_flag_count(self, comment_id):
         return self.client.decrement_count(self.pk(comment_id), 'flagCount')
 
-    def generate_by_post(self, post_id):
+    def generate_by_post(self, post_id, prefetch_pages=0):
         query_kwargs = {
             'KeyConditionExpression': Key('gsiA1PartitionKey').eq(f'comment/{post_id}'),
             'IndexName': 'GSI-A1',
         }
-        return self.client.generate_all_query(query_kwargs)
+        return self.client.generate_all_query(query_kwargs, prefetch_pages=prefetch_pages)
 
     def generate_by_user(self, user_id):
         query_kwargs = {
@@ -67,3 +67,11 @@ class CommentDynamo:
             'IndexName': 'GSI-A2',
         }
         return self.client.generate_all_query(query_kwargs)
+
+    def query_by_user(self, user_id, limit=None, next_token=None):
+        "Return a page of the user's comments and a token to continue from, as {'items': ..., 'nextToken': ...}"
+        query_kwargs = {
+            'KeyConditionExpression': Key('gsiA2PartitionKey').eq(f'comment/{user_id}'),
+            'IndexName': 'GSI-A2',
+        }
+        return self.client.query(query_kwargs, limit=limit, next_token=next_token)
@@ -5,8 +5,7 @@ import pendulum
 from app import models
 from app.mixins.base import ManagerBase
 from app.mixins.flag.manager import FlagManagerMixin
-from app.models.follower.enums import FollowStatus
-from app.models.user.enums import UserPrivacyStatus
+from app.models.block.enums import AccessAction, AccessDenial
 
 from .dynamo import CommentDynamo
 from .exceptions import CommentException
@@ -24,6 +23,7 @@ class CommentManager(FlagManagerMixin, ManagerBase):
         managers = managers or {}
         managers['comment'] = self
         self.block_manager = managers.get('block') or models.BlockManager(clients, managers=managers)
+        self.cascade_manager = managers.get('cascade') or models.CascadeManager(clients, managers=managers)
         self.follower_manager = managers.get('follower') or models.FollowerManager(clients, managers=managers)
         self.post_manager = managers.get('post') or models.PostManager(clients, managers=managers)
         self.user_manager = managers.get('user') or models.UserManager(clients, managers=managers)
@@ -31,6 +31,8 @@ class CommentManager(FlagManagerMixin, ManagerBase):
         if 'dynamo' in clients:
             self.dynamo = CommentDynamo(clients['dynamo'])
 
+        self.cascade_manager.register('deleteCommentsByUser', self.delete_slice_by_user)
+
     def get_model(self, item_id):
         return self.get_comment(item_id)
 
@@ -38,6 +40,11 @@ class CommentManager(FlagManagerMixin, ManagerBase):
         comment_item = self.dynamo.get_comment(comment_id)
         return self.init_comment(comment_item) if comment_item else None
 
+    def get_comments(self, comment_ids):
+        "Batch get comments. Returns a list aligned with `comment_ids`, with None for comments that do not exist"
+        comment_items = self.dynamo.client.batch_get_items([self.dynamo.pk(cid) for cid in comment_ids])
+        return [self.init_comment(comment_item) if comment_item else None for comment_item in comment_items]
+
     def init_comment(self, comment_item):
         kwargs = {
             'dynamo': getattr(self, 'dynamo', None),
@@ -60,31 +67,35 @@ class CommentManager(FlagManagerMixin, ManagerBase):
             raise CommentException(f'Comments are disabled on post `{post_id}`')
 
         if user_id != post.user_id:
-
-            # can't comment if there's a blocking relationship, either direction
-            if self.block_manager.is_blocked(post.user_id, user_id):
-                raise CommentException(f'Post owner `{post.user_id}` has blocked user `{user_id}`')
-            if self.block_manager.is_blocked(user_id, post.user_id):
-                raise CommentException(f'User `{user_id}` has blocked post owner `{post.user_id}`')
-
+            # can't comment if there's a blocking relationship, either direction, and
             # if post owner is private, must be a follower to comment
-            poster = self.user_manager.get_user(post.user_id)
-            if poster.item['privacyStatus'] == UserPrivacyStatus.PRIVATE:
-                follow = self.follower_manager.get_follow(user_id, post.user_id)
-                if not follow or follow.status != FollowStatus.FOLLOWING:
-                    msg = f'Post owner `{post.user_id}` is private and user `{user_id}` is not a follower'
-                    raise CommentException(msg)
+            access = self.block_manager.access_policy.check(user_id, post.user_id, AccessAction.COMMENT)
+            denial_messages = {
+                AccessDenial.BLOCKED_BY_TARGET: f'Post owner `{post.user_id}` has blocked user `{user_id}`',
+                AccessDenial.BLOCKING_TARGET: f'User `{user_id}` has blocked post owner `{post.user_id}`',
+                AccessDenial.NOT_FOLLOWER: (
+                    f'Post owner `{post.user_id}` is private and user `{user_id}` is not a follower'
+                ),
+            }
+            if access.denial:
+                raise CommentException(denial_messages[access.denial])
 
         text_tags = self.user_manager.get_text_tags(text)
         comment_item = self.dynamo.add_comment(comment_id, post_id, user_id, text, text_tags, commented_at=now)
         return self.init_comment(comment_item)
 
     def on_user_delete_delete_all_by_user(self, user_id, old_item):
-        for comment_item in self.dynamo.generate_by_user(user_id):
+        self.cascade_manager.run('deleteCommentsByUser', user_id)
+
+    def delete_slice_by_user(self, user_id, limit, next_token=None):
+        "Delete up to `limit` of the user's comments, return a token to continue from or None if there are no more"
+        paginated = self.dynamo.query_by_user(user_id, limit=limit, next_token=next_token)
+        for comment_item in paginated['items']:
             self.init_comment(comment_item).delete()
+        return paginated['nextToken']
 
     def delete_all_on_post(self, post_id):
-        for comment_item in self.dynamo.generate_by_post(post_id):
+        for comment_item in self.dynamo.generate_by_post(post_id, prefetch_pages=2):
             self.init_comment(comment_item).delete()
 
     def on_flag_add(self, comment_id, new_item):
@@ -65,7 +65,8 @@ class Comment(FlagModelMixin):
 
     def serialize(self, caller_user_id):
         resp = self.item.copy()
-        resp['commentedBy'] = self.user_manager.get_user(self.user_id).serialize(caller_user_id)
+        user = self.user_manager.get_user(self.user_id)
+        resp['commentedBy'] = self.user_manager.serialize_many(caller_user_id, [user])[0]
         return resp
 
     def delete(self, deleter_user_id=None, forced=False):
@@ -21,9 +21,15 @@ class FeedDynamo:
 
     def add_post_to_feeds(self, feed_user_id_generator, post_item):
         "Add the post to all the feeds of the generated user_ids, return a list of those user_ids"
-        feed_user_ids = list(feed_user_id_generator)
-        item_generator = (self.item(feed_user_id, post_item) for feed_user_id in feed_user_ids)
-        self.feed_client.batch_put_items(item_generator)
+        feed_user_ids = []
+
+        def generate_items():
+            # the generator is consumed as writes proceed, so note the user_ids as they go by
+            for feed_user_id in feed_user_id_generator:
+                feed_user_ids.append(feed_user_id)
+                yield self.item(feed_user_id, post_item)
+
+        self.feed_client.batch_put_items(generate_items())
         return feed_user_ids
 
     def delete_by_post_owner(self, feed_user_id, post_user_id):
@@ -33,9 +39,14 @@ class FeedDynamo:
 
     def delete_by_post(self, post_id):
         "Delete all feed items of `post_id`, return a list of affected user_ids"
-        keys = list(self.generate_keys_by_post(post_id))
-        feed_user_ids = [key['feedUserId'] for key in keys]
-        self.feed_client.batch_delete(k for k in keys)
+        feed_user_ids = []
+
+        def generate_keys():
+            for key in self.generate_keys_by_post(post_id):
+                feed_user_ids.append(key['feedUserId'])
+                yield key
+
+        self.feed_client.batch_delete(generate_keys())
         return feed_user_ids
 
     def generate_items(self, feed_user_id):
@@ -30,7 +30,8 @@ class FeedManager:
 
     def add_post_to_followers_feeds(self, followed_user_id, post_item):
         user_id_gen = itertools.chain(
-            [followed_user_id], self.follower_manager.generate_follower_user_ids(followed_user_id)
+            [followed_user_id],
+            self.follower_manager.generate_follower_user_ids(followed_user_id, prefetch_pages=2),
         )
         return self.dynamo.add_post_to_feeds(user_id_gen, post_item)
 
@@ -50,5 +51,6 @@ class FeedManager:
             feed_user_ids = self.add_post_to_followers_feeds(posted_by_user_id, new_item)
         else:
             feed_user_ids = self.dynamo.delete_by_post(post_id)
-        for user_id in feed_user_ids:
-            self.appsync_client.fire_notification(user_id, GqlNotificationType.USER_FEED_CHANGED)
+        self.appsync_client.fire_notifications(
+            {'userId': user_id, 'type': GqlNotificationType.USER_FEED_CHANGED} for user_id in feed_user_ids
+        )
@@ -68,7 +68,7 @@ class FollowerDynamo:
             query_kwargs['ProjectionExpression'] = 'partitionKey, sortKey'
         return self.client.generate_all_query(query_kwargs)
 
-    def generate_follower_items(self, user_id, follow_status=None, keys_only=False):
+    def generate_follower_items(self, user_id, follow_status=None, keys_only=False, prefetch_pages=0):
         "Generate items that represent a follower of the given user (that the given user is the followed)"
         key_conditions = [Key('gsiA2PartitionKey').eq(f'followed/{user_id}')]
         if follow_status is not None:
@@ -79,4 +79,4 @@ class FollowerDynamo:
         }
         if keys_only:
             query_kwargs['ProjectionExpression'] = 'partitionKey, sortKey'
-        return self.client.generate_all_query(query_kwargs)
+        return self.client.generate_all_query(query_kwargs, prefetch_pages=prefetch_pages)
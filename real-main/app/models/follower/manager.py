@@ -2,6 +2,7 @@ import logging
 from itertools import chain
 
 from app import models
+from app.models.block.enums import AccessAction, AccessDenial
 from app.models.user.enums import UserPrivacyStatus
 from app.utils import GqlNotificationType
 
@@ -45,9 +46,11 @@ class FollowerManager:
             return FollowStatus.NOT_FOLLOWING
         return follow.status
 
-    def generate_follower_user_ids(self, followed_user_id, follow_status=None):
+    def generate_follower_user_ids(self, followed_user_id, follow_status=None, prefetch_pages=0):
         "Return a generator that produces user ids of users that follow the given user"
-        gen = self.dynamo.generate_follower_items(followed_user_id, follow_status=follow_status)
+        gen = self.dynamo.generate_follower_items(
+            followed_user_id, follow_status=follow_status, prefetch_pages=prefetch_pages
+        )
         gen = map(lambda item: item['followerUserId'], gen)
         return gen
 
@@ -59,15 +62,16 @@ class FollowerManager:
 
     def request_to_follow(self, follower_user, followed_user):
         "Returns the status of the follow request"
-        if self.get_follow(follower_user.id, followed_user.id):
+        access = self.block_manager.access_policy.check(follower_user.id, followed_user.id, AccessAction.FOLLOW)
+        if access.follow_item:
             raise FollowerAlreadyExists(follower_user.id, followed_user.id)
 
         # can't follow a user that has blocked us
-        if self.block_manager.is_blocked(followed_user.id, follower_user.id):
+        if access.denial == AccessDenial.BLOCKED_BY_TARGET:
             raise FollowerException(f'User has been blocked by user `{followed_user.id}`')
 
         # can't follow a user we have blocked
-        if self.block_manager.is_blocked(follower_user.id, followed_user.id):
+        if access.denial == AccessDenial.BLOCKING_TARGET:
             raise FollowerException(f'User has blocked user `{followed_user.id}`')
 
         follow_status = (
@@ -114,7 +118,9 @@ class FollowerManager:
             None,
         )
 
-        follower_uids_generator = self.generate_follower_user_ids(user_id, follow_status=FollowStatus.FOLLOWING)
+        follower_uids_generator = self.generate_follower_user_ids(
+            user_id, follow_status=FollowStatus.FOLLOWING, prefetch_pages=2
+        )
         if ffs_prev and not ffs_now:
             # a story was deleted, and there are no more stories to take its place as ffs
             self.first_story_dynamo.delete_all(follower_uids_generator, user_id)
@@ -64,12 +64,12 @@ class LikeDynamo:
         except self.client.exceptions.ConditionalCheckFailedException as err:
             raise NotLikedWithStatus(liked_by_user_id, post_id, like_status) from err
 
-    def generate_of_post(self, post_id):
+    def generate_of_post(self, post_id, prefetch_pages=0):
         query_kwargs = {
             'KeyConditionExpression': Key('gsiA2PartitionKey').eq(f'like/{post_id}'),
             'IndexName': 'GSI-A2',
         }
-        return self.client.generate_all_query(query_kwargs)
+        return self.client.generate_all_query(query_kwargs, prefetch_pages=prefetch_pages)
 
     def generate_by_liked_by(self, liked_by_user_id):
         query_kwargs = {
@@ -78,6 +78,14 @@ class LikeDynamo:
         }
         return self.client.generate_all_query(query_kwargs)
 
+    def query_by_liked_by(self, liked_by_user_id, limit=None, next_token=None):
+        "Return a page of the user's likes and a token to continue from, as {'items': ..., 'nextToken': ...}"
+        query_kwargs = {
+            'KeyConditionExpression': Key('gsiA1PartitionKey').eq(f'like/{liked_by_user_id}'),
+            'IndexName': 'GSI-A1',
+        }
+        return self.client.query(query_kwargs, limit=limit, next_token=next_token)
+
     def generate_pks_by_liked_by_for_posted_by(self, liked_by_user_id, posted_by_user_id):
         key_conditions = [
             Key('gsiK2PartitionKey').eq(f'like/{posted_by_user_id}'),
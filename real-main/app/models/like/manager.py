@@ -1,6 +1,7 @@
 import logging
 
 from app import models
+from app.models.block.enums import AccessAction, AccessDenial
 from app.models.follower.enums import FollowStatus
 from app.models.post.enums import PostStatus
 from app.models.user.enums import UserPrivacyStatus
@@ -18,6 +19,7 @@ class LikeManager:
         managers = managers or {}
         managers['like'] = self
         self.block_manager = managers.get('block') or models.BlockManager(clients, managers=managers)
+        self.cascade_manager = managers.get('cascade') or models.CascadeManager(clients, managers=managers)
         self.follower_manager = managers.get('follower') or models.FollowerManager(clients, managers=managers)
         self.post_manager = managers.get('post') or models.PostManager(clients, managers=managers)
         self.user_manager = managers.get('user') or models.UserManager(clients, managers=managers)
@@ -26,6 +28,8 @@ class LikeManager:
         if 'dynamo' in clients:
             self.dynamo = LikeDynamo(clients['dynamo'])
 
+        self.cascade_manager.register('dislikeLikesByUser', self.dislike_slice_by_user)
+
     def get_like(self, user_id, post_id):
         like_item = self.dynamo.get_like(user_id, post_id)
         return self.init_like(like_item) if like_item else None
@@ -34,21 +38,17 @@ class LikeManager:
         return Like(like_item, self.dynamo, post_manager=self.post_manager)
 
     def like_post(self, user, post, like_status, now=None):
-        # can't like a post of a user that has blocked us
-        if self.block_manager.is_blocked(post.user_id, user.id):
-            raise LikeException(f'User has been blocked by owner of post `{post.id}`')
-
-        # can't like a post of a user we have blocked
-        if self.block_manager.is_blocked(user.id, post.user_id):
-            raise LikeException(f'User has blocked owner of post `{post.id}`')
-
+        # can't like a post if there's a blocking relationship, either direction, and
         # if the post is from a private user (other than ourselves) then we must be a follower to like the post
-        posted_by_user = self.user_manager.get_user(post.user_id)
-        if user.id != posted_by_user.id:
-            if posted_by_user.item['privacyStatus'] != UserPrivacyStatus.PUBLIC:
-                follow = self.follower_manager.get_follow(user.id, posted_by_user.id)
-                if not follow or follow.status != FollowStatus.FOLLOWING:
-                    raise LikeException(f'User does not have access to post `{post.id}`')
+        access = self.block_manager.access_policy.check(user.id, post.user_id, AccessAction.LIKE)
+        denial_messages = {
+            AccessDenial.BLOCKED_BY_TARGET: f'User has been blocked by owner of post `{post.id}`',
+            AccessDenial.BLOCKING_TARGET: f'User has blocked owner of post `{post.id}`',
+            AccessDenial.NOT_FOLLOWER: f'User does not have access to post `{post.id}`',
+        }
+        if access.denial:
+            raise LikeException(denial_messages[access.denial])
+        posted_by_user_item = access.target_user_item
 
         if post.status != PostStatus.COMPLETED:
             raise LikeException(f'Cannot like posts with status `{post.status}`')
@@ -56,8 +56,8 @@ class LikeManager:
         if post.item.get('likesDisabled'):
             raise LikeException(f'Likes are disabled for this post `{post.id}`')
 
-        if posted_by_user.item.get('likesDisabled'):
-            raise LikeException(f'Owner of this post (user `{posted_by_user.id}` has disabled likes')
+        if posted_by_user_item.get('likesDisabled'):
+            raise LikeException(f'Owner of this post (user `{post.user_id}` has disabled likes')
 
         if user.item.get('likesDisabled'):
             raise LikeException(f'Caller `{user.id}` has disabled likes')
@@ -69,7 +69,7 @@ class LikeManager:
 
     def dislike_all_of_post(self, post_id):
         "Dislike all likes of a post"
-        for like_item in self.dynamo.generate_of_post(post_id):
+        for like_item in self.dynamo.generate_of_post(post_id, prefetch_pages=2):
             self.init_like(like_item).dislike()
 
     def dislike_all_by_user_from_user(self, liked_by_user_id, posted_by_user_id):
@@ -80,8 +80,14 @@ class LikeManager:
 
     def on_user_delete_dislike_all_by_user(self, user_id, old_item):
         "Dislike all likes by a user"
-        for like_item in self.dynamo.generate_by_liked_by(user_id):
+        self.cascade_manager.run('dislikeLikesByUser', user_id)
+
+    def dislike_slice_by_user(self, user_id, limit, next_token=None):
+        "Dislike up to `limit` of the user's likes, return a token to continue from or None if there are no more"
+        paginated = self.dynamo.query_by_liked_by(user_id, limit=limit, next_token=next_token)
+        for like_item in paginated['items']:
             self.init_like(like_item).dislike()
+        return paginated['nextToken']
 
     def on_user_follow_status_change_sync_likes(self, user_id, new_item=None, old_item=None):
         "For consistency, delete likes of posts of private users by non-followers"
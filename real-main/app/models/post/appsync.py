@@ -1,7 +1,5 @@
 import logging
 
-import gql
-
 logger = logging.getLogger()
 
 
@@ -10,8 +8,7 @@ class PostAppSync:
         self.client = appsync_client
 
     def trigger_notification(self, notification_type, post):
-        mutation = gql.gql(
-            '''
+        mutation = '''
             mutation TriggerPostNotification ($input: PostNotificationInput!) {
                 triggerPostNotification (input: $input) {
                     userId
@@ -24,7 +21,6 @@ class PostAppSync:
                 }
             }
         '''
-        )
         input_obj = {
             'userId': post.user_id,
             'type': notification_type,
@@ -51,6 +51,14 @@ class PostDynamo:
             query_kwargs['FilterExpression'] = filter_exp(PostStatus.COMPLETED)
         return self.client.generate_all_query(query_kwargs)
 
+    def query_posts_by_user(self, user_id, limit=None, next_token=None):
+        "Return a page of the user's posts and a token to continue from, as {'items': ..., 'nextToken': ...}"
+        query_kwargs = {
+            'KeyConditionExpression': Key('gsiA2PartitionKey').eq(f'post/{user_id}'),
+            'IndexName': 'GSI-A2',
+        }
+        return self.client.query(query_kwargs, limit=limit, next_token=next_token)
+
     def generate_expired_post_pks_by_day(self, date, cut_off_time=None):
         key_conditions = [Key('gsiK1PartitionKey').eq(f'post/{date}')]
         if cut_off_time:
@@ -62,15 +70,18 @@ class PostDynamo:
         }
         return self.client.generate_all_query(query_kwargs)
 
-    def generate_expired_post_pks_with_scan(self, cut_off_date):
-        "Do a table **scan** to generate pks of expired posts. Does *not* include cut_off_date."
+    def generate_expired_post_pks_with_scan(self, cut_off_date, total_segments=None):
+        """
+        Do a table **scan** to generate pks of expired posts. Does *not* include cut_off_date.
+        If total_segments is given, the scan is done in parallel and pks are generated in no particular order.
+        """
         query_kwargs = {
             'FilterExpression': (
                 Attr('partitionKey').begins_with('post/') & Attr('expiresAt').lt(str(cut_off_date))
             ),
             'ProjectionExpression': 'partitionKey, sortKey',
         }
-        return self.client.generate_all_scan(query_kwargs)
+        return self.client.generate_all_scan(query_kwargs, total_segments=total_segments)
 
     def add_pending_post(
         self,
@@ -139,7 +150,7 @@ class PostDynamo:
         return self.client.add_item({'Item': item})
 
     def increment_flag_count(self, post_id):
-        return self.client.increment_count(self.pk(post_id), 'flagCount')
+        return self.client.increment_count(self.pk(post_id), 'flagCount', defer=False)
 
     def decrement_flag_count(self, post_id):
         return self.client.decrement_count(self.pk(post_id), 'flagCount')
@@ -376,7 +387,7 @@ class PostDynamo:
         return self.client.decrement_count(self.pk(post_id), 'commentCount')
 
     def decrement_comments_unviewed_count(self, post_id):
-        return self.client.decrement_count(self.pk(post_id), 'commentsUnviewedCount')
+        return self.client.decrement_count(self.pk(post_id), 'commentsUnviewedCount', defer=False)
 
     def clear_comments_unviewed_count(self, post_id):
         query_kwargs = {
@@ -1,6 +1,7 @@
 import collections
 import itertools
 import logging
+from functools import partial
 
 import pendulum
 
@@ -31,6 +32,7 @@ class PostManager(FlagManagerMixin, TrendingManagerMixin, ViewManagerMixin, Mana
         managers['post'] = self
         self.album_manager = managers.get('album') or models.AlbumManager(clients, managers=managers)
         self.block_manager = managers.get('block') or models.BlockManager(clients, managers=managers)
+        self.cascade_manager = managers.get('cascade') or models.CascadeManager(clients, managers=managers)
         self.comment_manager = managers.get('comment') or models.CommentManager(clients, managers=managers)
         self.follower_manager = managers.get('follower') or models.FollowerManager(clients, managers=managers)
         self.like_manager = managers.get('like') or models.LikeManager(clients, managers=managers)
@@ -44,6 +46,9 @@ class PostManager(FlagManagerMixin, TrendingManagerMixin, ViewManagerMixin, Mana
             self.image_dynamo = PostImageDynamo(clients['dynamo'])
             self.original_metadata_dynamo = PostOriginalMetadataDynamo(clients['dynamo'])
 
+        # each post deleted may itself have many comments & likes to delete, so keep slices small
+        self.cascade_manager.register('deletePostsByUser', self.delete_slice_by_user, slice_size=10)
+
     def get_model(self, item_id, strongly_consistent=False):
         return self.get_post(item_id, strongly_consistent=strongly_consistent)
 
@@ -51,6 +56,11 @@ class PostManager(FlagManagerMixin, TrendingManagerMixin, ViewManagerMixin, Mana
         post_item = self.dynamo.get_post(post_id, strongly_consistent=strongly_consistent)
         return self.init_post(post_item) if post_item else None
 
+    def get_posts(self, post_ids):
+        "Batch get posts. Returns a list aligned with `post_ids`, with None for posts that do not exist"
+        post_items = self.dynamo.client.batch_get_items([self.dynamo.pk(post_id) for post_id in post_ids])
+        return [self.init_post(post_item) for post_item in post_items]
+
     def init_post(self, post_item):
         kwargs = {
             'post_appsync': getattr(self, 'appsync', None),
@@ -199,8 +209,8 @@ class PostManager(FlagManagerMixin, TrendingManagerMixin, ViewManagerMixin, Mana
             return
 
         results = []
-        for post_id, view_count in grouped_post_ids.items():
-            post = self.get_post(post_id)
+        posts = self.get_posts(list(grouped_post_ids.keys()))
+        for post, (post_id, view_count) in zip(posts, grouped_post_ids.items()):
             if not post:
                 logger.warning(f'Cannot record view(s) by user `{user_id}` on DNE post `{post_id}`')
                 continue
@@ -235,20 +245,30 @@ class PostManager(FlagManagerMixin, TrendingManagerMixin, ViewManagerMixin, Mana
             )
             self.init_post(post_item).delete()
 
-    def delete_older_expired_posts(self, now=None):
+    def delete_older_expired_posts(self, now=None, total_segments=None):
         "Delete posts that expired yesterday or earlier, via full table scan"
         now = now or pendulum.now('utc')
         today = now.date()
 
         # scan for expired posts
-        for post_pk in self.dynamo.generate_expired_post_pks_with_scan(today):  # excludes today
-            logger.warning(f'Deleting expired post with pk ({post_pk["partitionKey"]}, {post_pk["sortKey"]})')
+        post_pks = self.dynamo.generate_expired_post_pks_with_scan(today, total_segments=total_segments)
+        for post_pk in post_pks:  # excludes today
             post_item = self.dynamo.client.get_item(post_pk)
+            if not post_item:
+                # scans are eventually consistent, so the post may have already been deleted
+                continue
+            logger.warning(f'Deleting expired post with pk ({post_pk["partitionKey"]}, {post_pk["sortKey"]})')
             self.init_post(post_item).delete()
 
     def on_user_delete_delete_all_by_user(self, user_id, old_item):
-        for post_item in self.dynamo.generate_posts_by_user(user_id):
+        self.cascade_manager.run('deletePostsByUser', user_id)
+
+    def delete_slice_by_user(self, user_id, limit, next_token=None):
+        "Delete up to `limit` of the user's posts, return a token to continue from or None if there are no more"
+        paginated = self.dynamo.query_posts_by_user(user_id, limit=limit, next_token=next_token)
+        for post_item in paginated['items']:
             self.init_post(post_item).delete()
+        return paginated['nextToken']
 
     def on_flag_add(self, post_id, new_item):
         post_item = self.dynamo.increment_flag_count(post_id)
@@ -262,15 +282,15 @@ class PostManager(FlagManagerMixin, TrendingManagerMixin, ViewManagerMixin, Mana
             logger.warning(f'Force archiving post `{post_id}` from flagging')
             post.archive(forced=True)
 
-    def on_comment_add(self, comment_id, new_item):
-        comment = self.comment_manager.init_comment(new_item)
+    def on_comment_add(self, comment_id, new_item, record=None):
+        comment = record.new_model if record else self.comment_manager.init_comment(new_item)
         by_post_owner = comment.user_id == comment.post.user_id
         self.dynamo.increment_comment_count(comment.post_id, viewed=by_post_owner)
         if not by_post_owner:
             self.dynamo.set_last_unviewed_comment_at(comment.post.item, comment.created_at)
 
-    def on_comment_delete(self, comment_id, old_item):
-        comment = self.comment_manager.init_comment(old_item)
+    def on_comment_delete(self, comment_id, old_item, record=None):
+        comment = record.old_model if record else self.comment_manager.init_comment(old_item)
         self.dynamo.decrement_comment_count(comment.post_id)
 
         if comment.post and comment.user_id != comment.post.user_id:
@@ -283,27 +303,37 @@ class PostManager(FlagManagerMixin, TrendingManagerMixin, ViewManagerMixin, Mana
                 if post_item and post_item.get('commentsUnviewedCount', 0) == 0:
                     self.dynamo.set_last_unviewed_comment_at(post_item, None)
 
-    def on_like_add(self, post_id, new_item):
-        like_status = new_item['likeStatus']
-        if like_status == LikeStatus.ONYMOUSLY_LIKED:
-            incrementor = self.dynamo.increment_onymous_like_count
-        elif like_status == LikeStatus.ANONYMOUSLY_LIKED:
-            incrementor = self.dynamo.increment_anonymous_like_count
-        else:
-            raise Exception(f'Unrecognized like status `{like_status}`')
-        incrementor(post_id)
-
-    def on_like_delete(self, post_id, old_item):
-        like_status = old_item['likeStatus']
-        if like_status == LikeStatus.ONYMOUSLY_LIKED:
-            decrementor = self.dynamo.decrement_onymous_like_count
-        elif like_status == LikeStatus.ANONYMOUSLY_LIKED:
-            decrementor = self.dynamo.decrement_anonymous_like_count
-        else:
-            raise Exception(f'Unrecognized like status `{like_status}`')
-        decrementor(post_id)
+    def on_like_add(self, items):
+        for post_id, _, new_item in items:
+            try:
+                like_status = new_item['likeStatus']
+                if like_status == LikeStatus.ONYMOUSLY_LIKED:
+                    incrementor = self.dynamo.increment_onymous_like_count
+                elif like_status == LikeStatus.ANONYMOUSLY_LIKED:
+                    incrementor = self.dynamo.increment_anonymous_like_count
+                else:
+                    raise Exception(f'Unrecognized like status `{like_status}`')
+                incrementor(post_id)
+            except Exception as err:
+                logger.exception(str(err))
+
+    def on_like_delete(self, items):
+        for post_id, old_item, _ in items:
+            try:
+                like_status = old_item['likeStatus']
+                if like_status == LikeStatus.ONYMOUSLY_LIKED:
+                    decrementor = self.dynamo.decrement_onymous_like_count
+                elif like_status == LikeStatus.ANONYMOUSLY_LIKED:
+                    decrementor = self.dynamo.decrement_anonymous_like_count
+                else:
+                    raise Exception(f'Unrecognized like status `{like_status}`')
+                decrementor(post_id)
+            except Exception as err:
+                logger.exception(str(err))
 
     def on_post_view_count_change_update_counts(self, post_id, new_item, old_item=None):
+        # per-record, rather than batched, so a view by the post owner clears only the unviewed comments
+        # of comment records earlier in the stream, and not those of comments added after the view
         if new_item.get('viewCount', 0) <= (old_item or {}).get('viewCount', 0):
             return  # view count did not increase
 
@@ -322,13 +352,14 @@ class PostManager(FlagManagerMixin, TrendingManagerMixin, ViewManagerMixin, Mana
                 raise
 
     def on_album_delete_remove_posts(self, album_id, old_item):
-        for post_id in self.dynamo.generate_post_ids_in_album(album_id):
-            if post := self.get_post(post_id):
+        post_ids_gen = self.dynamo.generate_post_ids_in_album(album_id)
+        while post_ids := list(itertools.islice(post_ids_gen, self.dynamo.client.batch_get_chunk_size)):
+            for post in filter(None, self.get_posts(post_ids)):
                 post.set_album(None)
 
-    def on_post_status_change_fire_gql_notifications(self, post_id, new_item, old_item):
-        old_post = self.init_post(old_item)
-        new_post = self.init_post(new_item)
+    def on_post_status_change_fire_gql_notifications(self, post_id, new_item, old_item, record=None):
+        old_post = record.old_model if record else self.init_post(old_item)
+        new_post = record.new_model if record else self.init_post(new_item)
         kwargs = {'postId': post_id}
 
         if new_post.status == PostStatus.ERROR:
@@ -351,18 +382,28 @@ class PostManager(FlagManagerMixin, TrendingManagerMixin, ViewManagerMixin, Mana
         if is_verif is not None:
             self.dynamo.set_is_verified(post_id, is_verif, hidden=new_verif_hidden)
 
-    def on_post_view_add_delete_sync_viewed_by_counts(self, post_id, new_item=None, old_item=None):
-        assert not (new_item and old_item), 'Should only be called for INSERT and REMOVE'
-        user_id = (new_item or old_item)['sortKey'].split('/')[1]
-        post = self.get_post(post_id)
-
-        # ignore posts that have been deleted and our own views on our own post
-        if not post or post.user_id == user_id:
-            return
-
-        if new_item:
-            self.dynamo.increment_viewed_by_count(post_id)
-            self.user_manager.dynamo.increment_post_viewed_by_count(post.user_id)
-        if old_item:
-            self.dynamo.decrement_viewed_by_count(post_id)
-            self.user_manager.dynamo.decrement_post_viewed_by_count(post.user_id)
+    def on_post_view_add_delete_sync_viewed_by_counts(self, items, loader=None):
+        assert all(
+            not (new_item and old_item) for _, old_item, new_item in items
+        ), 'Should only be called for INSERT and REMOVE'
+        post_ids = list(dict.fromkeys(post_id for post_id, _, _ in items))
+        get_posts = partial(loader.load_many, 'post') if loader else self.get_posts
+        posts = dict(zip(post_ids, get_posts(post_ids)))
+
+        for post_id, old_item, new_item in items:
+            try:
+                user_id = (new_item or old_item)['sortKey'].split('/')[1]
+                post = posts[post_id]
+
+                # ignore posts that have been deleted and our own views on our own post
+                if not post or post.user_id == user_id:
+                    continue
+
+                if new_item:
+                    self.dynamo.increment_viewed_by_count(post_id)
+                    self.user_manager.dynamo.increment_post_viewed_by_count(post.user_id)
+                if old_item:
+                    self.dynamo.decrement_viewed_by_count(post_id)
+                    self.user_manager.dynamo.decrement_post_viewed_by_count(post.user_id)
+            except Exception as err:
+                logger.exception(str(err))
@@ -9,8 +9,8 @@ import PIL.Image
 from app.mixins.flag.model import FlagModelMixin
 from app.mixins.trending.model import TrendingModelMixin
 from app.mixins.view.model import ViewModelMixin
-from app.models.follower.enums import FollowStatus
-from app.models.user.enums import UserPrivacyStatus, UserSubscriptionLevel
+from app.models.block.enums import AccessAction, AccessDenial
+from app.models.user.enums import UserSubscriptionLevel
 from app.models.user.exceptions import UserException
 from app.utils import image_size
 
@@ -233,6 +233,12 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
         path = self.get_image_path(size)
         return self.cloudfront_client.generate_presigned_url(path, ['GET', 'HEAD'])
 
+    def get_image_readonly_urls(self):
+        "The urls of all jpeg sizes of the image, by graphql field name, signed once between them"
+        filenames = [size.filename for size in image_size.JPEGS]
+        urls = self.cloudfront_client.generate_presigned_urls(f'{self.s3_prefix}/{IMAGE_DIR}/', filenames)
+        return {image_size.URL_FIELDS[size]: url for size, url in zip(image_size.JPEGS, urls)}
+
     def get_image_writeonly_url(self):
         assert self.type == PostType.IMAGE
         size = image_size.NATIVE_HEIC if self.image_item.get('imageFormat') == 'HEIC' else image_size.NATIVE
@@ -241,7 +247,8 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
 
     def serialize(self, caller_user_id):
         resp = self.item.copy()
-        resp['postedBy'] = self.user_manager.get_user(self.user_id).serialize(caller_user_id)
+        user = self.user_manager.get_user(self.user_id)
+        resp['postedBy'] = self.user_manager.serialize_many(caller_user_id, [user])[0]
         return resp
 
     def build_image_thumbnails(self):
@@ -593,13 +600,11 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
 
     def flag(self, user):
         # if the post is from a private user then we must be a follower to flag the post
-        posted_by_user = self.user_manager.get_user(self.user_id)
-        if posted_by_user.item['privacyStatus'] != UserPrivacyStatus.PUBLIC:
-            follow = self.follower_manager.get_follow(user.id, self.user_id)
-            if not follow or follow.status != FollowStatus.FOLLOWING:
-                raise PostException(f'User does not have access to post `{self.id}`')
+        access = self.block_manager.access_policy.check(user.id, self.user_id, AccessAction.FLAG_POST)
+        if access.denial == AccessDenial.NOT_FOLLOWER:
+            raise PostException(f'User does not have access to post `{self.id}`')
 
-        return super().flag(user)
+        return super().flag(user, access=access)
 
     def record_view_count(self, user_id, view_count, viewed_at=None):
         if self.status != PostStatus.COMPLETED:
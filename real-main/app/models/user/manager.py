@@ -17,6 +17,7 @@ from .dynamo import UserContactAttributeDynamo, UserDynamo
 from .enums import UserStatus, UserSubscriptionLevel
 from .exceptions import UserAlreadyExists, UserValidationException
 from .model import User
+from .relationship import RelationshipService
 from .validate import UserValidate
 
 logger = logging.getLogger()
@@ -54,6 +55,7 @@ class UserManager(TrendingManagerMixin, ManagerBase):
         self.follower_manager = managers.get('follower') or models.FollowerManager(clients, managers=managers)
         self.like_manager = managers.get('like') or models.LikeManager(clients, managers=managers)
         self.post_manager = managers.get('post') or models.PostManager(clients, managers=managers)
+        self.relationship_service = RelationshipService(self.block_manager, self.follower_manager)
 
         self.clients = clients
         for client_name in self.client_names:
@@ -78,6 +80,25 @@ class UserManager(TrendingManagerMixin, ManagerBase):
         user_item = self.dynamo.get_user(user_id, strongly_consistent=strongly_consistent)
         return self.init_user(user_item) if user_item else None
 
+    def get_users(self, user_ids):
+        "Batch get users. Returns a list aligned with `user_ids`, with None for users that do not exist"
+        user_items = self.dynamo.client.batch_get_items([self.dynamo.pk(user_id) for user_id in user_ids])
+        return [self.init_user(user_item) for user_item in user_items]
+
+    def serialize_many(self, caller_user_id, users):
+        """
+        Serialize each of `users` for the caller, with their relationships to the caller fetched in batch.
+        Returns a list aligned with `users`, with None for any None in `users`.
+        """
+        user_ids = [user.id for user in users if user]
+        # serialized users only carry the user's block of the caller, not the caller's block of the user
+        relationships = iter(
+            self.relationship_service.get_relationships(caller_user_id, user_ids, blocked_status=False)
+        )
+        return [
+            user.serialize(caller_user_id, relationship=next(relationships)) if user else None for user in users
+        ]
+
     def get_user_by_username(self, username):
         user_item = self.dynamo.get_user_by_username(username)
         return self.init_user(user_item) if user_item else None
@@ -244,21 +265,37 @@ class UserManager(TrendingManagerMixin, ManagerBase):
             userChatsWithUnviewedMessagesCount=int(new_item.get('chatsWithUnviewedMessagesCount', 0)),
         )
 
-    def on_comment_add(self, comment_id, new_item):
-        self.dynamo.increment_comment_count(new_item['userId'])
-
-    def on_comment_delete(self, comment_id, old_item):
-        user_id = old_item['userId']
-        self.dynamo.decrement_comment_count(user_id)
-        self.dynamo.increment_comment_deleted_count(user_id)
+    def on_comment_add(self, items):
+        for _, _, new_item in items:
+            try:
+                self.dynamo.increment_comment_count(new_item['userId'])
+            except Exception as err:
+                logger.exception(str(err))
 
-    def on_card_add_increment_count(self, card_id, new_item):
-        card = self.card_manager.init_card(new_item)
-        self.dynamo.increment_card_count(card.user_id)
+    def on_comment_delete(self, items):
+        for _, old_item, _ in items:
+            try:
+                user_id = old_item['userId']
+                self.dynamo.decrement_comment_count(user_id)
+                self.dynamo.increment_comment_deleted_count(user_id)
+            except Exception as err:
+                logger.exception(str(err))
+
+    def on_card_add_increment_count(self, items):
+        for _, _, new_item in items:
+            try:
+                card = self.card_manager.init_card(new_item)
+                self.dynamo.increment_card_count(card.user_id)
+            except Exception as err:
+                logger.exception(str(err))
 
-    def on_card_delete_decrement_count(self, card_id, old_item):
-        card = self.card_manager.init_card(old_item)
-        self.dynamo.decrement_card_count(card.user_id)
+    def on_card_delete_decrement_count(self, items):
+        for _, old_item, _ in items:
+            try:
+                card = self.card_manager.init_card(old_item)
+                self.dynamo.decrement_card_count(card.user_id)
+            except Exception as err:
+                logger.exception(str(err))
 
     def on_user_add_delete_user_deleted_subitem(self, user_id, new_item):
         # the integration test suite reuses deleted users as a performance enhancement
@@ -311,76 +348,110 @@ class UserManager(TrendingManagerMixin, ManagerBase):
         if status == UserStatus.DELETING:
             self.pinpoint_client.delete_user_endpoints(user_id)
 
-    def sync_chats_with_unviewed_messages_count(self, chat_id, new_item=None, old_item=None):
+    def sync_chats_with_unviewed_messages_count(self, items):
         "Sync User.chatsWithUnviewedMessagesCount to changes to chat member items"
-        # digging kinda deep into the chat member object from here... should probably make a ChatMember class
-        user_id = (new_item or old_item)['sortKey'].split('/')[1]
-        new_count = (new_item or {}).get('messagesUnviewedCount', 0)
-        old_count = (old_item or {}).get('messagesUnviewedCount', 0)
-        if old_count == 0 and new_count > 0:
-            self.dynamo.increment_chats_with_unviewed_messages_count(user_id)
-        if old_count > 0 and new_count == 0:
-            self.dynamo.decrement_chats_with_unviewed_messages_count(user_id)
-
-    def sync_follow_counts_due_to_follow_status(self, followed_user_id, new_item=None, old_item=None):
-        follower_user_id = (new_item or old_item)['sortKey'].split('/')[1]
-        old_status = (old_item or {}).get('followStatus', FollowStatus.NOT_FOLLOWING)
-        new_status = (new_item or {}).get('followStatus', FollowStatus.NOT_FOLLOWING)
-
-        # incr/decr followedCount and followerCount if follow status changed to/from FOLLOWING
-        if old_status != FollowStatus.FOLLOWING and new_status == FollowStatus.FOLLOWING:
-            self.dynamo.increment_followed_count(follower_user_id)
-            self.dynamo.increment_follower_count(followed_user_id)
-        if old_status == FollowStatus.FOLLOWING and new_status != FollowStatus.FOLLOWING:
-            self.dynamo.decrement_followed_count(follower_user_id)
-            self.dynamo.decrement_follower_count(followed_user_id)
-
-        # incr/decr followersRequestedCount if follow status changed to/from REQUESTED
-        if old_status != FollowStatus.REQUESTED and new_status == FollowStatus.REQUESTED:
-            self.dynamo.increment_followers_requested_count(followed_user_id)
-        if old_status == FollowStatus.REQUESTED and new_status != FollowStatus.REQUESTED:
-            self.dynamo.decrement_followers_requested_count(followed_user_id)
-
-    def sync_chat_message_creation_count(self, message_id, new_item):
-        if user_id := new_item.get('userId'):
-            self.dynamo.increment_chat_messages_creation_count(user_id)
-
-    def sync_chat_message_deletion_count(self, message_id, old_item):
-        if user_id := old_item.get('userId'):
-            self.dynamo.increment_chat_messages_deletion_count(user_id)
-
-    def on_chat_member_add_update_chat_count(self, chat_id, new_item):
-        user_id = new_item['sortKey'].split('/')[1]
-        self.dynamo.increment_chat_count(user_id)
-
-    def on_chat_member_delete_update_chat_count(self, chat_id, old_item):
-        user_id = old_item['sortKey'].split('/')[1]
-        self.dynamo.decrement_chat_count(user_id)
-
-    def on_album_add_update_album_count(self, album_id, new_item):
-        user_id = new_item['ownedByUserId']
-        self.dynamo.increment_album_count(user_id)
-
-    def on_album_delete_update_album_count(self, album_id, old_item):
-        user_id = old_item['ownedByUserId']
-        self.dynamo.decrement_album_count(user_id)
-
-    def on_post_status_change_sync_counts(self, post_id, new_item, old_item):
-        user_id = new_item['postedByUserId']
-
-        new_status = new_item['postStatus']
-        if new_status == PostStatus.ARCHIVED:
-            self.dynamo.increment_post_archived_count(user_id)
-        if new_status == PostStatus.COMPLETED:
-            self.dynamo.increment_post_count(user_id)
-        if new_status == PostStatus.DELETING:
-            self.dynamo.increment_post_deleted_count(user_id)
-
-        old_status = old_item['postStatus']
-        if old_status == PostStatus.ARCHIVED:
-            self.dynamo.decrement_post_archived_count(user_id)
-        if old_status == PostStatus.COMPLETED:
-            self.dynamo.decrement_post_count(user_id)
+        for _, old_item, new_item in items:
+            try:
+                # digging kinda deep into the chat member object from here... should probably make a ChatMember class
+                user_id = (new_item or old_item)['sortKey'].split('/')[1]
+                new_count = (new_item or {}).get('messagesUnviewedCount', 0)
+                old_count = (old_item or {}).get('messagesUnviewedCount', 0)
+                if old_count == 0 and new_count > 0:
+                    self.dynamo.increment_chats_with_unviewed_messages_count(user_id)
+                if old_count > 0 and new_count == 0:
+                    self.dynamo.decrement_chats_with_unviewed_messages_count(user_id)
+            except Exception as err:
+                logger.exception(str(err))
+
+    def sync_follow_counts_due_to_follow_status(self, items):
+        for followed_user_id, old_item, new_item in items:
+            try:
+                follower_user_id = (new_item or old_item)['sortKey'].split('/')[1]
+                old_status = (old_item or {}).get('followStatus', FollowStatus.NOT_FOLLOWING)
+                new_status = (new_item or {}).get('followStatus', FollowStatus.NOT_FOLLOWING)
+
+                # incr/decr followedCount and followerCount if follow status changed to/from FOLLOWING
+                if old_status != FollowStatus.FOLLOWING and new_status == FollowStatus.FOLLOWING:
+                    self.dynamo.increment_followed_count(follower_user_id)
+                    self.dynamo.increment_follower_count(followed_user_id)
+                if old_status == FollowStatus.FOLLOWING and new_status != FollowStatus.FOLLOWING:
+                    self.dynamo.decrement_followed_count(follower_user_id)
+                    self.dynamo.decrement_follower_count(followed_user_id)
+
+                # incr/decr followersRequestedCount if follow status changed to/from REQUESTED
+                if old_status != FollowStatus.REQUESTED and new_status == FollowStatus.REQUESTED:
+                    self.dynamo.increment_followers_requested_count(followed_user_id)
+                if old_status == FollowStatus.REQUESTED and new_status != FollowStatus.REQUESTED:
+                    self.dynamo.decrement_followers_requested_count(followed_user_id)
+            except Exception as err:
+                logger.exception(str(err))
+
+    def sync_chat_message_creation_count(self, items):
+        for _, _, new_item in items:
+            try:
+                if user_id := new_item.get('userId'):
+                    self.dynamo.increment_chat_messages_creation_count(user_id)
+            except Exception as err:
+                logger.exception(str(err))
+
+    def sync_chat_message_deletion_count(self, items):
+        for _, old_item, _ in items:
+            try:
+                if user_id := old_item.get('userId'):
+                    self.dynamo.increment_chat_messages_deletion_count(user_id)
+            except Exception as err:
+                logger.exception(str(err))
+
+    def on_chat_member_add_update_chat_count(self, items):
+        for _, _, new_item in items:
+            try:
+                user_id = new_item['sortKey'].split('/')[1]
+                self.dynamo.increment_chat_count(user_id)
+            except Exception as err:
+                logger.exception(str(err))
+
+    def on_chat_member_delete_update_chat_count(self, items):
+        for _, old_item, _ in items:
+            try:
+                user_id = old_item['sortKey'].split('/')[1]
+                self.dynamo.decrement_chat_count(user_id)
+            except Exception as err:
+                logger.exception(str(err))
+
+    def on_album_add_update_album_count(self, items):
+        for _, _, new_item in items:
+            try:
+                self.dynamo.increment_album_count(new_item['ownedByUserId'])
+            except Exception as err:
+                logger.exception(str(err))
+
+    def on_album_delete_update_album_count(self, items):
+        for _, old_item, _ in items:
+            try:
+                self.dynamo.decrement_album_count(old_item['ownedByUserId'])
+            except Exception as err:
+                logger.exception(str(err))
+
+    def on_post_status_change_sync_counts(self, items):
+        for _, old_item, new_item in items:
+            try:
+                user_id = new_item['postedByUserId']
+
+                new_status = new_item['postStatus']
+                if new_status == PostStatus.ARCHIVED:
+                    self.dynamo.increment_post_archived_count(user_id)
+                if new_status == PostStatus.COMPLETED:
+                    self.dynamo.increment_post_count(user_id)
+                if new_status == PostStatus.DELETING:
+                    self.dynamo.increment_post_deleted_count(user_id)
+
+                old_status = old_item['postStatus']
+                if old_status == PostStatus.ARCHIVED:
+                    self.dynamo.decrement_post_archived_count(user_id)
+                if old_status == PostStatus.COMPLETED:
+                    self.dynamo.decrement_post_count(user_id)
+            except Exception as err:
+                logger.exception(str(err))
 
     def on_user_contact_attribute_change_update_subitem(
         self, attr_name, dynamo_lib_name, user_id, new_item=None, old_item=None
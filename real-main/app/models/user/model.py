@@ -106,6 +106,18 @@ class User(TrendingModelMixin):
             return f'https://{self.frontend_resources_domain}/{placeholder_path}'
         return None
 
+    def get_photo_urls(self):
+        "The urls of all sizes of the photo, by graphql field name, signed once between them. None if no photo."
+        if photo_post_id := self.item.get('photoPostId'):
+            filenames = [size.filename for size in image_size.JPEGS]
+            path_prefix = '/'.join([self.id, 'profile-photo', photo_post_id, ''])
+            urls = self.cloudfront_client.generate_presigned_urls(path_prefix, filenames)
+        else:
+            urls = [self.get_photo_url(size) for size in image_size.JPEGS]
+        if not urls[0]:
+            return None
+        return {image_size.URL_FIELDS[size]: url for size, url in zip(image_size.JPEGS, urls)}
+
     def is_forced_disabling_criteria_met_by_chat_messages(self):
         # matching post criteria
         total_count = self.item.get('chatMessagesCreationCount', 0)
@@ -130,11 +142,16 @@ class User(TrendingModelMixin):
         self.item = self.dynamo.get_user(self.id, strongly_consistent=strongly_consistent)
         return self
 
-    def serialize(self, caller_user_id):
+    def serialize(self, caller_user_id, relationship=None):
+        "The `relationship` of the caller to this user may be passed in, if already fetched in batch"
         assert self.item
         resp = self.item.copy()
-        resp['blockerStatus'] = self.block_manager.get_block_status(self.id, caller_user_id)
-        resp['followedStatus'] = self.follower_manager.get_follow_status(caller_user_id, self.id)
+        if relationship:
+            resp['blockerStatus'] = relationship['blockerStatus']
+            resp['followedStatus'] = relationship['followedStatus']
+        else:
+            resp['blockerStatus'] = self.block_manager.get_block_status(self.id, caller_user_id)
+            resp['followedStatus'] = self.follower_manager.get_follow_status(caller_user_id, self.id)
         return resp
 
     def enable(self):
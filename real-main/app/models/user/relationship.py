@@ -0,0 +1,60 @@
+import logging
+
+from app.models.block.enums import BlockStatus
+from app.models.follower.enums import FollowStatus
+
+logger = logging.getLogger()
+
+
+class RelationshipService:
+    """
+    Resolves how callers relate to other users: whether the user blocks the caller (`blockerStatus`), whether
+    the caller blocks the user (`blockedStatus`), and the caller's follow status of the user (`followedStatus`).
+
+    The block and follow items of all the pairs asked about are fetched with batch gets, rather than with
+    two or three point reads per user.
+    """
+
+    def __init__(self, block_manager, follower_manager):
+        self.block_manager = block_manager
+        self.follower_manager = follower_manager
+
+    def get_relationships(self, caller_user_id, user_ids, blocked_status=True):
+        """
+        Returns a list of relationships of the caller to each of `user_ids`, aligned with `user_ids`.
+        If `blocked_status` is False, `blockedStatus` is neither fetched nor included.
+        """
+        pairs = [(caller_user_id, user_id) for user_id in user_ids]
+        return self.get_pair_relationships(pairs, blocked_status=blocked_status)
+
+    def get_pair_relationships(self, pairs, blocked_status=True):
+        "Returns a list of relationships, aligned with `pairs`, each a tuple of (caller user id, user id)"
+        keys = []
+        for caller_user_id, user_id in pairs:
+            if caller_user_id != user_id:
+                keys.append(self.block_manager.dynamo.pk(user_id, caller_user_id))
+                if blocked_status:
+                    keys.append(self.block_manager.dynamo.pk(caller_user_id, user_id))
+                keys.append(self.follower_manager.dynamo.pk(caller_user_id, user_id))
+        # block & follow items live in the same table, so they can all be fetched together
+        items = iter(self.block_manager.dynamo.client.batch_get_items(keys))
+
+        relationships = []
+        for caller_user_id, user_id in pairs:
+            if caller_user_id == user_id:
+                relationship = {'blockerStatus': BlockStatus.SELF, 'followedStatus': FollowStatus.SELF}
+                if blocked_status:
+                    relationship['blockedStatus'] = BlockStatus.SELF
+                relationships.append(relationship)
+                continue
+            blocker_item = next(items)
+            blocked_item = next(items) if blocked_status else None
+            follow_item = next(items)
+            relationship = {
+                'blockerStatus': BlockStatus.BLOCKING if blocker_item else BlockStatus.NOT_BLOCKING,
+                'followedStatus': follow_item['followStatus'] if follow_item else FollowStatus.NOT_FOLLOWING,
+            }
+            if blocked_status:
+                relationship['blockedStatus'] = BlockStatus.BLOCKING if blocked_item else BlockStatus.NOT_BLOCKING
+            relationships.append(relationship)
+        return relationships
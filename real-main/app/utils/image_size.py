@@ -19,3 +19,6 @@ P64 = _ImageSize('64p', (114, 64))
 
 JPEGS = (NATIVE, K4, P1080, P480, P64)
 THUMBNAILS = (K4, P1080, P480, P64)  # ordered by decreasing size
+
+# the field holding the url of each size in graphql Image objects
+URL_FIELDS = {NATIVE: 'url', K4: 'url4k', P1080: 'url1080p', P480: 'url480p', P64: 'url64p'}
@@ -0,0 +1,274 @@
+import json
+import logging
+import threading
+import time
+from unittest.mock import patch
+
+import boto3
+import botocore
+import gql
+import graphql.language.printer
+import pytest
+import requests
+import requests_aws4auth
+
+from app.clients import AppSyncClient
+from app.clients.appsync import GraphQLResult, RetryableError, parse_document
+
+# the requests_mock parameter is auto-supplied, no need to even import the
+# requests-mock library # https://requests-mock.readthedocs.io/en/latest/pytest.html
+
+graphql_url = 'https://appsync.real.app/graphql'
+
+
+@pytest.fixture
+def appsync_client():
+    client = AppSyncClient(appsync_graphql_url=graphql_url)
+    client.aws_session = boto3.session.Session(
+        aws_access_key_id='access-key', aws_secret_access_key='secret-key', region_name='us-east-1'
+    )
+    client.retry_backoff = 0
+    yield client
+
+
+def test_fire_notification(appsync_client, requests_mock):
+    requests_mock.post(graphql_url, json={'data': {'triggerNotification': {'userId': 'uid', 'type': 'T'}}})
+    appsync_client.fire_notification('uid', 'T', userChatsWithUnviewedMessagesCount=2)
+
+    assert requests_mock.call_count == 1
+    request = requests_mock.last_request
+    assert request.headers['Authorization'].startswith('AWS4-HMAC-SHA256 Credential=access-key/')
+    body = json.loads(request.body)
+    assert body['variables'] == {'input': {'userId': 'uid', 'type': 'T', 'userChatsWithUnviewedMessagesCount': 2}}
+    assert 'userChatsWithUnviewedMessagesCount' in body['query']
+
+
+def test_send_error(appsync_client, requests_mock):
+    requests_mock.post(graphql_url, json={'errors': [{'message': 'Nope'}]})
+    with pytest.raises(Exception, match='Appsync resp error: .*Nope'):
+        appsync_client.fire_notification('uid', 'T')
+
+
+def test_send_retries(appsync_client, requests_mock):
+    # throttled, then a server error, then success
+    requests_mock.post(
+        graphql_url,
+        [
+            {'status_code': 429, 'text': 'Rate exceeded'},
+            {'status_code': 502, 'text': 'Bad'},
+            {'json': {'data': {}}},
+        ],
+    )
+    appsync_client.fire_notification('uid', 'T')
+    assert requests_mock.call_count == 3
+
+    # never succeeds
+    requests_mock.post(graphql_url, status_code=503, text='Unavailable')
+    with pytest.raises(Exception, match='failed after 4 attempts: Status 503: Unavailable'):
+        appsync_client.fire_notification('uid', 'T')
+    assert requests_mock.call_count == 3 + 4
+
+    # client errors aren't retried
+    requests_mock.post(graphql_url, status_code=400, text='Bad request')
+    with pytest.raises(Exception, match='400'):
+        appsync_client.fire_notification('uid', 'T')
+    assert requests_mock.call_count == 3 + 4 + 1
+
+
+def test_session_signer_and_documents_reused(appsync_client, requests_mock):
+    requests_mock.post(graphql_url, json={'data': {}})
+    parse_document.cache_clear()
+
+    appsync_client.fire_notification('uid1', 'T')
+    http_session, auth = appsync_client.http_session, appsync_client.auth
+    print_ast = graphql.language.printer.print_ast
+    with patch('gql.gql', wraps=gql.gql) as gql_mock, patch(
+        'graphql.language.printer.print_ast', wraps=print_ast
+    ) as print_ast_mock:
+        appsync_client.fire_notification('uid2', 'T')
+        appsync_client.fire_notification('uid3', 'T', extra=1)
+        appsync_client.fire_notification('uid4', 'T', extra=2)
+    assert requests_mock.call_count == 4
+    assert appsync_client.http_session is http_session
+    assert appsync_client.auth is auth
+
+    # one document, printed once, per set of extra fields
+    assert gql_mock.call_count == 1
+    assert print_ast_mock.call_count == 1
+    assert parse_document.cache_info().currsize == 2
+
+
+def test_signer_rebuilt_on_credentials_refresh(appsync_client, requests_mock):
+    requests_mock.post(graphql_url, json={'data': {}})
+    appsync_client.fire_notification('uid', 'T')
+    auth = appsync_client.auth
+
+    refreshed = botocore.credentials.Credentials('access-key-2', 'secret-key-2', token='token')
+    with patch.object(appsync_client.aws_session, 'get_credentials', return_value=refreshed):
+        appsync_client.fire_notification('uid', 'T')
+    assert appsync_client.auth is not auth
+    assert requests_mock.last_request.headers['X-Amz-Security-Token'] == 'token'
+    assert 'Credential=access-key-2/' in requests_mock.last_request.headers['Authorization']
+
+
+def test_session_and_signer_built_once_across_threads(appsync_client):
+    session_class, auth_class = requests.Session, requests_aws4auth.AWS4Auth
+
+    def slowly(cls):
+        def build(*args, **kwargs):
+            time.sleep(0.02)  # so that any threads racing to build one would overlap
+            return cls(*args, **kwargs)
+
+        return build
+
+    results = []
+
+    def get_both():
+        results.append((appsync_client.get_http_session(), appsync_client.get_auth()))
+
+    with patch('requests.Session', side_effect=slowly(session_class)) as session_mock, patch(
+        'requests_aws4auth.AWS4Auth', side_effect=slowly(auth_class)
+    ) as auth_mock:
+        threads = [threading.Thread(target=get_both) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert session_mock.call_count == 1
+    assert auth_mock.call_count == 1
+    assert len(results) == 5
+    assert all(session is results[0][0] and auth is results[0][1] for session, auth in results)
+
+
+def test_fire_notifications(appsync_client, requests_mock):
+    requests_mock.post(graphql_url, json={'data': {}})
+    appsync_client.batch_size = 2
+    notifications = ({'userId': f'uid{i}', 'type': 'T'} for i in range(5))
+    assert appsync_client.fire_notifications(notifications) == {}
+
+    # split over requests, each of aliased mutations
+    assert requests_mock.call_count == 3
+    bodies = [json.loads(request.body) for request in requests_mock.request_history]
+    assert [len(body['variables']) for body in bodies] == [2, 2, 1]
+    assert bodies[2]['variables'] == {'input0': {'userId': 'uid4', 'type': 'T'}}
+    query = ' '.join(bodies[0]['query'].split())
+    assert 'n0: triggerNotification(input: $input0) { userId type }' in query
+    assert 'n1: triggerNotification(input: $input1) { userId type }' in query
+
+
+def test_fire_notifications_errors(appsync_client, requests_mock):
+    requests_mock.post(
+        graphql_url,
+        json={
+            'data': {'n0': {'userId': 'uid0', 'type': 'T'}, 'n1': None},
+            'errors': [{'message': 'Bad', 'path': ['n1']}],
+        },
+    )
+    notifications = [{'userId': 'uid0', 'type': 'T'}, {'userId': 'uid1', 'type': 'T', 'postId': 'pid'}]
+    assert appsync_client.fire_notifications(notifications) == {'uid1': [{'message': 'Bad', 'path': ['n1']}]}
+    query = ' '.join(json.loads(requests_mock.last_request.body)['query'].split())
+    assert 'n1: triggerNotification(input: $input1) { userId type postId }' in query
+
+    # errors that aren't of any one mutation are of them all
+    requests_mock.post(graphql_url, json={'errors': [{'message': 'Nope'}]})
+    assert appsync_client.fire_notifications(notifications) == {
+        'uid0': [{'message': 'Nope'}],
+        'uid1': [{'message': 'Nope'}],
+    }
+
+
+def test_deferred_sends(appsync_client, requests_mock):
+    requests_mock.post(graphql_url, json={'data': {}})
+    with appsync_client.deferred_sends():
+        appsync_client.fire_notification('uid1', 'T')
+        assert appsync_client.fire_notifications([{'userId': 'uid2', 'type': 'T'}]) == {}
+        appsync_client.send('mutation M { m }', {})
+        # nothing sent till flushed, the notifications in one aliased request
+        assert requests_mock.call_count == 0
+        assert appsync_client.flush() == (2, 0)
+        assert requests_mock.call_count == 2
+        assert appsync_client.flush() == (0, 0)
+
+        # anything left is flushed on exit
+        appsync_client.fire_notification('uid3', 'T')
+    assert requests_mock.call_count == 3
+    assert json.loads(requests_mock.last_request.body)['variables'] == {'input0': {'userId': 'uid3', 'type': 'T'}}
+
+    # back to sending immediately
+    appsync_client.fire_notification('uid4', 'T')
+    assert requests_mock.call_count == 4
+    assert json.loads(requests_mock.last_request.body)['variables'] == {'input': {'userId': 'uid4', 'type': 'T'}}
+    assert appsync_client.flush() == (0, 0)
+
+
+def test_deferred_notifications_coalesced(appsync_client, requests_mock):
+    requests_mock.post(graphql_url, json={'data': {}})
+    count_type = 'USER_CHATS_WITH_UNVIEWED_MESSAGES_COUNT_CHANGED'
+    stories_type = 'USER_FOLLOWED_USERS_WITH_STORIES_CHANGED'
+    with appsync_client.deferred_sends() as coalescer:
+        for i in range(3):
+            appsync_client.fire_notification('uid1', 'USER_FEED_CHANGED')
+            appsync_client.fire_notification('uid1', count_type, userChatsWithUnviewedMessagesCount=i)
+        appsync_client.fire_notifications(
+            [
+                {'userId': 'uid2', 'type': 'USER_FEED_CHANGED'},
+                {'userId': 'uid1', 'type': stories_type, 'followedUserId': 'fuid1', 'postId': 'pid1'},
+                {'userId': 'uid1', 'type': stories_type, 'followedUserId': 'fuid2'},
+                {'userId': 'uid1', 'type': stories_type, 'followedUserId': 'fuid1', 'postId': 'pid2'},
+            ]
+        )
+        # types not configured are told apart by their whole payload
+        appsync_client.fire_notification('uid2', 'POST_COMPLETED', postId='pid1')
+        appsync_client.fire_notification('uid2', 'POST_COMPLETED', postId='pid2')
+        appsync_client.fire_notification('uid2', 'POST_COMPLETED', postId='pid1')
+        assert appsync_client.flush() == (1, 0)
+    assert (coalescer.recorded_count, coalescer.suppressed_count) == (13, 6)
+
+    # in the order first fired, with the latest payload
+    assert requests_mock.call_count == 1
+    assert list(json.loads(requests_mock.last_request.body)['variables'].values()) == [
+        {'userId': 'uid1', 'type': 'USER_FEED_CHANGED'},
+        {'userId': 'uid1', 'type': count_type, 'userChatsWithUnviewedMessagesCount': 2},
+        {'userId': 'uid2', 'type': 'USER_FEED_CHANGED'},
+        {'userId': 'uid1', 'type': stories_type, 'followedUserId': 'fuid1', 'postId': 'pid2'},
+        {'userId': 'uid1', 'type': stories_type, 'followedUserId': 'fuid2'},
+        {'userId': 'uid2', 'type': 'POST_COMPLETED', 'postId': 'pid1'},
+        {'userId': 'uid2', 'type': 'POST_COMPLETED', 'postId': 'pid2'},
+    ]
+
+
+def test_flush_concurrently_with_failures(appsync_client, caplog):
+    appsync_client.max_in_flight = 3
+    in_flight, max_in_flight, post_count, lock = [0], [0], [0], threading.Lock()
+
+    def post(document, variables):
+        with lock:
+            in_flight[0] += 1
+            post_count[0] += 1
+            max_in_flight[0] = max(max_in_flight[0], in_flight[0])
+        time.sleep(0.02)
+        with lock:
+            in_flight[0] -= 1
+        if variables['input']['userId'] == 'uid-error':
+            return GraphQLResult(data=None, errors=[{'message': 'Nope'}])
+        if variables['input']['userId'] == 'uid-down':
+            raise RetryableError('Status 503')
+        return GraphQLResult(data={}, errors=None)
+
+    with patch.object(appsync_client, 'post', side_effect=post):
+        with appsync_client.deferred_sends():
+            for i in range(10):
+                appsync_client.fire_notification(f'uid{i}', 'T')
+            appsync_client.fire_notification('uid-error', 'T')
+            appsync_client.fire_notification('uid-down', 'T')
+            assert post_count[0] == 0
+            with caplog.at_level(logging.WARNING):
+                assert appsync_client.flush() == (12, 2)
+
+    # up to the max in flight at once, retries of the request that kept failing included
+    assert max_in_flight[0] == 3
+    assert post_count[0] == 11 + 4
+    assert len(caplog.records) == 2
+    messages = sorted(record.msg for record in caplog.records)
+    assert messages[0] == 'Appsync request failed after 4 attempts: Status 503'
+    assert messages[1].startswith("Appsync request failed: Appsync resp error: `[{'message': 'Nope'}]`")
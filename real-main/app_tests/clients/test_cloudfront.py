@@ -1,4 +1,9 @@
+import base64
+import json
 import urllib
+from unittest.mock import patch
+
+import pendulum
 
 from app.clients import CloudFrontClient
 
@@ -64,3 +69,84 @@ def test_generate_presigned_url():
     parsed_qs = urllib.parse.parse_qs(parsed.query)
     assert set(parsed_qs.keys()) == set(['Method', 'Expires', 'Key-Pair-Id', 'Signature'])
     assert set(parsed_qs['Method']) == set(methods)
+
+
+def test_get_expires_at_bucketed():
+    client = CloudFrontClient(get_key_pair, domain='my-domain')
+    now = pendulum.parse('2020-06-01T12:34:56Z')
+    expires_at = client.get_expires_at(now=now)
+    assert expires_at == pendulum.parse('2020-06-03T13:00:00Z')
+    assert expires_at >= now + client.lifetime
+
+    # everything signed within the same hour expires at the same time
+    assert client.get_expires_at(now=pendulum.parse('2020-06-01T12:00:01Z')) == expires_at
+    assert client.get_expires_at(now=pendulum.parse('2020-06-01T13:00:00Z')) == expires_at
+    assert client.get_expires_at(now=pendulum.parse('2020-06-01T13:00:01Z')) == expires_at.add(hours=1)
+
+
+def test_generate_presigned_url_cached():
+    client = CloudFrontClient(get_key_pair, domain='my-domain')
+    CloudFrontClient.pop_url_cache_stats()
+
+    with patch.object(client, 'get_cloudfront_signer', wraps=client.get_cloudfront_signer) as get_signer:
+        url = client.generate_presigned_url('uid/mid', ['GET', 'HEAD'])
+        assert client.generate_presigned_url('uid/mid', ['GET', 'HEAD']) == url
+        assert get_signer.call_count == 1
+
+        # a different path, methods or expiration is signed separately
+        assert client.generate_presigned_url('uid/mid2', ['GET', 'HEAD']) != url
+        assert client.generate_presigned_url('uid/mid', ['PUT']) != url
+        expires_at = client.get_expires_at().add(hours=1)
+        assert client.generate_presigned_url('uid/mid', ['GET', 'HEAD'], expires_at=expires_at) != url
+        assert get_signer.call_count == 4
+
+    assert CloudFrontClient.pop_url_cache_stats() == {'hits': 1, 'misses': 4}
+    assert CloudFrontClient.pop_url_cache_stats() == {'hits': 0, 'misses': 0}
+
+
+def test_generate_presigned_url_cache_evicts_least_recently_used():
+    client = CloudFrontClient(get_key_pair, domain='my-domain', url_cache_size=2)
+    url1 = client.generate_presigned_url('p1', ['GET'])
+    client.generate_presigned_url('p2', ['GET'])
+    client.generate_presigned_url('p1', ['GET'])
+    client.generate_presigned_url('p3', ['GET'])
+    assert [key[0] for key in client.url_cache.urls] == ['p1', 'p3']
+    assert client.generate_presigned_url('p1', ['GET']) == url1
+    assert client.url_cache.pop_stats() == {'hits': 2, 'misses': 3}
+
+
+def test_generate_presigned_urls():
+    domain = 'random-domain-stirng.cloudfront.net'
+    client = CloudFrontClient(get_key_pair, domain=domain)
+    expires_at = pendulum.parse('2020-06-01T12:00:00Z')
+    filenames = ['native.jpg', '64p.jpg']
+
+    with patch.object(client, 'get_private_key', wraps=client.get_private_key) as get_private_key:
+        urls = client.generate_presigned_urls('uid/post/pid/image/', filenames, expires_at=expires_at)
+        # signed once between them, and that signature is reused
+        assert get_private_key.call_count == 1
+        assert client.generate_presigned_urls('uid/post/pid/image/', ['480p.jpg'], expires_at=expires_at)
+        assert get_private_key.call_count == 1
+        # nothing to sign
+        assert client.generate_presigned_urls('uid/post/pid2/image/', [], expires_at=expires_at) == []
+        assert get_private_key.call_count == 1
+
+    assert len(urls) == 2
+    parsed = [urllib.parse.urlparse(url) for url in urls]
+    assert [p.path for p in parsed] == ['/uid/post/pid/image/native.jpg', '/uid/post/pid/image/64p.jpg']
+    assert parsed[0].netloc == domain
+    assert parsed[0].query == parsed[1].query
+
+    # a custom policy over the whole directory
+    parsed_qs = urllib.parse.parse_qs(parsed[0].query)
+    assert set(parsed_qs.keys()) == {'Policy', 'Signature', 'Key-Pair-Id'}
+    assert parsed_qs['Key-Pair-Id'] == [testing_only_key_pair['keyId']]
+    encoded_policy = parsed_qs['Policy'][0].replace('-', '+').replace('_', '=').replace('~', '/')
+    assert json.loads(base64.b64decode(encoded_policy)) == {
+        'Statement': [
+            {
+                'Resource': f'https://{domain}/uid/post/pid/image/*',
+                'Condition': {'DateLessThan': {'AWS:EpochTime': expires_at.int_timestamp}},
+            }
+        ]
+    }
@@ -0,0 +1,604 @@
+import itertools
+import logging
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from app.clients import DynamoClient
+from app.clients.dynamo import CapacityRateLimiter
+
+
+@pytest.fixture
+def caching_client(dynamo_client):
+    client = DynamoClient(table_name=dynamo_client.table_name, cache_items=True)
+    yield client
+    DynamoClient.clear_item_caches()
+
+
+@pytest.fixture
+def item(dynamo_client):
+    item = {'partitionKey': 'pk', 'sortKey': 'sk', 'attr': 'value', 'things': [{'a': 1}]}
+    yield dynamo_client.add_item({'Item': item.copy()})
+
+
+def key(item):
+    return {'partitionKey': item['partitionKey'], 'sortKey': item['sortKey']}
+
+
+def typed_key(item):
+    return {'partitionKey': {'S': item['partitionKey']}, 'sortKey': {'S': item['sortKey']}}
+
+
+def test_item_caching_off_by_default(dynamo_client, item):
+    assert dynamo_client.item_cache is None
+    assert dynamo_client.get_item(key(item)) == item
+    dynamo_client.table.delete_item(Key=key(item))
+    assert dynamo_client.get_item(key(item)) is None
+
+
+def test_get_item_cached(caching_client, item):
+    assert caching_client.get_item(key(item)) == item
+    assert caching_client.item_cache.misses == 1
+    assert caching_client.item_cache.hits == 0
+
+    # delete the item behind the client's back, verify we still get it from the cache
+    caching_client.table.delete_item(Key=key(item))
+    assert caching_client.get_item(key(item)) == item
+    assert caching_client.item_cache.misses == 1
+    assert caching_client.item_cache.hits == 1
+
+    # clearing the cache exposes the deletion, and the absence of the item is cached too
+    assert DynamoClient.clear_item_caches() == {'hits': 1, 'misses': 1}
+    assert caching_client.get_item(key(item)) is None
+    assert caching_client.get_item(key(item)) is None
+    assert caching_client.item_cache.misses == 1
+    assert caching_client.item_cache.hits == 1
+
+
+def test_item_cache_per_thread(caching_client, item):
+    assert caching_client.get_item(key(item)) == item
+    caching_client.table.delete_item(Key=key(item))
+
+    # another thread doesn't see this thread's cached item, and clears only its own cache
+    results = []
+
+    def other_thread():
+        results.append(caching_client.get_item(key(item)))
+        results.append(DynamoClient.clear_item_caches())
+
+    thread = threading.Thread(target=other_thread)
+    thread.start()
+    thread.join()
+    assert results == [None, {'hits': 0, 'misses': 1}]
+    assert caching_client.get_item(key(item)) == item
+
+
+def test_get_item_cached_copies(caching_client, item):
+    cached = caching_client.get_item(key(item))
+    cached['attr'] = 'changed'
+    cached['things'][0]['a'] = 2
+    assert caching_client.get_item(key(item)) == item
+
+
+def test_get_item_cached_by_consistency(caching_client, item):
+    # an eventually consistent read can't serve a strongly consistent read
+    assert caching_client.get_item(key(item)) == item
+    assert caching_client.get_item(key(item), ConsistentRead=True) == item
+    assert caching_client.item_cache.misses == 2
+
+    # but a strongly consistent read can serve an eventually consistent read
+    DynamoClient.clear_item_caches()
+    assert caching_client.get_item(key(item), ConsistentRead=True) == item
+    assert caching_client.get_item(key(item)) == item
+    assert caching_client.item_cache.misses == 1
+    assert caching_client.item_cache.hits == 1
+
+
+def test_get_item_with_projection_not_cached(caching_client, item):
+    assert caching_client.get_item(key(item), ProjectionExpression='attr') == {'attr': 'value'}
+    assert caching_client.get_item(key(item)) == item
+    assert caching_client.item_cache.misses == 1
+    assert caching_client.item_cache.hits == 0
+
+
+def test_get_typed_item_cached(caching_client, item):
+    typed_item = caching_client.get_typed_item(typed_key(item))
+    assert typed_item['attr'] == {'S': 'value'}
+    caching_client.table.delete_item(Key=key(item))
+    assert caching_client.get_typed_item(typed_key(item)) == typed_item
+    assert caching_client.typed_item_cache.hits == 1
+    assert caching_client.typed_item_cache.misses == 1
+
+
+def test_writes_refresh_or_invalidate_cache(caching_client, item):
+    caching_client.get_item(key(item))
+    caching_client.get_typed_item(typed_key(item))
+
+    # update_item refreshes the cache
+    query_kwargs = {
+        'Key': key(item),
+        'UpdateExpression': 'SET attr = :v',
+        'ExpressionAttributeValues': {':v': 'updated'},
+    }
+    caching_client.update_item(query_kwargs)
+    assert caching_client.get_item(key(item))['attr'] == 'updated'
+    assert caching_client.get_typed_item(typed_key(item))['attr'] == {'S': 'updated'}
+
+    # so does set_attributes
+    caching_client.set_attributes(key(item), attr='set')
+    assert caching_client.get_item(key(item))['attr'] == 'set'
+
+    # as do counters
+    caching_client.increment_count(key(item), 'cnt')
+    assert caching_client.get_item(key(item))['cnt'] == 1
+
+    # deletes invalidate
+    caching_client.delete_item(key(item))
+    assert caching_client.get_item(key(item)) is None
+
+    # adds invalidate
+    caching_client.add_item({'Item': item.copy()})
+    assert caching_client.get_item(key(item)) == item
+
+
+def test_failed_update_invalidates_cache(caching_client, item):
+    assert caching_client.get_item(key(item)) == item
+    caching_client.table.delete_item(Key=key(item))
+    assert caching_client.decrement_count(key(item), 'cnt') is None
+    assert caching_client.get_item(key(item)) is None
+
+
+def test_transact_write_items_invalidates_cache(caching_client, item):
+    assert caching_client.get_item(key(item)) == item
+    transact = {
+        'Update': {
+            'Key': typed_key(item),
+            'UpdateExpression': 'SET attr = :v',
+            'ExpressionAttributeValues': {':v': {'S': 'transacted'}},
+        }
+    }
+    caching_client.transact_write_items([transact])
+    assert caching_client.get_item(key(item))['attr'] == 'transacted'
+
+
+def test_batch_writes_invalidate_cache(caching_client, item):
+    assert caching_client.get_item(key(item)) == item
+    caching_client.batch_delete(k for k in [key(item)])
+    assert caching_client.get_item(key(item)) is None
+    caching_client.batch_put_items(i for i in [item])
+    assert caching_client.get_item(key(item)) == item
+
+
+@pytest.fixture
+def items(dynamo_client):
+    items = [{'partitionKey': f'pk/{i}', 'sortKey': '-', 'index': i, 'name': f'n{i}'} for i in range(250)]
+    dynamo_client.batch_put_items(item for item in items)
+    yield items
+
+
+def test_batch_get_items_none(dynamo_client):
+    assert dynamo_client.batch_get_items([]) == []
+    assert dynamo_client.batch_get_items([{'partitionKey': 'pk/dne', 'sortKey': '-'}]) == [None]
+
+
+def test_batch_get_items_chunked_and_ordered(dynamo_client, items):
+    keys = [key(item) for item in reversed(items)]
+    keys.insert(10, {'partitionKey': 'pk/dne', 'sortKey': '-'})
+    with mock.patch.object(
+        dynamo_client.boto3_client, 'batch_get_item', wraps=dynamo_client.boto3_client.batch_get_item
+    ) as batch_get_item:
+        resp = dynamo_client.batch_get_items(keys)
+    assert batch_get_item.call_count == 3
+    assert resp == [*reversed(items[-10:]), None, *reversed(items[:-10])]
+
+
+def test_batch_get_items_dedupes(dynamo_client, items):
+    keys = [key(items[1]), key(items[0]), key(items[1]), key(items[1])]
+    with mock.patch.object(
+        dynamo_client.boto3_client, 'batch_get_item', wraps=dynamo_client.boto3_client.batch_get_item
+    ) as batch_get_item:
+        resp = dynamo_client.batch_get_items(keys)
+    assert resp == [items[1], items[0], items[1], items[1]]
+    assert len(batch_get_item.call_args.kwargs['RequestItems']['main-table']['Keys']) == 2
+
+
+def test_batch_get_items_projection(dynamo_client, items):
+    resp = dynamo_client.batch_get_items([key(items[2]), key(items[1])], projection_expression='index')
+    assert resp == [{**key(items[2]), 'index': 2}, {**key(items[1]), 'index': 1}]
+
+
+def test_batch_get_typed_items(dynamo_client, items):
+    resp = dynamo_client.batch_get_typed_items([typed_key(items[2]), typed_key(items[1])])
+    assert [item['index'] for item in resp] == [{'N': '2'}, {'N': '1'}]
+    assert [item['name'] for item in resp] == [{'S': 'n2'}, {'S': 'n1'}]
+
+
+def test_batch_get_items_retries_unprocessed_keys(dynamo_client, items):
+    real_batch_get_item = dynamo_client.boto3_client.batch_get_item
+
+    def batch_get_item_processing_one_key_at_a_time(RequestItems):
+        keys = RequestItems['main-table']['Keys']
+        resp = real_batch_get_item(RequestItems={'main-table': {**RequestItems['main-table'], 'Keys': keys[:1]}})
+        if keys[1:]:
+            resp['UnprocessedKeys'] = {'main-table': {**RequestItems['main-table'], 'Keys': keys[1:]}}
+        return resp
+
+    keys = [key(item) for item in items[:3]]
+    with mock.patch.object(
+        dynamo_client.boto3_client, 'batch_get_item', side_effect=batch_get_item_processing_one_key_at_a_time
+    ) as batch_get_item, mock.patch('app.clients.dynamo.time.sleep') as sleep:
+        assert dynamo_client.batch_get_items(keys) == items[:3]
+    assert batch_get_item.call_count == 3
+    assert sleep.call_count == 2
+
+    # verify we give up eventually
+    dynamo_client.batch_max_attempts = 2
+    with mock.patch.object(
+        dynamo_client.boto3_client, 'batch_get_item', side_effect=batch_get_item_processing_one_key_at_a_time
+    ), mock.patch('app.clients.dynamo.time.sleep'):
+        with pytest.raises(Exception, match='Unable to batch get 1 items after 2 attempts'):
+            dynamo_client.batch_get_items(keys)
+
+
+def test_batch_get_items_uses_item_cache(caching_client, items):
+    assert caching_client.get_item(key(items[0])) == items[0]
+    caching_client.table.delete_item(Key=key(items[0]))
+    assert caching_client.batch_get_items([key(items[1]), key(items[0])]) == [items[1], items[0]]
+    assert caching_client.item_cache.hits == 1
+
+    # results of batch gets are cached
+    caching_client.table.delete_item(Key=key(items[1]))
+    assert caching_client.get_item(key(items[1])) == items[1]
+    assert caching_client.item_cache.hits == 2
+
+
+@pytest.fixture
+def segmented_scan(dynamo_client):
+    "moto ignores Segment & TotalSegments, so simulate them by splitting items between segments by index"
+    scan = dynamo_client.table.scan
+
+    def segmented(Segment, TotalSegments, **kwargs):
+        resp = scan(**kwargs)
+        resp['Items'] = [item for item in resp['Items'] if item['index'] % TotalSegments == Segment]
+        return resp
+
+    with mock.patch.object(dynamo_client.table, 'scan', side_effect=segmented) as scan_mock:
+        yield scan_mock
+
+
+def test_parallel_scan_unordered(dynamo_client, items, segmented_scan):
+    scan = dynamo_client.parallel_scan({'Limit': 20}, total_segments=4)
+    scanned = list(scan.generate_unordered())
+    assert sorted(item['index'] for item in scanned) == list(range(250))
+    assert scan.resume_token is None
+    # each segment walked the whole table, 20 items at a time
+    assert segmented_scan.call_count == 4 * 13
+    assert {c.kwargs['Segment'] for c in segmented_scan.call_args_list} == {0, 1, 2, 3}
+    assert {c.kwargs['TotalSegments'] for c in segmented_scan.call_args_list} == {4}
+
+
+def test_parallel_scan_ordered(dynamo_client, items, segmented_scan):
+    scanned = list(dynamo_client.parallel_scan({'Limit': 20}, total_segments=3).generate_ordered())
+    assert sorted(item['index'] for item in scanned) == list(range(250))
+    assert scanned == list(dynamo_client.parallel_scan({'Limit': 20}, total_segments=3).generate_ordered())
+
+    # pages arrive round-robin by segment
+    segment_pages = []
+    for segment in range(3):
+        pages, last_key = [], False
+        while last_key is not None:
+            start_kwargs = {'ExclusiveStartKey': last_key} if last_key else {}
+            resp = segmented_scan.side_effect(Segment=segment, TotalSegments=3, Limit=20, **start_kwargs)
+            pages.append(resp['Items'])
+            last_key = resp.get('LastEvaluatedKey')
+        segment_pages.append(pages)
+    assert scanned == [item for round_pages in zip(*segment_pages) for page in round_pages for item in page]
+
+
+def test_generate_all_scan_parallel(dynamo_client, items, segmented_scan):
+    scanned = list(dynamo_client.generate_all_scan({}, total_segments=2))
+    assert sorted(item['index'] for item in scanned) == list(range(250))
+    assert segmented_scan.call_count == 2
+
+
+@pytest.mark.parametrize('ordered', [True, False])
+def test_parallel_scan_resume(dynamo_client, items, segmented_scan, ordered):
+    scan = dynamo_client.parallel_scan({'Limit': 20}, total_segments=4)
+    generator = scan.generate_ordered() if ordered else scan.generate_unordered()
+    first_run = [next(generator)['index'] for _ in range(60)]
+    resume_token = scan.resume_token
+    generator.close()
+    assert resume_token
+
+    # resuming with a different number of segments is an error
+    with pytest.raises(Exception, match='not 3'):
+        dynamo_client.parallel_scan({'Limit': 20}, total_segments=3, resume_token=resume_token)
+
+    scan = dynamo_client.parallel_scan({'Limit': 20}, total_segments=4, resume_token=resume_token)
+    second_run = [item['index'] for item in scan.generate_unordered()]
+    assert scan.resume_token is None
+    assert set(first_run) | set(second_run) == set(range(250))
+    # only items from pages partially consumed in the first run are seen twice
+    assert len(set(first_run) & set(second_run)) < 4 * 5
+    assert len(first_run) + len(second_run) < 250 + 4 * 5
+
+
+def test_parallel_scan_error(dynamo_client, items, segmented_scan):
+    segmented_scan.side_effect = Exception('anything')
+    with pytest.raises(Exception, match='anything'):
+        list(dynamo_client.parallel_scan({}, total_segments=2).generate_unordered())
+
+
+def test_parallel_scan_rate_limited(dynamo_client, items, segmented_scan):
+    scan = dynamo_client.parallel_scan({'Limit': 50}, total_segments=2, max_capacity_units_per_second=1000)
+    assert sorted(item['index'] for item in scan.generate_unordered()) == list(range(250))
+    assert {c.kwargs['ReturnConsumedCapacity'] for c in segmented_scan.call_args_list} == {'TOTAL'}
+
+
+def test_capacity_rate_limiter():
+    with mock.patch('app.clients.dynamo.time') as time_mock:
+        time_mock.monotonic.return_value = 100
+        rate_limiter = CapacityRateLimiter(10)
+
+        # first request goes right away, the next one waits for its capacity to be paid back
+        rate_limiter.wait()
+        assert time_mock.sleep.call_count == 0
+        rate_limiter.consumed(5)
+        rate_limiter.wait()
+        assert time_mock.sleep.call_args_list == [mock.call(0.5)]
+
+        # time passes, the next request goes right away
+        time_mock.monotonic.return_value = 101
+        rate_limiter.wait()
+        assert time_mock.sleep.call_count == 1
+
+
+def test_batch_write_none(dynamo_client):
+    with mock.patch.object(dynamo_client.table.meta.client, 'batch_write_item') as batch_write_item:
+        assert dynamo_client.batch_put_items(item for item in []) == 0
+        assert dynamo_client.batch_delete(key for key in []) == 0
+    assert batch_write_item.call_count == 0
+
+
+def test_batch_write_chunked(dynamo_client):
+    items = [{'partitionKey': f'pk/{i}', 'sortKey': '-', 'index': i} for i in range(260)]
+    real_batch_write_item = dynamo_client.table.meta.client.batch_write_item
+    with mock.patch.object(
+        dynamo_client.table.meta.client, 'batch_write_item', side_effect=real_batch_write_item
+    ) as batch_write_item:
+        assert dynamo_client.batch_put_items(item for item in items) == 260
+    assert batch_write_item.call_count == 11
+    assert dynamo_client.batch_get_items([key(item) for item in items]) == items
+
+    with mock.patch.object(
+        dynamo_client.table.meta.client, 'batch_write_item', side_effect=real_batch_write_item
+    ) as batch_write_item:
+        assert dynamo_client.batch_delete(key(item) for item in items[:30]) == 30
+    assert batch_write_item.call_count == 2
+    assert dynamo_client.batch_get_items([key(item) for item in items[:31]]) == [None] * 30 + [items[30]]
+
+
+def test_batch_write_backpressure(dynamo_client):
+    dynamo_client.batch_write_max_workers = 2
+    pulled, pulled_at_write = 0, []
+
+    def generate_items():
+        nonlocal pulled
+        for i in range(1000):
+            pulled += 1
+            yield {'partitionKey': f'pk/{i}', 'sortKey': '-'}
+
+    def write_chunk(requests):
+        pulled_at_write.append(pulled)
+        return len(requests), 0
+
+    with mock.patch.object(dynamo_client, '_batch_write_chunk', side_effect=write_chunk):
+        assert dynamo_client.batch_put_items(generate_items()) == 1000
+    assert len(pulled_at_write) == 40
+    # the generator is never more than (2 workers * 2 chunks + 1 being pulled) * 25 items ahead of writes
+    assert max(pulled - i * 25 for i, pulled in enumerate(pulled_at_write)) <= 5 * 25
+
+
+def test_batch_write_retries_unprocessed_items(dynamo_client):
+    items = [{'partitionKey': f'pk/{i}', 'sortKey': '-'} for i in range(3)]
+    real_batch_write_item = dynamo_client.table.meta.client.batch_write_item
+
+    def batch_write_item_processing_one_item_at_a_time(RequestItems):
+        requests = RequestItems['main-table']
+        resp = real_batch_write_item(RequestItems={'main-table': requests[:1]})
+        if requests[1:]:
+            resp['UnprocessedItems'] = {'main-table': requests[1:]}
+        return resp
+
+    with mock.patch.object(
+        dynamo_client.table.meta.client,
+        'batch_write_item',
+        side_effect=batch_write_item_processing_one_item_at_a_time,
+    ) as batch_write_item, mock.patch('app.clients.dynamo.time.sleep') as sleep:
+        assert dynamo_client.batch_put_items(item for item in items) == 3
+    assert batch_write_item.call_count == 3
+    assert sleep.call_count == 2
+    assert dynamo_client.batch_get_items([key(item) for item in items]) == items
+
+    # verify we give up eventually, reporting how many failed
+    dynamo_client.batch_max_attempts = 2
+    with mock.patch.object(
+        dynamo_client.table.meta.client,
+        'batch_write_item',
+        side_effect=batch_write_item_processing_one_item_at_a_time,
+    ), mock.patch('app.clients.dynamo.time.sleep'):
+        with pytest.raises(Exception, match='Unable to batch write 1 items after 2 attempts'):
+            dynamo_client.batch_delete(key(item) for item in items)
+
+
+@pytest.fixture
+def sorted_items(dynamo_client):
+    items = [{'partitionKey': 'pk', 'sortKey': f'{i:03}', 'index': i} for i in range(100)]
+    dynamo_client.batch_put_items(item for item in items)
+    yield items
+
+
+def query_kwargs(limit=10):
+    return {
+        'KeyConditionExpression': 'partitionKey = :pk',
+        'ExpressionAttributeValues': {':pk': 'pk'},
+        'Limit': limit,
+    }
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.mark.parametrize('prefetch_pages', [0, 1, 3])
+def test_generate_all_query_prefetch(dynamo_client, sorted_items, prefetch_pages):
+    assert list(dynamo_client.generate_all_query(query_kwargs(), prefetch_pages=prefetch_pages)) == sorted_items
+    scanned = list(dynamo_client.generate_all_scan({'Limit': 10}))
+    assert sorted(scanned, key=lambda item: item['index']) == sorted_items
+    assert list(dynamo_client.generate_all_scan({'Limit': 10}, prefetch_pages=prefetch_pages)) == scanned
+
+
+def test_generate_all_query_prefetch_reads_ahead_bounded(dynamo_client, sorted_items):
+    real_query = dynamo_client.table.query
+    with mock.patch.object(dynamo_client.table, 'query', side_effect=real_query) as query:
+        generator = dynamo_client.generate_all_query(query_kwargs(), prefetch_pages=2)
+        assert query.call_count == 0
+        assert next(generator) == sorted_items[0]
+
+        # one page being consumed, two buffered, and one read that waits for space in the buffer
+        assert wait_for(lambda: query.call_count == 4)
+        time.sleep(0.2)
+        assert query.call_count == 4
+
+        # consuming the rest of the first page frees up space in the buffer
+        assert list(itertools.islice(generator, 10)) == sorted_items[1:11]
+        assert wait_for(lambda: query.call_count == 5)
+
+
+def test_generate_all_query_prefetch_cancelled(dynamo_client, sorted_items):
+    thread_count = threading.active_count()
+    real_query = dynamo_client.table.query
+    with mock.patch.object(dynamo_client.table, 'query', side_effect=real_query) as query:
+        generator = dynamo_client.generate_all_query(query_kwargs(), prefetch_pages=2)
+        assert list(itertools.islice(generator, 3)) == sorted_items[:3]
+        assert threading.active_count() == thread_count + 1
+
+        # closing the generator stops the reading ahead
+        generator.close()
+        assert threading.active_count() == thread_count
+        call_count = query.call_count
+        time.sleep(0.2)
+        assert query.call_count == call_count < 10
+
+
+def test_generate_all_query_prefetch_error(dynamo_client, sorted_items):
+    real_query = dynamo_client.table.query
+
+    def query_failing_after_first_page(**kwargs):
+        if 'ExclusiveStartKey' in kwargs:
+            raise Exception('anything')
+        return real_query(**kwargs)
+
+    with mock.patch.object(dynamo_client.table, 'query', side_effect=query_failing_after_first_page):
+        generator = dynamo_client.generate_all_query(query_kwargs(), prefetch_pages=2)
+        assert list(itertools.islice(generator, 10)) == sorted_items[:10]
+        with pytest.raises(Exception, match='anything'):
+            next(generator)
+
+
+def test_buffered_counts_coalesced(dynamo_client, item):
+    dynamo_client.set_attributes(key(item), b=5)
+    real_update_item = dynamo_client.table.update_item
+    with mock.patch.object(dynamo_client.table, 'update_item', side_effect=real_update_item) as update_item:
+        with dynamo_client.buffered_counts() as counter_buffer:
+            assert dynamo_client.increment_count(key(item), 'a') is None
+            assert dynamo_client.increment_count(key(item), 'a') is None
+            assert dynamo_client.decrement_count(key(item), 'b') is None
+            assert dynamo_client.increment_count(key(item), 'a') is None
+            assert update_item.call_count == 0
+        assert update_item.call_count == 1
+    assert counter_buffer.recorded_count == 4
+    assert counter_buffer.update_count == 1
+    assert dynamo_client.counter_buffer is None
+    assert dynamo_client.get_item(key(item))['a'] == 3
+    assert dynamo_client.get_item(key(item))['b'] == 4
+
+
+def test_buffered_counts_not_below_zero(dynamo_client, item, caplog):
+    dynamo_client.set_attributes(key(item), a=1, b=1)
+    # applied one at a time, the second decrement of `a` would fail, so the net change must not be applied
+    with caplog.at_level(logging.WARNING):
+        with dynamo_client.buffered_counts():
+            dynamo_client.decrement_count(key(item), 'a')
+            dynamo_client.decrement_count(key(item), 'a')
+            dynamo_client.increment_count(key(item), 'a')
+            dynamo_client.decrement_count(key(item), 'b')
+    assert len(caplog.records) == 1
+    assert caplog.records[0].levelname == 'WARNING'
+    assert 'Failed to decrement a' in caplog.records[0].msg
+    assert dynamo_client.get_item(key(item))['a'] == 1
+    assert dynamo_client.get_item(key(item))['b'] == 0
+
+    # but going down then up from zero is fine
+    caplog.clear()
+    with caplog.at_level(logging.WARNING):
+        with dynamo_client.buffered_counts():
+            dynamo_client.increment_count(key(item), 'b')
+            dynamo_client.decrement_count(key(item), 'b')
+    assert len(caplog.records) == 0
+    assert dynamo_client.get_item(key(item))['b'] == 0
+
+
+def test_buffered_counts_item_dne(dynamo_client, caplog):
+    pk = {'partitionKey': 'pk-dne', 'sortKey': 'sk'}
+    with caplog.at_level(logging.WARNING):
+        with dynamo_client.buffered_counts():
+            dynamo_client.increment_count(pk, 'a')
+            dynamo_client.decrement_count(pk, 'b')
+    assert len(caplog.records) == 2
+    assert 'Failed to increment a' in caplog.records[0].msg
+    assert 'Failed to decrement b' in caplog.records[1].msg
+    assert dynamo_client.get_item(pk) is None
+
+
+def test_buffered_counts_flushed_before_other_writes(dynamo_client, item, caplog):
+    with caplog.at_level(logging.WARNING):
+        with dynamo_client.buffered_counts():
+            # fails, as there's nothing to decrement
+            dynamo_client.decrement_count(key(item), 'a')
+            # not deferred, the buffered decrement is applied first
+            assert dynamo_client.increment_count(key(item), 'a', defer=False)['a'] == 1
+            dynamo_client.increment_count(key(item), 'a')
+            # other writes to the item also apply buffered changes first
+            assert dynamo_client.set_attributes(key(item), b=1)['a'] == 2
+    assert len(caplog.records) == 1
+    assert 'Failed to decrement a' in caplog.records[0].msg
+    assert dynamo_client.get_item(key(item))['a'] == 2
+
+
+def test_buffered_counts_from_threads(dynamo_client, item):
+    def increment():
+        for _ in range(10):
+            dynamo_client.increment_count(key(item), 'a')
+
+    with dynamo_client.buffered_counts() as counter_buffer:
+        threads = [threading.Thread(target=increment) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert counter_buffer.recorded_count == 40
+    assert counter_buffer.update_count == 1
+    assert dynamo_client.get_item(key(item))['a'] == 40
+
+
+def test_buffered_counts_not_nested(dynamo_client):
+    with dynamo_client.buffered_counts():
+        with pytest.raises(AssertionError, match='nested'):
+            with dynamo_client.buffered_counts():
+                pass
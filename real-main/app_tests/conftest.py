@@ -57,7 +57,10 @@ def heic_dims():
 
 @pytest.fixture
 def appsync_client():
-    yield mock.Mock(clients.AppSyncClient(appsync_graphql_url='my-graphql-url'))
+    client = mock.Mock(clients.AppSyncClient(appsync_graphql_url='my-graphql-url'))
+    # as if all the mutations of a batch went through
+    client.send_batch.return_value = {}
+    yield client
 
 
 @pytest.fixture
@@ -203,6 +206,11 @@ def TestCardTemplate():
     yield TestCardTemplate
 
 
+@pytest.fixture
+def cascade_manager(dynamo_client):
+    yield models.CascadeManager({'dynamo': dynamo_client})
+
+
 @pytest.fixture
 def chat_manager(dynamo_client, appsync_client):
     yield models.ChatManager({'appsync': appsync_client, 'dynamo': dynamo_client})
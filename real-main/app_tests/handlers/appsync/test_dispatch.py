@@ -1,10 +1,14 @@
 import os
+from unittest import mock
 
 import pytest
 
+from app.clients import CloudFrontClient, DynamoClient
+
 # turning off route autodiscovery
 os.environ['APPSYNC_ROUTE_AUTODISCOVERY_PATH'] = ''
 from app.handlers.appsync import dispatch, routes  # noqa: E402 isort:skip
+from app.handlers.appsync.exceptions import ClientException  # noqa: E402 isort:skip
 
 
 @pytest.fixture
@@ -49,7 +53,12 @@ def test_basic_success(setup_one_route, cognito_authed_event):
         'success': {
             'caller_user_id': '42-42',
             'arguments': ['arg1', 'arg2'],
-            'kwargs': {'source': {'anotherField': 42}, 'context': {}, 'client': {'version': '1.2.3(456)'}},
+            'kwargs': {
+                'source': {'anotherField': 42},
+                'context': {},
+                'client': {'version': '1.2.3(456)'},
+                'selection_set_list': None,
+            },
         },
     }
 
@@ -60,7 +69,12 @@ def test_no_source(setup_one_route, cognito_authed_event):
         'success': {
             'caller_user_id': '42-42',
             'arguments': ['arg1', 'arg2'],
-            'kwargs': {'source': None, 'context': {}, 'client': {'version': '1.2.3(456)'}},
+            'kwargs': {
+                'source': None,
+                'context': {},
+                'client': {'version': '1.2.3(456)'},
+                'selection_set_list': None,
+            },
         },
     }
 
@@ -70,7 +84,12 @@ def test_api_key_authenticated(setup_one_route, api_key_authed_event):
         'success': {
             'caller_user_id': None,
             'arguments': ['arg1', 'arg2'],
-            'kwargs': {'source': {'anotherField': 42}, 'context': {}, 'client': {}},
+            'kwargs': {
+                'source': {'anotherField': 42},
+                'context': {},
+                'client': {},
+                'selection_set_list': None,
+            },
         },
     }
 
@@ -80,6 +99,99 @@ def test_context_passed(setup_one_route, api_key_authed_event):
         'success': {
             'caller_user_id': None,
             'arguments': ['arg1', 'arg2'],
-            'kwargs': {'source': {'anotherField': 42}, 'context': {'foo': 'bar'}, 'client': {}},
+            'kwargs': {
+                'source': {'anotherField': 42},
+                'context': {'foo': 'bar'},
+                'client': {},
+                'selection_set_list': None,
+            },
         },
     }
+
+
+def test_selection_set_list_passed(cognito_authed_event):
+    cognito_authed_event['selectionSetList'] = ['url', 'width']
+    routes.clear()
+    batch_handler = mock.Mock(return_value=[None])
+    routes.register_batch('Type.field')(batch_handler)
+    dispatch(cognito_authed_event, {})
+    assert batch_handler.call_args.kwargs['selection_set_list'] == ['url', 'width']
+
+
+def test_item_caches_cleared(setup_one_route, cognito_authed_event):
+    stats = {'hits': 0, 'misses': 0}
+    with mock.patch.object(DynamoClient, 'clear_item_caches', return_value=stats) as clear_item_caches:
+        dispatch(cognito_authed_event, {})
+    # once before the handler runs, and once after
+    assert clear_item_caches.call_count == 2
+
+
+@pytest.fixture
+def setup_batch_route():
+    routes.clear()
+
+    @routes.register_batch('Type.field')
+    def mocked_batch_handler(caller_user_id, arguments, sources, **kwargs):  # pylint: disable=unused-variable
+        if any(source.get('fail') for source in sources):
+            raise ClientException('Failed')
+        return [
+            {'caller_user_id': caller_user_id, 'arguments': args, 'source': source}
+            for args, source in zip(arguments, sources)
+        ]
+
+
+def test_batch_to_batch_handler(setup_batch_route, cognito_authed_event):
+    events = [{**cognito_authed_event, 'source': {'anotherField': i}} for i in range(3)]
+    assert dispatch(events, {}) == [
+        {'success': {'caller_user_id': '42-42', 'arguments': ['arg1', 'arg2'], 'source': {'anotherField': i}}}
+        for i in range(3)
+    ]
+
+
+def test_batch_to_batch_handler_client_error(setup_batch_route, cognito_authed_event):
+    events = [cognito_authed_event, {**cognito_authed_event, 'source': {'fail': True}}]
+    error = {'error': {'message': 'ClientError: Failed', 'data': None, 'info': None}}
+    assert dispatch(events, {}) == [error, error]
+
+
+def test_batch_handler_result_count_mismatch(cognito_authed_event):
+    routes.clear()
+    routes.register_batch('Type.field')(lambda caller_user_id, arguments, sources, **kwargs: [])
+    with pytest.raises(Exception, match='returned 0 results for 1 sources'):
+        dispatch([cognito_authed_event], {})
+
+
+def test_single_event_to_batch_handler(setup_batch_route, cognito_authed_event):
+    assert dispatch(cognito_authed_event, {}) == {
+        'success': {'caller_user_id': '42-42', 'arguments': ['arg1', 'arg2'], 'source': {'anotherField': 42}},
+    }
+
+
+def test_batch_to_single_handler(setup_one_route, cognito_authed_event):
+    resp = dispatch([cognito_authed_event, cognito_authed_event], {})
+    assert resp == [dispatch(cognito_authed_event, {})] * 2
+    assert dispatch([], {}) == []
+
+
+def test_batch_item_caches_cleared(setup_batch_route, cognito_authed_event):
+    stats = {'hits': 0, 'misses': 0}
+    with mock.patch.object(DynamoClient, 'clear_item_caches', return_value=stats) as clear_item_caches:
+        dispatch([cognito_authed_event] * 3, {})
+    # once before the batch handler runs, and once after
+    assert clear_item_caches.call_count == 2
+
+
+def test_signed_url_cache_stats_logged(setup_one_route, cognito_authed_event, caplog):
+    with mock.patch.object(CloudFrontClient, 'pop_url_cache_stats', return_value={'hits': 3, 'misses': 1}):
+        dispatch(cognito_authed_event, {})
+    docs = [record.embedded_metrics for record in caplog.records if hasattr(record, 'embedded_metrics')]
+    assert len(docs) == 1
+    assert (docs[0]['SignedUrlCacheHits'], docs[0]['SignedUrlCacheMisses']) == (3, 1)
+    assert docs[0]['SignedUrlCacheHitRate'] == 75
+    assert docs[0]['field'] == 'Type.field'
+
+    # nothing is logged if no urls were signed
+    caplog.clear()
+    with mock.patch.object(CloudFrontClient, 'pop_url_cache_stats', return_value={'hits': 0, 'misses': 0}):
+        dispatch(cognito_authed_event, {})
+    assert not [record for record in caplog.records if hasattr(record, 'embedded_metrics')]
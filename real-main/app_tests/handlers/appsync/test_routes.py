@@ -16,6 +16,19 @@ def test_graphql_adds_to_it():
     assert routes.cache == {'Mytype.myfield': myfunc}
 
 
+def test_register_batch():
+    @routes.register_batch('Mytype.myfield')
+    def myfunc():
+        pass
+
+    assert routes.cache == {}
+    assert routes.batch_cache == {'Mytype.myfield': myfunc}
+    assert routes.get_batch_handler('Mytype.myfield') is myfunc
+    assert routes.get_handler('Mytype.myfield') is None
+    routes.clear()
+    assert routes.batch_cache == {}
+
+
 def test_clear_works():
     @routes.register('Mytype.myfield')
     def myfunc():
@@ -1,6 +1,23 @@
-from unittest.mock import Mock
+import decimal
+import os
+import subprocess
+import sys
+import threading
+from unittest.mock import Mock, call, patch
 
-from app.handlers.dynamo.dispatch import DynamoDispatch
+import pytest
+from boto3.dynamodb.types import Binary, TypeDeserializer, TypeSerializer
+
+from app.handlers.dynamo import dispatch as dispatch_module
+from app.handlers.dynamo.dispatch import (
+    DynamoDispatch,
+    ItemLoader,
+    LazyImage,
+    RecordListener,
+    StreamRecord,
+    deserialize,
+    process_records_by_partition_key,
+)
 
 
 def test_dynamo_dispatch_pk_sk_prefixes():
@@ -94,3 +111,414 @@ def test_dynamo_dispatch_attributes():
     assert dispatch.search('pkpre', 'skpre', 'INSERT', {}, {'k3': 'd'}) == []
     assert dispatch.search('pkpre', 'skpre', 'INSERT', {'k3': ''}, {}) == [f3]
     assert dispatch.search('pkpre', 'skpre', 'INSERT', {'k3': 42}, {}) == [f3]
+
+
+def test_dynamo_dispatch_attributes_defaults_per_listener():
+    dispatch = DynamoDispatch()
+
+    # same attribute, different defaults, so whether it has changed depends on the listener
+    f1, f2, f3 = Mock(), Mock(), Mock()
+    dispatch.register('pkpre', 'skpre', ['MODIFY'], f1, {'k1': 'a'})
+    dispatch.register('pkpre', 'skpre', ['MODIFY'], f2, {'k1': 'b'})
+    dispatch.register('pkpre', 'skpre', ['MODIFY'], f3, {'k1': 'a', 'k2': []})
+    assert dispatch.search('pkpre', 'skpre', 'MODIFY', {}, {}) == []
+    assert dispatch.search('pkpre', 'skpre', 'MODIFY', {}, {'k1': 'a'}) == [f2]
+    assert dispatch.search('pkpre', 'skpre', 'MODIFY', {'k1': 'b'}, {}) == [f1, f3]
+    assert dispatch.search('pkpre', 'skpre', 'MODIFY', {'k1': 'a'}, {'k1': 'b'}) == [f1, f2, f3]
+    assert dispatch.search('pkpre', 'skpre', 'MODIFY', {'k2': []}, {}) == []
+    assert dispatch.search('pkpre', 'skpre', 'MODIFY', {'k2': ['t']}, {}) == [f3]
+
+    # conditions shared between listeners are only compiled once
+    route = dispatch.routes[('pkpre', 'skpre', 'MODIFY')]
+    assert route.conditions == [('k1', 'a'), ('k1', 'b'), ('k2', [])]
+    assert [mask for _, mask, _ in route.listeners] == [0b001, 0b010, 0b101]
+
+
+def test_dynamo_dispatch_register_batch():
+    dispatch = DynamoDispatch()
+    f1, f2 = Mock(), Mock()
+    dispatch.register_batch('pkpre', 'skpre', ['INSERT', 'MODIFY'], f1, {'k1': None})
+    dispatch.register_batch('pkpre', 'skpre', ['REMOVE'], f2)
+    assert dispatch.pop_batches() == []
+
+    # matching records are collected, in order, rather than the handler being called
+    for item_id, old_item, new_item in [
+        ('id1', {}, {'k1': 'a'}),
+        ('id2', {'k1': 'a'}, {'k1': 'a'}),
+        ('id1', {'k1': 'a'}, {'k1': 'b'}),
+    ]:
+        event_name = 'MODIFY' if old_item else 'INSERT'
+        for func in dispatch.search('pkpre', 'skpre', event_name, old_item, new_item):
+            func(item_id, **{k: v for k, v in {'old_item': old_item, 'new_item': new_item}.items() if v})
+    assert f1.call_count == 0
+    assert dispatch.pop_batches() == [(f1, [('id1', None, {'k1': 'a'}), ('id1', {'k1': 'a'}, {'k1': 'b'})])]
+    assert dispatch.pop_batches() == []
+    assert 'batched' in repr(dispatch.search('pkpre', 'skpre', 'REMOVE', {}, {})[0])
+
+
+def test_dynamo_dispatch_register_batch_with_loader():
+    dispatch = DynamoDispatch()
+    f1, f2 = Mock(), Mock()
+    dispatch.register_batch('pkpre', 'skpre', ['INSERT'], f1, with_loader=True)
+    dispatch.register_batch('pkpre', 'skpre', ['INSERT'], f2)
+    for func in dispatch.search('pkpre', 'skpre', 'INSERT', {}, {'k1': 'a'}):
+        func('id1', new_item={'k1': 'a'})
+
+    # only handlers registered with the loader are passed it
+    loader = dispatch.loader()
+    batches = dispatch.pop_batches(loader=loader)
+    assert len(batches) == 2
+    func1, items1 = batches[0]
+    func2, items2 = batches[1]
+    assert items1 == items2 == [('id1', None, {'k1': 'a'})]
+    func1(items1)
+    func2(items2)
+    assert f1.mock_calls == [call(items1, loader=loader)]
+    assert f2.mock_calls == [call(items2)]
+
+
+def test_item_loader():
+    get_posts = Mock(
+        side_effect=lambda post_ids: [f'post-{post_id}' if post_id != 'dne' else None for post_id in post_ids]
+    )
+    get_users = Mock(side_effect=lambda user_ids: [f'user-{user_id}' for user_id in user_ids])
+    loader = ItemLoader({'post': get_posts, 'user': get_users})
+
+    assert loader.load_many('post', ['p1', 'p2', 'p1', 'dne']) == ['post-p1', 'post-p2', 'post-p1', None]
+    assert get_posts.mock_calls == [call(['p1', 'p2', 'dne'])]
+
+    # models already loaded, including those that do not exist, are not fetched again
+    assert loader.load('post', 'p2') == 'post-p2'
+    assert loader.load('post', 'dne') is None
+    assert loader.load_many('post', ['p3', 'p1']) == ['post-p3', 'post-p1']
+    assert get_posts.mock_calls == [call(['p1', 'p2', 'dne']), call(['p3'])]
+
+    # kinds are cached separately
+    assert loader.load('user', 'p1') == 'user-p1'
+    assert get_users.mock_calls == [call(['p1'])]
+
+
+def test_stream_record():
+    init_model = Mock(side_effect=lambda item: {'model': item})
+    record = StreamRecord('id1', old_item={'k': 'a'}, new_item={'k': 'b'}, init_model=init_model)
+    assert init_model.call_count == 0
+
+    # models are initialized on first access, once
+    assert record.new_model == {'model': {'k': 'b'}}
+    assert record.new_model is record.new_model
+    assert init_model.mock_calls == [call({'k': 'b'})]
+    assert record.old_model == {'model': {'k': 'a'}}
+    assert init_model.call_count == 2
+
+    # absent images have no model
+    record = StreamRecord('id1', new_item={'k': 'b'}, init_model=init_model)
+    assert record.old_model is None
+    assert init_model.call_count == 2
+
+
+def test_dynamo_dispatch_with_record():
+    dispatch = DynamoDispatch()
+    init_model = Mock()
+    dispatch.register_model('pkpre', 'skpre', init_model)
+    f1, f2, f3 = Mock(), Mock(), Mock()
+    dispatch.register('pkpre', 'skpre', ['INSERT'], f1, with_record=True)
+    dispatch.register('pkpre', 'skpre', ['INSERT'], f2, with_record=True)
+    dispatch.register('pkpre', 'skpre', ['INSERT'], f3)
+
+    funcs = dispatch.search('pkpre', 'skpre', 'INSERT', {}, {'k1': 'a'})
+    assert [isinstance(func, RecordListener) for func in funcs] == [True, True, False]
+    assert repr(funcs[0]) == repr(f1)
+
+    record = dispatch.stream_record('pkpre', 'skpre', 'id1', new_item={'k1': 'a'})
+    assert record.new_model is init_model.return_value
+    assert record.old_model is None
+    for func in funcs[:2]:
+        func('id1', new_item={'k1': 'a'}, record=record)
+    assert f1.mock_calls == f2.mock_calls == [call('id1', new_item={'k1': 'a'}, old_item=None, record=record)]
+
+    # kinds of items without a registered model have none
+    record = dispatch.stream_record('pkpre', 'other', 'id1', new_item={'k1': 'a'})
+    assert record.init_model is None
+
+
+def test_dynamo_dispatch_has_listeners():
+    dispatch = DynamoDispatch()
+    dispatch.register('pkpre', 'skpre', ['INSERT', 'MODIFY'], Mock(), {'k1': None})
+    assert dispatch.has_listeners('pkpre', 'skpre', 'INSERT') is True
+    assert dispatch.has_listeners('pkpre', 'skpre', 'MODIFY') is True
+    assert dispatch.has_listeners('pkpre', 'skpre', 'REMOVE') is False
+    assert dispatch.has_listeners('pkpre', 'other', 'INSERT') is False
+
+
+def test_deserialize_matches_boto():
+    item = {
+        'str': 'lore ipsum',
+        'int': 42,
+        'float': decimal.Decimal('3.14'),
+        'big': decimal.Decimal('12345678901234567890.123456789'),
+        'true': True,
+        'false': False,
+        'null': None,
+        'list': ['a', 1, [True, {'b': None}]],
+        'map': {'c': {'d': ['e']}, 'f': decimal.Decimal('-1')},
+        'empty_list': [],
+        'empty_map': {},
+        'bin': Binary(b'bytes'),
+        'str_set': {'a', 'b'},
+        'num_set': {1, 2},
+    }
+    typed_item = {k: TypeSerializer().serialize(v) for k, v in item.items()}
+    expected = {k: TypeDeserializer().deserialize(v) for k, v in typed_item.items()}
+    deserialized = {k: deserialize(v) for k, v in typed_item.items()}
+    assert deserialized == expected == item
+    assert type(deserialized['int']) is decimal.Decimal
+
+
+def test_lazy_image():
+    typed_image = {'a': {'S': 'value'}, 'b': {'N': '42'}, 'c': {'L': [{'BOOL': True}]}}
+    image = LazyImage(typed_image)
+    assert len(image) == 3
+    assert list(image) == ['a', 'b', 'c']
+    assert 'a' in image
+    assert 'd' not in image
+    assert image.get('d') is None
+    assert image.get('d', 'default') == 'default'
+    assert image.deserialized == {}
+
+    # attributes are deserialized on first access only
+    with patch.object(dispatch_module, 'deserialize', wraps=deserialize) as deserialize_mock:
+        assert image['b'] == 42
+        assert image.get('b') == 42
+    assert deserialize_mock.mock_calls == [call({'N': '42'})]
+    assert image.deserialized == {'b': 42}
+    assert image.to_dict() == {'a': 'value', 'b': 42, 'c': [True]}
+    assert dict(image) == {'a': 'value', 'b': 42, 'c': [True]}
+    assert not LazyImage({})
+
+
+def test_dynamo_dispatch_search_lazy_image():
+    dispatch = DynamoDispatch()
+    f1 = Mock()
+    dispatch.register('pkpre', 'skpre', ['MODIFY'], f1, {'k1': None})
+    old_image = LazyImage({'k1': {'S': 'a'}, 'big': {'M': {'k2': {'S': 'b'}}}})
+    new_image = LazyImage({'k1': {'S': 'b'}, 'big': {'M': {'k2': {'S': 'b'}}}})
+    assert dispatch.search('pkpre', 'skpre', 'MODIFY', old_image, new_image) == [f1]
+    # only the attribute filtered on was deserialized
+    assert old_image.deserialized == {'k1': 'a'}
+    assert new_image.deserialized == {'k1': 'b'}
+
+    # attributes whose typed values are identical are not deserialized at all
+    dispatch.register('pkpre', 'skpre', ['MODIFY'], Mock(), {'big': {}})
+    old_image = LazyImage({'k1': {'S': 'a'}, 'big': {'M': {'k2': {'S': 'b'}}}})
+    assert dispatch.search('pkpre', 'skpre', 'MODIFY', old_image, new_image) == [f1]
+    assert old_image.deserialized == {'k1': 'a'}
+
+
+def test_dynamo_dispatch_explain():
+    dispatch = DynamoDispatch()
+    f1, f2, f3, f4 = Mock(), Mock(), Mock(), Mock()
+    dispatch.register('user', 'profile', ['MODIFY'], f1)
+    dispatch.register('user', 'profile', ['MODIFY'], f2, {'email': None})
+    dispatch.register('user', 'profile', ['MODIFY'], f3, {'username': None, 'fullName': None})
+    dispatch.register('user', 'profile', ['REMOVE'], f4)
+
+    record = {
+        'eventName': 'MODIFY',
+        'dynamodb': {
+            'Keys': {'partitionKey': {'S': 'user/uid'}, 'sortKey': {'S': 'profile'}},
+            'OldImage': {'username': {'S': 'old'}, 'email': {'S': 'e@real.app'}},
+            'NewImage': {'username': {'S': 'new'}, 'fullName': {'S': 'Full'}, 'email': {'S': 'e@real.app'}},
+        },
+    }
+    assert dispatch.explain(record) == [
+        {'handler': f1, 'called': True, 'reason': 'no attribute filter on MODIFY'},
+        {'handler': f2, 'called': False, 'reason': 'unchanged: email'},
+        {'handler': f3, 'called': True, 'reason': 'changed: username, fullName'},
+    ]
+    assert dispatch.explain({**record, 'eventName': 'INSERT'}) == []
+
+
+def test_dynamo_dispatch_concurrency_safe():
+    dispatch = DynamoDispatch()
+    f1, f2, f3 = Mock(), Mock(), Mock()
+    dispatch.register('pkpre', 'skpre', ['MODIFY'], f1, {'k1': None})
+    dispatch.register('pkpre', 'skpre', ['MODIFY'], f2, {'k1': None}, concurrency_safe=True)
+    dispatch.register('pkpre', 'skpre', ['MODIFY'], f3, concurrency_safe=True)
+    assert dispatch.search('pkpre', 'skpre', 'MODIFY', {}, {}) == [f3]
+    assert dispatch.search('pkpre', 'skpre', 'MODIFY', {}, {'k1': 1}) == [f1, f2, f3]
+    assert dispatch.search('pkpre', 'skpre', 'MODIFY', {}, {'k1': 1}, concurrency_safe=True) == [f2, f3]
+    assert dispatch.search('pkpre', 'skpre', 'MODIFY', {}, {'k1': 1}, concurrency_safe=False) == [f1]
+    assert dispatch.search('pkpre', 'skpre', 'MODIFY', {}, {}, concurrency_safe=False) == []
+    assert dispatch.search_flagged('pkpre', 'skpre', 'MODIFY', {}, {'k1': 1}) == [
+        (f1, False),
+        (f2, True),
+        (f3, True),
+    ]
+    assert dispatch.search_flagged('pkpre', 'skpre', 'MODIFY', {}, {}) == [(f3, True)]
+    assert dispatch.search_flagged('pkpre', 'skpre', 'INSERT', {}, {}) == []
+
+
+def stream_record(pk, sk):
+    return {'dynamodb': {'Keys': {'partitionKey': {'S': pk}, 'sortKey': {'S': sk}}}}
+
+
+def test_process_records_by_partition_key_serially():
+    records = [stream_record('user/u1', 'profile'), stream_record('user/u2', 'profile')]
+    process_record = Mock()
+    process_records_by_partition_key(records, process_record, max_workers=1)
+    assert process_record.mock_calls == [call(record) for record in records]
+
+    # a single partition key is processed serially too
+    records = [stream_record('user/u1', 'profile'), stream_record('user/u1', 'follower/u2')]
+    process_record.reset_mock()
+    process_records_by_partition_key(records, process_record, max_workers=4)
+    assert process_record.mock_calls == [call(record) for record in records]
+
+    # as are partition keys that all need serial processing
+    records = [stream_record('user/u1', 'profile'), stream_record('user/u2', 'profile')]
+    process_record.reset_mock()
+    process_records_by_partition_key(records, process_record, max_workers=4, needs_serial=lambda record: True)
+    assert process_record.mock_calls == [call(record) for record in records]
+
+    process_record.reset_mock()
+    process_records_by_partition_key([], process_record, max_workers=4)
+    assert process_record.mock_calls == []
+
+
+def test_process_records_by_partition_key_prepared():
+    records = [stream_record('user/u1', 'profile'), stream_record('user/u2', 'profile')]
+    process_record = Mock()
+    prepare = Mock(side_effect=lambda record: ('prepared', record['dynamodb']['Keys']['partitionKey']['S']))
+    needs_serial = Mock(return_value=True)
+    process_records_by_partition_key(
+        records, process_record, max_workers=4, prepare=prepare, needs_serial=needs_serial
+    )
+    # each record is prepared once, and what that returned is used to both decide on & do the processing
+    assert prepare.mock_calls == [call(record) for record in records]
+    assert needs_serial.mock_calls == [call(('prepared', 'user/u1')), call(('prepared', 'user/u2'))]
+    assert process_record.mock_calls == [call(('prepared', 'user/u1')), call(('prepared', 'user/u2'))]
+
+
+def test_process_records_by_partition_key_concurrently():
+    records = [
+        stream_record('user/u1', 'profile'),
+        stream_record('post/p1', '-'),
+        stream_record('user/u1', 'follower/u2'),
+        stream_record('user/u2', 'profile'),
+        stream_record('post/p1', 'view/u1'),
+        stream_record('user/u3', 'profile'),
+        stream_record('user/u1', 'profile'),
+        stream_record('user/u3', 'follower/u1'),
+    ]
+    lock = threading.Lock()
+    processed = []  # (thread, partition key, sort key)
+
+    def process_record(record):
+        keys = record['dynamodb']['Keys']
+        with lock:
+            processed.append((threading.get_ident(), keys['partitionKey']['S'], keys['sortKey']['S']))
+
+    def needs_serial(record):
+        return record['dynamodb']['Keys']['sortKey']['S'].startswith('follower/')
+
+    process_records_by_partition_key(records, process_record, max_workers=2, needs_serial=needs_serial)
+    assert len(processed) == len(records)
+
+    # each partition key's records were processed in stream order, all on one thread
+    for pk in ('user/u1', 'post/p1', 'user/u2', 'user/u3'):
+        keys = [record['dynamodb']['Keys'] for record in records]
+        expected = [key['sortKey']['S'] for key in keys if key['partitionKey']['S'] == pk]
+        assert [sk for _, processed_pk, sk in processed if processed_pk == pk] == expected
+        assert len({thread for thread, processed_pk, _ in processed if processed_pk == pk}) == 1
+
+    # those of keys with a record that needs serial processing were on the calling thread, in stream order
+    assert [(pk, sk) for thread, pk, sk in processed if thread == threading.get_ident()] == [
+        ('user/u1', 'profile'),
+        ('user/u1', 'follower/u2'),
+        ('user/u3', 'profile'),
+        ('user/u1', 'profile'),
+        ('user/u3', 'follower/u1'),
+    ]
+    # the others on worker threads
+    assert {pk for thread, pk, _ in processed if thread != threading.get_ident()} == {'post/p1', 'user/u2'}
+
+
+def matches_filter_pattern(pattern, value):
+    "Does `value` match a Lambda event filter `pattern`? Supports just the exact and prefix matching we use."
+    if isinstance(pattern, dict):
+        return isinstance(value, dict) and all(
+            key in value and matches_filter_pattern(sub_pattern, value[key])
+            for key, sub_pattern in pattern.items()
+        )
+    return any(
+        value.startswith(option['prefix']) if isinstance(option, dict) else value == option for option in pattern
+    )
+
+
+def test_dynamo_dispatch_filter_patterns():
+    dispatch = DynamoDispatch()
+    registered = [
+        ('album', '-', ['INSERT', 'MODIFY', 'REMOVE']),
+        ('card', '-', ['INSERT', 'MODIFY', 'REMOVE']),
+        ('chat', 'member', ['INSERT', 'MODIFY', 'REMOVE']),
+        ('chat', 'view', ['INSERT', 'MODIFY']),
+        ('chatMessage', '-', ['INSERT', 'REMOVE']),
+        ('comment', '-', ['INSERT', 'REMOVE']),
+        ('post', '-', ['INSERT', 'MODIFY', 'REMOVE']),
+        ('post', 'view', ['INSERT', 'MODIFY']),
+        ('user', 'follower', ['INSERT', 'MODIFY', 'REMOVE']),
+        ('user', 'profile', ['INSERT', 'MODIFY', 'REMOVE']),
+    ]
+    for pk_prefix, sk_prefix, event_names in registered:
+        dispatch.register(pk_prefix, sk_prefix, event_names, Mock())
+    unregistered = [
+        ('post', 'trending', 'MODIFY'),
+        ('user', 'deleted', 'INSERT'),
+        ('user', 'firstStory', 'INSERT'),
+        ('userEmail', '-', 'INSERT'),
+        ('chat', 'member', 'NONE'),
+    ]
+
+    def matches(patterns, pk, sk, event_name):
+        record = {'eventName': event_name, **stream_record(pk, sk)}
+        return any(matches_filter_pattern(pattern, record) for pattern in patterns)
+
+    # with room for a pattern per group of pk prefixes, nothing unregistered is matched
+    patterns = dispatch.filter_patterns(max_patterns=10)
+    assert len(patterns) == 5  # album & card share a pattern, as do chatMessage & comment
+    for pk_prefix, sk_prefix, event_names in registered:
+        for event_name in event_names:
+            assert matches(patterns, f'{pk_prefix}/id', sk_prefix, event_name)
+            assert matches(patterns, f'{pk_prefix}/id', f'{sk_prefix}/id', event_name)
+    for pk_prefix, sk_prefix, event_name in unregistered:
+        assert not matches(patterns, f'{pk_prefix}/id', sk_prefix, event_name)
+    assert not matches(patterns, 'post/id', 'viewer', 'INSERT')
+
+    # patterns are merged to fit the limit, but no listener is ever filtered out
+    for max_patterns in (4, 2, 1):
+        patterns = dispatch.filter_patterns(max_patterns=max_patterns)
+        assert len(patterns) == max_patterns
+        for pk_prefix, sk_prefix, event_names in registered:
+            for event_name in event_names:
+                assert matches(patterns, f'{pk_prefix}/id', sk_prefix, event_name)
+                assert matches(patterns, f'{pk_prefix}/id', f'{sk_prefix}/id', event_name)
+        assert not matches(patterns, 'userEmail/id', '-', 'INSERT')
+
+    # split by pk prefix, each consumer gets just its own records
+    patterns = dispatch.filter_patterns(pk_prefixes=['chat', 'chatMessage'])
+    assert matches(patterns, 'chat/id', 'member/id', 'MODIFY')
+    assert matches(patterns, 'chatMessage/id', '-', 'INSERT')
+    assert not matches(patterns, 'post/id', '-', 'INSERT')
+    assert dispatch.filter_patterns(pk_prefixes=['other']) == []
+
+
+def test_dynamo_stream_filters_up_to_date():
+    # the filters deployed with the stream consumer are generated from the listeners registered in the handlers
+    script_path = os.path.join(os.path.dirname(__file__), '..', '..', 'bin', 'generate_dynamo_stream_filters.py')
+    try:
+        result = subprocess.run(
+            [sys.executable, script_path, '--check'], capture_output=True, text=True, check=True
+        )
+    except subprocess.CalledProcessError as err:
+        pytest.fail(err.stderr)
+    assert result.stdout == ''
@@ -0,0 +1,132 @@
+import json
+import logging
+from functools import partialmethod
+from unittest.mock import Mock
+
+import pytest
+
+from app.handlers.dynamo.dispatch import BatchListener
+from app.handlers.dynamo.metrics import ListenerMetrics, count_call, counting_calls, listener_name
+from app.logging import CloudWatchFormatter
+
+
+class Manager:
+    def on_thing(self, item_id, new_item=None, old_item=None):
+        pass
+
+    def on_attribute(self, attribute_name, item_id, new_item=None, old_item=None):
+        pass
+
+    on_email = partialmethod(on_attribute, 'email')
+
+
+def on_thing(item_id, new_item=None, old_item=None):
+    pass
+
+
+def test_listener_name():
+    manager = Manager()
+    assert listener_name(manager.on_thing) == 'Manager.on_thing'
+    assert listener_name(manager.on_email) == "Manager.on_attribute('email')"
+    assert listener_name(BatchListener(manager.on_thing)) == 'Manager.on_thing (batched)'
+    assert listener_name(on_thing) == 'on_thing'
+
+
+def test_measure(dynamo_client):
+    metrics = ListenerMetrics()
+    manager = Manager()
+    send = counting_calls('appsync', Mock())
+    for boto3_client in (dynamo_client.table.meta.client, dynamo_client.boto3_client):
+        boto3_client.meta.events.register('before-call.dynamodb', lambda **kwargs: count_call('dynamo'))
+    keys = [{'partitionKey': f'pk/{i}', 'sortKey': '-'} for i in range(250)]
+
+    # calls to services outside a listener call are not counted
+    send()
+    dynamo_client.get_item(keys[0])
+
+    with metrics.measure(manager.on_thing, 'INSERT: `pk` / `sk`'):
+        send()
+        dynamo_client.get_item(keys[0])
+    with metrics.measure(manager.on_thing, 'INSERT: `pk` / `sk`'):
+        # chunks are fetched from a pool of threads, those calls count too
+        dynamo_client.batch_get_items(keys)
+    with pytest.raises(Exception, match='broken'):
+        with metrics.measure(manager.on_email, 'INSERT: `pk` / `sk`'):
+            raise Exception('broken')
+
+    summary = metrics.summary()
+    assert list(summary) == ['Manager.on_thing', "Manager.on_attribute('email')"]
+    stats = summary['Manager.on_thing']
+    assert stats['count'] == 2
+    assert stats['maxMs'] <= stats['totalMs']
+    assert stats['p95Ms'] == stats['maxMs']
+    assert (stats['errors'], stats['slow'], stats['dynamo'], stats['appsync']) == (0, 0, 4, 1)
+    stats = summary["Manager.on_attribute('email')"]
+    assert (stats['count'], stats['errors'], stats['slow'], stats['dynamo'], stats['appsync']) == (1, 1, 0, 0, 0)
+
+
+def test_measure_p95():
+    metrics = ListenerMetrics()
+    metrics.durations['on_thing'] = [i / 1000 for i in range(100, 0, -1)]
+    stats = metrics.summary()['on_thing']
+    assert (stats['count'], stats['maxMs'], stats['p95Ms']) == (100, 100, 95)
+    assert stats['totalMs'] == pytest.approx(5050)
+
+
+def test_measure_slow_listener(caplog):
+    metrics = ListenerMetrics(slow_seconds=0)
+    with caplog.at_level(logging.WARNING):
+        with metrics.measure(on_thing, 'INSERT: `post/pid` / `-`'):
+            pass
+    assert len(caplog.records) == 1
+    assert caplog.records[0].levelname == 'WARNING'
+    assert 'Slow listener' in caplog.records[0].msg
+    assert 'INSERT: `post/pid` / `-`' in caplog.records[0].msg
+    assert 'on_thing' in caplog.records[0].msg
+    assert metrics.summary()['on_thing']['slow'] == 1
+
+
+def test_log(caplog, monkeypatch):
+    monkeypatch.setenv('AWS_LAMBDA_FUNCTION_NAME', 'real-dev-main-dynamoStream')
+    metrics = ListenerMetrics()
+    for _ in range(3):
+        with metrics.measure(on_thing, 'INSERT: `post/pid` / `-`'):
+            count_call('dynamo')
+    metrics.log(4)
+    assert len(caplog.records) == 1
+
+    # the whole log line is the embedded metrics document, so that CloudWatch can extract the metrics
+    doc = json.loads(CloudWatchFormatter().format(caplog.records[0]))
+    assert doc['_aws']['CloudWatchMetrics'] == [
+        {
+            'Namespace': 'REAL/DynamoStream',
+            'Dimensions': [['FunctionName']],
+            'Metrics': [
+                {'Name': 'Records', 'Unit': 'Count'},
+                {'Name': 'ListenerCalls', 'Unit': 'Count'},
+                {'Name': 'ListenerTime', 'Unit': 'Milliseconds'},
+                {'Name': 'ListenerErrors', 'Unit': 'Count'},
+                {'Name': 'SlowListenerCalls', 'Unit': 'Count'},
+                {'Name': 'DynamoCalls', 'Unit': 'Count'},
+                {'Name': 'AppSyncCalls', 'Unit': 'Count'},
+            ],
+        }
+    ]
+    assert doc['FunctionName'] == 'real-dev-main-dynamoStream'
+    assert (doc['Records'], doc['ListenerCalls'], doc['ListenerErrors'], doc['SlowListenerCalls']) == (4, 3, 0, 0)
+    assert (doc['DynamoCalls'], doc['AppSyncCalls']) == (3, 0)
+    assert doc['ListenerTime'] == doc['listeners']['on_thing']['totalMs']
+    assert doc['listeners']['on_thing']['count'] == 3
+    assert doc['requestId'] is None
+
+
+def test_log_extra_metrics(caplog):
+    metrics = ListenerMetrics()
+    metrics.log(2, extra_metrics={'NotificationsFired': (5, 'Count'), 'NotificationsSuppressed': (3, 'Count')})
+    assert len(caplog.records) == 1
+    doc = json.loads(CloudWatchFormatter().format(caplog.records[0]))
+    assert doc['_aws']['CloudWatchMetrics'][0]['Metrics'][-2:] == [
+        {'Name': 'NotificationsFired', 'Unit': 'Count'},
+        {'Name': 'NotificationsSuppressed', 'Unit': 'Count'},
+    ]
+    assert (doc['Records'], doc['NotificationsFired'], doc['NotificationsSuppressed']) == (2, 5, 3)
@@ -353,4 +353,6 @@ def test_increment_rank_count(album_dynamo):
     album_id = str(uuid4())
     with patch.object(album_dynamo, 'client') as dynamo_client_mock:
         album_dynamo.increment_rank_count(album_id)
-    assert dynamo_client_mock.mock_calls == [call.increment_count(album_dynamo.pk(album_id), 'rankCount')]
+    assert dynamo_client_mock.mock_calls == [
+        call.increment_count(album_dynamo.pk(album_id), 'rankCount', defer=False)
+    ]
@@ -2,7 +2,7 @@ import io
 import logging
 import uuid
 from os import path
-from unittest.mock import Mock, patch
+from unittest.mock import Mock, call, patch
 
 import pytest
 
@@ -42,6 +42,17 @@ def test_serialize(user, album):
     assert resp == album.item
 
 
+def test_serialize_fetches_owner_relationship_in_batch(user, album):
+    album.user_manager.block_manager.get_block_status = Mock()
+    album.user_manager.follower_manager.get_follow_status = Mock()
+    resp = album.serialize('caller-uid')
+    assert resp['ownedBy']['userId'] == user.id
+    assert resp['ownedBy']['blockerStatus'] == 'NOT_BLOCKING'
+    assert resp['ownedBy']['followedStatus'] == 'NOT_FOLLOWING'
+    assert album.user_manager.block_manager.get_block_status.call_count == 0
+    assert album.user_manager.follower_manager.get_follow_status.call_count == 0
+
+
 def test_update(album):
     # check starting state
     assert album.item['name'] == 'album name'
@@ -115,6 +126,33 @@ def test_get_art_image_url(album):
         assert album.get_art_image_url(size) == image_url
 
 
+def test_get_art_image_urls(album):
+    album.cloudfront_client.configure_mock(
+        **{'generate_presigned_urls.return_value': ['u1', 'u2', 'u3', 'u4', 'u5']}
+    )
+
+    # should get placeholder images when album has no artHash
+    album.frontend_resources_domain = 'here.there.com'
+    urls = album.get_art_image_urls()
+    assert urls['url'] == 'https://here.there.com/default-album-art/native.jpg'
+    assert urls['url4k'] == 'https://here.there.com/default-album-art/4K.jpg'
+    assert len(urls) == 5
+
+    # set an artHash, in mem is enough, all sizes are signed together
+    album.item['artHash'] = 'deadbeef'
+    album.cloudfront_client.reset_mock()
+    assert album.get_art_image_urls() == {
+        'url': 'u1',
+        'url4k': 'u2',
+        'url1080p': 'u3',
+        'url480p': 'u4',
+        'url64p': 'u5',
+    }
+    path_prefix = f'{album.get_art_image_path_prefix()}/deadbeef/'
+    filenames = [size.filename for size in image_size.JPEGS]
+    assert album.cloudfront_client.mock_calls == [call.generate_presigned_urls(path_prefix, filenames)]
+
+
 def test_delete_art_images(album):
     # set an art hash and put imagery in mocked s3
     art_hash = 'hashing'
@@ -0,0 +1,78 @@
+import uuid
+from unittest import mock
+
+import pytest
+
+from app.models.block.enums import AccessAction, AccessDenial
+from app.models.follower.enums import FollowStatus
+from app.models.user.enums import UserPrivacyStatus
+
+
+@pytest.fixture
+def user(user_manager, cognito_client):
+    user_id, username = str(uuid.uuid4()), str(uuid.uuid4())[:8]
+    cognito_client.create_verified_user_pool_entry(user_id, username, f'{username}@real.app')
+    yield user_manager.create_cognito_only_user(user_id, username)
+
+
+user2 = user
+
+
+@pytest.fixture
+def access_policy(block_manager):
+    yield block_manager.access_policy
+
+
+def test_check_unrelated(access_policy, user, user2):
+    with mock.patch.object(
+        access_policy.user_manager.dynamo.client,
+        'batch_get_items',
+        wraps=access_policy.user_manager.dynamo.client.batch_get_items,
+    ) as batch_get_items_mock:
+        access = access_policy.check(user.id, user2.id, AccessAction.LIKE)
+    assert batch_get_items_mock.call_count == 1
+    assert access.denial is None
+    assert access.target_user_item['userId'] == user2.id
+    assert access.follow_item is None
+
+    with pytest.raises(AssertionError, match='Unrecognized access action'):
+        access_policy.check(user.id, user2.id, 'NOPE')
+
+
+def test_check_self(access_policy, user):
+    user.set_privacy_status(UserPrivacyStatus.PRIVATE)
+    for action in AccessAction._ALL:
+        access = access_policy.check(user.id, user.id, action)
+        assert access.denial is None
+        assert access.target_user_item['userId'] == user.id
+
+
+@pytest.mark.parametrize('action', AccessAction._ALL)
+def test_check_blocks(access_policy, block_manager, user, user2, action):
+    block_manager.block(user, user2)
+    assert access_policy.check(user2.id, user.id, action).denial == AccessDenial.BLOCKED_BY_TARGET
+    assert access_policy.check(user.id, user2.id, action).denial == AccessDenial.BLOCKING_TARGET
+
+
+def test_check_private(access_policy, follower_manager, user, user2):
+    user.set_privacy_status(UserPrivacyStatus.PRIVATE)
+    denials = {action: access_policy.check(user2.id, user.id, action).denial for action in AccessAction._ALL}
+    assert denials == {
+        AccessAction.LIKE: AccessDenial.NOT_FOLLOWER,
+        AccessAction.COMMENT: AccessDenial.NOT_FOLLOWER,
+        AccessAction.FLAG: None,
+        AccessAction.FLAG_POST: AccessDenial.NOT_FOLLOWER,
+        AccessAction.FOLLOW: None,
+        AccessAction.CHAT: None,
+    }
+
+    # a follow request isn't enough
+    follower_manager.request_to_follow(user2, user)
+    access = access_policy.check(user2.id, user.id, AccessAction.LIKE)
+    assert access.denial == AccessDenial.NOT_FOLLOWER
+    assert access.follow_item['followStatus'] == FollowStatus.REQUESTED
+
+    follower_manager.get_follow(user2.id, user.id).accept()
+    access = access_policy.check(user2.id, user.id, AccessAction.LIKE)
+    assert access.denial is None
+    assert access.follow_item['followStatus'] == FollowStatus.FOLLOWING
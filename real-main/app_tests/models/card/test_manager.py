@@ -59,6 +59,13 @@ post1 = post
 post2 = post
 
 
+def test_get_cards(card_manager, chat_card_template, requested_followers_card_template):
+    card1 = card_manager.add_or_update_card(chat_card_template)
+    card2 = card_manager.add_or_update_card(requested_followers_card_template)
+    cards = card_manager.get_cards([card2.id, 'cid-dne', card1.id])
+    assert [card.id if card else None for card in cards] == [card2.id, None, card1.id]
+
+
 @pytest.mark.parametrize(
     'template',
     pytest.lazy_fixture(['chat_card_template', 'comment_card_template', 'requested_followers_card_template']),
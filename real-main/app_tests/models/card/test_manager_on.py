@@ -99,24 +99,43 @@ def test_on_user_delete_delete_cards(card_manager, user, template):
     assert card_manager.get_card(template.card_id)
 
     # trigger, verify deletes card
-    card_manager.on_user_delete_delete_cards(user.id, old_item=user.item)
+    card_manager.on_user_delete_delete_cards([(user.id, user.item, None)])
     assert card_manager.get_card(template.card_id) is None
 
     # trigger, verify no error if there are no cards to delete
-    card_manager.on_user_delete_delete_cards(user.id, user.item)
+    card_manager.on_user_delete_delete_cards([(user.id, user.item, None)])
     assert card_manager.get_card(template.card_id) is None
 
 
-def test_on_post_delete_delete_cards(card_manager, post):
-    with patch.object(card_manager, 'delete_by_post') as delete_by_post_mock:
-        card_manager.on_post_delete_delete_cards(post.id, old_item=post.item)
-    assert delete_by_post_mock.mock_calls == [call(post.id)]
+def test_on_post_delete_delete_cards(card_manager, post1, post2, user):
+    card_id_1 = card_manager.add_or_update_card(templates.PostLikesCardTemplate(post1.user_id, post1.id)).id
+    card_id_2 = card_manager.add_or_update_card(templates.PostViewsCardTemplate(post2.user_id, post2.id)).id
+    card_id_3 = card_manager.add_or_update_card(templates.ChatCardTemplate(user.id, 2)).id
 
+    # both posts are handled in one batch, verify only their cards are deleted
+    card_manager.on_post_delete_delete_cards([(post1.id, post1.item, None), (post2.id, post2.item, None)])
+    assert card_manager.get_card(card_id_1) is None
+    assert card_manager.get_card(card_id_2) is None
+    assert card_manager.get_card(card_id_3)
+
+    # verify no error if there are no cards to delete
+    card_manager.on_post_delete_delete_cards([(post1.id, post1.item, None)])
+
+
+def test_on_comment_delete_delete_cards(card_manager, comment_manager, post, user1, user2):
+    comment1 = comment_manager.add_comment(str(uuid4()), post.id, user1.id, 'lore ipsum')
+    comment2 = comment_manager.add_comment(str(uuid4()), post.id, user1.id, 'lore ipsum')
+    card_id_1 = card_manager.add_or_update_card(templates.CommentMentionCardTemplate(user2.id, comment1)).id
+    card_id_2 = card_manager.add_or_update_card(templates.CommentMentionCardTemplate(user2.id, comment2)).id
+
+    card_manager.on_comment_delete_delete_cards([(comment1.id, comment1.item, None)])
+    assert card_manager.get_card(card_id_1) is None
+    assert card_manager.get_card(card_id_2)
 
-def test_on_comment_delete_delete_cards(card_manager, comment):
-    with patch.object(card_manager, 'delete_by_comment') as delete_by_comment_mock:
-        card_manager.on_comment_delete_delete_cards(comment.id, old_item=comment.item)
-    assert delete_by_comment_mock.mock_calls == [call(comment.id)]
+    card_manager.on_comment_delete_delete_cards(
+        [(comment1.id, comment1.item, None), (comment2.id, comment2.item, None)]
+    )
+    assert card_manager.get_card(card_id_2) is None
 
 
 @pytest.mark.parametrize(
@@ -129,22 +148,37 @@ def test_on_post_view_count_change_updates_cards(card_manager, post, template):
 
     # react to a view by a non-post owner, verify doesn't change state
     new_item = old_item = {'sortKey': f'view/{uuid4()}'}
-    card_manager.on_post_view_count_change_update_cards(post.id, new_item=new_item, old_item=old_item)
+    card_manager.on_post_view_count_change_update_cards([(post.id, old_item, new_item)])
     assert card_manager.get_card(template.card_id)
 
     # react to the viewCount going down by post owner, verify doesn't change state
     new_item = {'sortKey': f'view/{post.user_id}', 'viewCount': 2}
     old_item = {'sortKey': f'view/{post.user_id}', 'viewCount': 3}
-    card_manager.on_post_view_count_change_update_cards(post.id, new_item=new_item, old_item=old_item)
+    card_manager.on_post_view_count_change_update_cards([(post.id, old_item, new_item)])
     assert card_manager.get_card(template.card_id)
 
     # react to a view by post owner, verify card deleted
     new_item = {'sortKey': f'view/{post.user_id}', 'viewCount': 3}
     old_item = {'sortKey': f'view/{post.user_id}', 'viewCount': 2}
-    card_manager.on_post_view_count_change_update_cards(post.id, new_item=new_item, old_item=old_item)
+    card_manager.on_post_view_count_change_update_cards([(post.id, old_item, new_item)])
     assert card_manager.get_card(template.card_id) is None
 
 
+def test_on_post_view_count_change_updates_cards_batch(
+    card_manager, post, comment_card_template, post_likes_card_template
+):
+    # the same view item may change more than once in a batch
+    old_item = {'sortKey': f'view/{post.user_id}', 'viewCount': 1}
+    new_item = {'sortKey': f'view/{post.user_id}', 'viewCount': 2}
+    newer_item = {'sortKey': f'view/{post.user_id}', 'viewCount': 3}
+    other_item = {'sortKey': f'view/{uuid4()}', 'viewCount': 1}
+    card_manager.on_post_view_count_change_update_cards(
+        [(post.id, old_item, new_item), (post.id, None, other_item), (post.id, new_item, newer_item)]
+    )
+    assert card_manager.get_card(comment_card_template.card_id) is None
+    assert card_manager.get_card(post_likes_card_template.card_id) is None
+
+
 def test_on_card_add_sends_gql_notification(card_manager, card, user):
     with patch.object(card_manager, 'appsync') as appsync_mock:
         card_manager.on_card_add(card.id, card.item)
@@ -324,21 +358,21 @@ def test_on_post_original_post_id_change_update_card(
 
     # trigger for creating post with the original_post_id set, verify card created
     post2.item['originalPostId'] = post.id
-    card_manager.on_post_original_post_id_change_update_card(post2.id, new_item=post2.item)
+    card_manager.on_post_original_post_id_change_update_card([(post2.id, None, post2.item)])
     assert card_manager.get_card(card_id_0)
     assert card_manager.get_card(card_id_1) is None
 
     # trigger for changing the original_post_id set, verify old card deleted and new created
     old_item = post2.item.copy()
     post2.item['originalPostId'] = post1.id
-    card_manager.on_post_original_post_id_change_update_card(post2.id, new_item=post2.item, old_item=old_item)
+    card_manager.on_post_original_post_id_change_update_card([(post2.id, old_item, post2.item)])
     assert card_manager.get_card(card_id_0) is None
     assert card_manager.get_card(card_id_1)
 
     # trigger for clearing the original_post_id, verify old card deleted
     old_item = post2.item.copy()
     del post2.item['originalPostId']
-    card_manager.on_post_original_post_id_change_update_card(post2.id, new_item=post2.item, old_item=old_item)
+    card_manager.on_post_original_post_id_change_update_card([(post2.id, old_item, post2.item)])
     assert card_manager.get_card(card_id_0) is None
     assert card_manager.get_card(card_id_1) is None
 
@@ -347,7 +381,7 @@ def test_on_post_original_post_id_change_update_card(
     old_item = {**post2.item, 'originalPostId': old_original_post_id}
     new_item = {**post2.item, 'originalPostId': new_original_post_id}
     with caplog.at_level(logging.WARNING):
-        card_manager.on_post_original_post_id_change_update_card(post2.id, new_item=new_item, old_item=old_item)
+        card_manager.on_post_original_post_id_change_update_card([(post2.id, old_item, new_item)])
     assert len(caplog.records) == 2
     assert all(re.match(r'Original post `.*` not found', rec.msg) for rec in caplog.records)
     assert sum(1 for rec in caplog.records if old_original_post_id in rec.msg) == 1
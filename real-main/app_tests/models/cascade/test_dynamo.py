@@ -0,0 +1,94 @@
+import logging
+
+import pendulum
+import pytest
+
+from app.models.cascade.dynamo import CascadeDynamo
+
+
+@pytest.fixture
+def cascade_dynamo(dynamo_client):
+    yield CascadeDynamo(dynamo_client)
+
+
+def test_add_job(cascade_dynamo, caplog):
+    now = pendulum.now('utc')
+    assert cascade_dynamo.get_job('deleteThings', 'uid') is None
+
+    job_item = cascade_dynamo.add_job('deleteThings', 'uid', 'token1', now=now)
+    assert cascade_dynamo.get_job('deleteThings', 'uid') == job_item
+    assert job_item == {
+        'partitionKey': 'cascade/uid',
+        'sortKey': 'job/deleteThings',
+        'schemaVersion': 0,
+        'gsiK1PartitionKey': 'cascade',
+        'gsiK1SortKey': now.to_iso8601_string(),
+        'cascadeName': 'deleteThings',
+        'itemId': 'uid',
+        'nextToken': 'token1',
+        'sliceCount': 0,
+        'createdAt': now.to_iso8601_string(),
+        'lastSliceAt': now.to_iso8601_string(),
+    }
+
+    # a job for another cascade of the same item is separate
+    assert cascade_dynamo.add_job('deleteOthers', 'uid', 'token1', now=now)
+
+    # verify can't add a job twice
+    with caplog.at_level(logging.WARNING):
+        assert cascade_dynamo.add_job('deleteThings', 'uid', 'token2') is None
+    assert len(caplog.records) == 1
+    assert 'already exists' in caplog.records[0].msg
+    assert cascade_dynamo.get_job('deleteThings', 'uid') == job_item
+
+
+def test_advance_job(cascade_dynamo, caplog):
+    created_at = pendulum.now('utc')
+    cascade_dynamo.add_job('deleteThings', 'uid', 'token1', now=created_at)
+
+    now = pendulum.now('utc')
+    job_item = cascade_dynamo.advance_job('deleteThings', 'uid', 'token1', 'token2', now=now)
+    assert cascade_dynamo.get_job('deleteThings', 'uid') == job_item
+    assert job_item['nextToken'] == 'token2'
+    assert job_item['sliceCount'] == 1
+    assert job_item['createdAt'] == created_at.to_iso8601_string()
+    assert job_item['lastSliceAt'] == now.to_iso8601_string()
+    assert job_item['gsiK1SortKey'] == now.to_iso8601_string()
+
+    # verify a worker that is behind doesn't move the job backwards
+    with caplog.at_level(logging.WARNING):
+        assert cascade_dynamo.advance_job('deleteThings', 'uid', 'token1', 'token3') is None
+    assert len(caplog.records) == 1
+    assert 'already advanced' in caplog.records[0].msg
+    assert cascade_dynamo.get_job('deleteThings', 'uid') == job_item
+
+
+def test_get_jobs(cascade_dynamo):
+    job_item1 = cascade_dynamo.add_job('deleteThings', 'uid1', 'token1')
+    job_item2 = cascade_dynamo.add_job('deleteThings', 'uid2', 'token1')
+    job_pks = [cascade_dynamo.pk('deleteThings', item_id) for item_id in ('uid2', 'uid-dne', 'uid1')]
+    assert cascade_dynamo.get_jobs(job_pks) == [job_item2, None, job_item1]
+    assert cascade_dynamo.get_jobs([]) == []
+
+
+def test_delete_job(cascade_dynamo):
+    job_item = cascade_dynamo.add_job('deleteThings', 'uid', 'token1')
+    assert cascade_dynamo.delete_job('deleteThings', 'uid') == job_item
+    assert cascade_dynamo.get_job('deleteThings', 'uid') is None
+    assert cascade_dynamo.delete_job('deleteThings', 'uid') is None
+
+
+def test_generate_job_pks_stalled_since(cascade_dynamo):
+    now = pendulum.now('utc')
+    assert list(cascade_dynamo.generate_job_pks_stalled_since(now)) == []
+
+    cascade_dynamo.add_job('deleteThings', 'uid1', 'token1', now=now.subtract(hours=1))
+    cascade_dynamo.add_job('deleteThings', 'uid2', 'token1', now=now.subtract(minutes=30))
+    cascade_dynamo.add_job('deleteThings', 'uid3', 'token1', now=now)
+    pk1, pk2 = cascade_dynamo.pk('deleteThings', 'uid1'), cascade_dynamo.pk('deleteThings', 'uid2')
+    assert list(cascade_dynamo.generate_job_pks_stalled_since(now)) == [pk1, pk2]
+    assert list(cascade_dynamo.generate_job_pks_stalled_since(now.subtract(minutes=45))) == [pk1]
+
+    # a job that has progressed since is no longer stalled
+    cascade_dynamo.advance_job('deleteThings', 'uid1', 'token1', 'token2', now=now)
+    assert list(cascade_dynamo.generate_job_pks_stalled_since(now)) == [pk2]
@@ -0,0 +1,94 @@
+import logging
+from unittest.mock import Mock
+
+import pendulum
+import pytest
+
+
+@pytest.fixture
+def things():
+    # a stand-in for some items to cascade over, with the index of the next as the token to continue from
+    yield [f'thing{i}' for i in range(5)]
+
+
+@pytest.fixture
+def processed():
+    yield []
+
+
+@pytest.fixture
+def run_slice(things, processed):
+    def run_slice(item_id, limit, next_token=None):
+        start = int(next_token or 0)
+        processed.extend(things[start : start + limit])
+        return str(start + limit) if start + limit < len(things) else None
+
+    yield Mock(wraps=run_slice)
+
+
+def test_run_small_cascade_finishes_inline(cascade_manager, run_slice, things, processed):
+    cascade_manager.register('deleteThings', run_slice, slice_size=10)
+    cascade_manager.run('deleteThings', 'uid')
+    assert processed == things
+    assert run_slice.call_count == 1
+    assert cascade_manager.dynamo.get_job('deleteThings', 'uid') is None
+
+
+def test_run_large_cascade_continues_in_slices(cascade_manager, run_slice, things, processed):
+    cascade_manager.register('deleteThings', run_slice, slice_size=2)
+
+    # the first slice is run inline, and a job queued to continue
+    cascade_manager.run('deleteThings', 'uid')
+    assert processed == things[:2]
+    job_item = cascade_manager.dynamo.get_job('deleteThings', 'uid')
+    assert job_item['nextToken'] == '2'
+    assert job_item['sliceCount'] == 0
+
+    # the job's stream record triggers the next slice, which advances the job
+    cascade_manager.on_job_add_edit_run_slice('uid', new_item=job_item)
+    assert processed == things[:4]
+    job_item = cascade_manager.dynamo.get_job('deleteThings', 'uid')
+    assert job_item['nextToken'] == '4'
+    assert job_item['sliceCount'] == 1
+
+    # an old record replayed, say on a retry of the stream batch, doesn't set the job back
+    old_job_item = {**job_item, 'nextToken': '2'}
+    cascade_manager.on_job_add_edit_run_slice('uid', new_item=old_job_item)
+    assert cascade_manager.dynamo.get_job('deleteThings', 'uid') == job_item
+
+    # the last slice removes the job
+    cascade_manager.on_job_add_edit_run_slice('uid', new_item=job_item)
+    assert processed[-1:] == things[-1:]
+    assert set(processed) == set(things)
+    assert cascade_manager.dynamo.get_job('deleteThings', 'uid') is None
+    assert [c.args for c in run_slice.call_args_list] == [
+        ('uid', 2, None),
+        ('uid', 2, '2'),
+        ('uid', 2, '2'),
+        ('uid', 2, '4'),
+    ]
+
+
+def test_resume_stalled_jobs(cascade_manager, run_slice, things, processed, caplog):
+    cascade_manager.register('deleteThings', run_slice, slice_size=2)
+    failing_run_slice = Mock(side_effect=Exception('broken'))
+    cascade_manager.register('deleteOthers', failing_run_slice)
+    now = pendulum.now('utc')
+    cascade_manager.dynamo.add_job('deleteThings', 'uid1', '2', now=now.subtract(hours=1))
+    cascade_manager.dynamo.add_job('deleteOthers', 'uid1', '2', now=now.subtract(hours=1))
+    cascade_manager.dynamo.add_job('deleteThings', 'uid2', '2', now=now)
+
+    # only the jobs that have stalled are resumed, a failure of one doesn't stop the others
+    with caplog.at_level(logging.WARNING):
+        assert cascade_manager.resume_stalled_jobs(now=now) == 1
+    assert processed == things[2:4]
+    assert cascade_manager.dynamo.get_job('deleteThings', 'uid1')['nextToken'] == '4'
+    assert cascade_manager.dynamo.get_job('deleteOthers', 'uid1')['nextToken'] == '2'
+    assert cascade_manager.dynamo.get_job('deleteThings', 'uid2')['nextToken'] == '2'
+    assert failing_run_slice.call_count == 1
+    assert [r.levelname for r in caplog.records] == ['WARNING', 'WARNING', 'ERROR']
+    assert 'Resuming stalled cascade' in caplog.records[0].msg
+    assert 'broken' in caplog.records[2].msg
+
+    # the resumed job has progressed, so isn't stalled any more
+    assert cascade_manager.resume_stalled_jobs(now=now) == 0
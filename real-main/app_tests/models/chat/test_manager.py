@@ -50,6 +50,14 @@ def test_cant_add_direct_chat_already_exists(chat_manager, user1, user2):
         chat_manager.add_direct_chat('cid4', user2.id, user1.id)
 
 
+def test_get_chats(chat_manager, user1, user2, user3):
+    chat1 = chat_manager.add_direct_chat('cid1', user1.id, user2.id)
+    chat2 = chat_manager.add_direct_chat('cid2', user1.id, user3.id)
+    chats = chat_manager.get_chats([chat2.id, 'cid-dne', chat1.id])
+    assert [chat.id if chat else None for chat in chats] == [chat2.id, None, chat1.id]
+    assert chats[0].type == ChatType.DIRECT
+
+
 def test_add_direct_chat(chat_manager, user1, user2):
     now = pendulum.now('utc')
 
@@ -67,6 +67,31 @@ def test_trigger_notification(chat_message_appsync, message, chat, user1, user2,
     assert variables['input']['lastEditedAt'] is None
 
 
+def test_trigger_notifications(chat_message_appsync, message, user1, user2, appsync_client):
+    appsync_client.reset_mock()
+    chat_message_appsync.trigger_notifications('ntype', [user1.id, user2.id], message)
+    assert len(appsync_client.mock_calls) == 1
+    field, input_type, input_objs, selection = appsync_client.send_batch.call_args.args
+    assert field == 'triggerChatMessageNotification'
+    assert input_type == 'ChatMessageNotificationInput'
+    assert selection == chat_message_appsync.notification_selection
+    assert input_objs == [
+        chat_message_appsync.notification_input('ntype', user1.id, message),
+        chat_message_appsync.notification_input('ntype', user2.id, message),
+    ]
+    # each recipient sees the author as they would
+    assert json.loads(input_objs[1]['authorEncoded'])['userId'] == user1.id
+
+
+def test_trigger_notifications_failures_raised(chat_message_appsync, message, user1, user2, appsync_client):
+    appsync_client.send_batch.return_value = {user2.id: [{'message': 'Nope'}]}
+    with pytest.raises(Exception, match='notifications failed: .*Nope'):
+        chat_message_appsync.trigger_notifications('ntype', [user1.id, user2.id], message)
+    # the notifications of both were sent in the one batch regardless
+    assert appsync_client.send_batch.call_count == 1
+    assert len(appsync_client.send_batch.call_args.args[2]) == 2
+
+
 def test_trigger_notification_blocking_relationship(
     chat_message_appsync, chat_message_manager, chat, user1, user2, appsync_client, block_manager
 ):
@@ -96,11 +121,14 @@ def test_trigger_notification_system_message(
     # adding a system message triggers the notifcations automatically
     message = chat_message_manager.add_system_message_group_name_edited(group_chat.id, user1, 'cname')
     assert len(appsync_client.mock_calls) == 1
-    assert len(appsync_client.send.call_args.kwargs) == 0
-    assert len(appsync_client.send.call_args.args) == 2
-    mutation, variables = appsync_client.send.call_args.args
-    assert 'triggerChatMessageNotification' in str(mutation)
-    assert list(variables.keys()) == ['input']
+    assert len(appsync_client.send_batch.call_args.kwargs) == 0
+    assert len(appsync_client.send_batch.call_args.args) == 4
+    field, input_type, input_objs, selection = appsync_client.send_batch.call_args.args
+    assert field == 'triggerChatMessageNotification'
+    assert input_type == 'ChatMessageNotificationInput'
+    assert 'messageId' in selection
+    assert len(input_objs) == 1
+    variables = {'input': input_objs[0]}
     assert len(variables['input']) == 10
     assert variables['input']['userId'] == user1.id
     assert variables['input']['messageId'] == message.id
@@ -49,20 +49,15 @@ def test_add_system_message(chat_message_manager, chat, appsync_client, user2, u
     assert message.item['text'] == text
     assert message.item['textTags'] == []
 
-    # check the chat message notifications were triggered correctly
-    assert len(appsync_client.send.call_args_list) == 2
-    assert len(appsync_client.send.call_args_list[0].args) == 2
-    variables = appsync_client.send.call_args_list[0].args[1]
-    assert variables['input']['userId'] == user2.id
-    assert variables['input']['messageId'] == message.id
-    assert variables['input']['authorUserId'] is None
-    assert variables['input']['type'] == 'ADDED'
-    assert len(appsync_client.send.call_args_list[1].args) == 2
-    variables = appsync_client.send.call_args_list[1].args[1]
-    assert variables['input']['userId'] == user3.id
-    assert variables['input']['messageId'] == message.id
-    assert variables['input']['authorUserId'] is None
-    assert variables['input']['type'] == 'ADDED'
+    # check the chat message notifications were triggered correctly, together
+    assert len(appsync_client.send_batch.call_args_list) == 1
+    field, input_type, input_objs, _ = appsync_client.send_batch.call_args.args
+    assert (field, input_type) == ('triggerChatMessageNotification', 'ChatMessageNotificationInput')
+    assert [input_obj['userId'] for input_obj in input_objs] == [user2.id, user3.id]
+    for input_obj in input_objs:
+        assert input_obj['messageId'] == message.id
+        assert input_obj['authorUserId'] is None
+        assert input_obj['type'] == 'ADDED'
 
 
 def test_add_system_message_group_created(chat_message_manager, chat, user):
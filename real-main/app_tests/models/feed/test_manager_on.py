@@ -64,9 +64,10 @@ def test_on_post_status_change_sync_feed_post_completed(feed_manager, post):
                 feed_manager.on_post_status_change_sync_feed(post.id, new_item=post.item)
     assert add_post_mock.mock_calls == [call(post.user_id, post.item)]
     assert dynamo_mock.mock_calls == []
-    assert appsync_client_mock.mock_calls == [
-        call.fire_notification(user_ids[0], GqlNotificationType.USER_FEED_CHANGED),
-        call.fire_notification(user_ids[1], GqlNotificationType.USER_FEED_CHANGED),
+    assert len(appsync_client_mock.mock_calls) == 1
+    assert list(appsync_client_mock.fire_notifications.call_args.args[0]) == [
+        {'userId': user_ids[0], 'type': GqlNotificationType.USER_FEED_CHANGED},
+        {'userId': user_ids[1], 'type': GqlNotificationType.USER_FEED_CHANGED},
     ]
 
 
@@ -84,7 +85,8 @@ def test_on_post_status_change_sync_feed_post_uncompleted(feed_manager, post, st
                 feed_manager.on_post_status_change_sync_feed(post.id, new_item=new_item, old_item=old_item)
     assert add_post_mock.mock_calls == []
     assert dynamo_mock.mock_calls == [call.delete_by_post(post.id)]
-    assert appsync_client_mock.mock_calls == [
-        call.fire_notification(user_ids[0], GqlNotificationType.USER_FEED_CHANGED),
-        call.fire_notification(user_ids[1], GqlNotificationType.USER_FEED_CHANGED),
+    assert len(appsync_client_mock.mock_calls) == 1
+    assert list(appsync_client_mock.fire_notifications.call_args.args[0]) == [
+        {'userId': user_ids[0], 'type': GqlNotificationType.USER_FEED_CHANGED},
+        {'userId': user_ids[1], 'type': GqlNotificationType.USER_FEED_CHANGED},
     ]
@@ -1,5 +1,6 @@
 import logging
 import uuid
+from unittest.mock import patch
 
 import pendulum
 import pytest
@@ -45,6 +46,17 @@ def test_get_post_dne(post_manager):
     assert post_manager.get_post('pid-dne') is None
 
 
+def test_get_posts(post_manager, posts):
+    post1, post2 = posts
+    with patch.object(post_manager.dynamo.client, 'get_item') as get_item_mock:
+        fetched = post_manager.get_posts([post2.id, 'pid-dne', post1.id])
+    assert get_item_mock.call_count == 0
+    assert fetched[0].id == post2.id
+    assert fetched[1] is None
+    assert fetched[2].id == post1.id
+    assert post_manager.get_posts([]) == []
+
+
 def test_add_post_errors(post_manager, user):
     # try to add a post without any content (no text or media)
     with pytest.raises(PostException, match='without text'):
@@ -461,7 +473,8 @@ def test_delete_recently_expired_posts(post_manager, user, caplog):
     assert post_expired_last_week.refresh_item().item
 
 
-def test_delete_older_expired_posts(post_manager, user, caplog):
+@pytest.mark.parametrize('total_segments', [None, 3])
+def test_delete_older_expired_posts(post_manager, user, caplog, total_segments):
     now = pendulum.now('utc')
 
     # create four posts with diff. expiration qualities
@@ -499,7 +512,7 @@ def test_delete_older_expired_posts(post_manager, user, caplog):
     assert post_expired_last_week.item['expiresAt'] < (now - pendulum.duration(days=6)).to_iso8601_string()
 
     # run the deletion run
-    post_manager.delete_older_expired_posts()
+    post_manager.delete_older_expired_posts(total_segments=total_segments)
 
     # check we logged one delete
     assert len(caplog.records) == 1
@@ -5,6 +5,7 @@ from uuid import uuid4
 import pendulum
 import pytest
 
+from app.handlers.dynamo.dispatch import ItemLoader, StreamRecord
 from app.models.like.enums import LikeStatus
 from app.models.post.enums import PostStatus, PostType
 from app.utils import GqlNotificationType
@@ -82,35 +83,38 @@ def test_on_flag_add_force_archive_by_crowdsourced_criteria(post_manager, post,
     assert post.status == PostStatus.ARCHIVED
 
 
-def test_on_like_add(post_manager, post, like_onymous, like_anonymous):
+def test_on_like_add(post_manager, post, like_onymous, like_anonymous, caplog):
     # check starting state
     post.refresh_item()
     assert post.item.get('onymousLikeCount', 0) == 0
     assert post.item.get('anonymousLikeCount', 0) == 0
 
     # trigger, check state
-    post_manager.on_like_add(post.id, like_onymous.item)
+    post_manager.on_like_add([(post.id, None, like_onymous.item)])
     post.refresh_item()
     assert post.item.get('onymousLikeCount', 0) == 1
     assert post.item.get('anonymousLikeCount', 0) == 0
 
     # trigger, check state
-    post_manager.on_like_add(post.id, like_anonymous.item)
+    post_manager.on_like_add([(post.id, None, like_anonymous.item)])
     post.refresh_item()
     assert post.item.get('onymousLikeCount', 0) == 1
     assert post.item.get('anonymousLikeCount', 0) == 1
 
     # trigger, check state
-    post_manager.on_like_add(post.id, like_anonymous.item)
+    post_manager.on_like_add([(post.id, None, like_anonymous.item)])
     post.refresh_item()
     assert post.item.get('onymousLikeCount', 0) == 1
     assert post.item.get('anonymousLikeCount', 0) == 2
 
-    # checking junk like status
-    with pytest.raises(Exception, match='junkjunk'):
-        post_manager.on_like_add(post.id, {**like_onymous.item, 'likeStatus': 'junkjunk'})
+    # checking junk like status, logged without stopping the rest of the batch
+    junk_item = {**like_onymous.item, 'likeStatus': 'junkjunk'}
+    with caplog.at_level(logging.ERROR):
+        post_manager.on_like_add([(post.id, None, junk_item), (post.id, None, like_onymous.item)])
+    assert len(caplog.records) == 1
+    assert 'junkjunk' in caplog.records[0].msg
     post.refresh_item()
-    assert post.item.get('onymousLikeCount', 0) == 1
+    assert post.item.get('onymousLikeCount', 0) == 2
     assert post.item.get('anonymousLikeCount', 0) == 2
 
 
@@ -123,20 +127,20 @@ def test_on_like_delete(post_manager, post, like_onymous, like_anonymous, caplog
     assert post.item.get('anonymousLikeCount', 0) == 1
 
     # trigger, check state
-    post_manager.on_like_delete(post.id, like_onymous.item)
+    post_manager.on_like_delete([(post.id, like_onymous.item, None)])
     post.refresh_item()
     assert post.item.get('onymousLikeCount', 0) == 0
     assert post.item.get('anonymousLikeCount', 0) == 1
 
     # trigger, check state
-    post_manager.on_like_delete(post.id, like_anonymous.item)
+    post_manager.on_like_delete([(post.id, like_anonymous.item, None)])
     post.refresh_item()
     assert post.item.get('onymousLikeCount', 0) == 0
     assert post.item.get('anonymousLikeCount', 0) == 0
 
     # trigger, check fails softly
     with caplog.at_level(logging.WARNING):
-        post_manager.on_like_delete(post.id, like_onymous.item)
+        post_manager.on_like_delete([(post.id, like_onymous.item, None)])
     assert len(caplog.records) == 1
     assert 'Failed to decrement' in caplog.records[0].msg
     assert 'onymousLikeCount' in caplog.records[0].msg
@@ -145,9 +149,14 @@ def test_on_like_delete(post_manager, post, like_onymous, like_anonymous, caplog
     assert post.item.get('onymousLikeCount', 0) == 0
     assert post.item.get('anonymousLikeCount', 0) == 0
 
-    # checking junk like status
-    with pytest.raises(Exception, match='junkjunk'):
-        post_manager.on_like_delete(post.id, {**like_onymous.item, 'likeStatus': 'junkjunk'})
+    # checking junk like status, logged without stopping the rest of the batch
+    post_manager.dynamo.increment_anonymous_like_count(post.id)
+    junk_item = {**like_onymous.item, 'likeStatus': 'junkjunk'}
+    caplog.clear()
+    with caplog.at_level(logging.ERROR):
+        post_manager.on_like_delete([(post.id, junk_item, None), (post.id, like_anonymous.item, None)])
+    assert len(caplog.records) == 1
+    assert 'junkjunk' in caplog.records[0].msg
     post.refresh_item()
     assert post.item.get('onymousLikeCount', 0) == 0
     assert post.item.get('anonymousLikeCount', 0) == 0
@@ -163,7 +172,7 @@ def test_on_post_view_count_change_update_counts_view_by_post_owner_clears_unvie
 
     # react to a view by a non-post owner, verify doesn't change state
     new_item = old_item = {'sortKey': f'view/{uuid4()}'}
-    post_manager.on_post_view_count_change_update_counts(post.id, new_item=new_item, old_item=old_item)
+    post_manager.on_post_view_count_change_update_counts(post.id, new_item, old_item)
     post.refresh_item()
     assert 'gsiA3PartitionKey' in post.item
     assert post.item.get('commentsUnviewedCount', 0) == 1
@@ -171,7 +180,7 @@ def test_on_post_view_count_change_update_counts_view_by_post_owner_clears_unvie
     # react to the viewCount going down by post owner, verify doesn't change state
     new_item = {'sortKey': f'view/{post.user_id}', 'viewCount': 2}
     old_item = {'sortKey': f'view/{post.user_id}', 'viewCount': 3}
-    post_manager.on_post_view_count_change_update_counts(post.id, new_item=new_item, old_item=old_item)
+    post_manager.on_post_view_count_change_update_counts(post.id, new_item, old_item)
     post.refresh_item()
     assert 'gsiA3PartitionKey' in post.item
     assert post.item.get('commentsUnviewedCount', 0) == 1
@@ -179,7 +188,7 @@ def test_on_post_view_count_change_update_counts_view_by_post_owner_clears_unvie
     # react to a view by post owner, verify state reset
     new_item = {'sortKey': f'view/{post.user_id}', 'viewCount': 3}
     old_item = {'sortKey': f'view/{post.user_id}', 'viewCount': 2}
-    post_manager.on_post_view_count_change_update_counts(post.id, new_item=new_item, old_item=old_item)
+    post_manager.on_post_view_count_change_update_counts(post.id, new_item, old_item)
     post.refresh_item()
     assert 'gsiA3PartitionKey' not in post.item
     assert post.item.get('commentsUnviewedCount', 0) == 0
@@ -195,7 +204,7 @@ def test_on_post_view_count_change_update_counts_view_by_post_owner_race_conditi
     new_item = {'sortKey': f'view/{post.user_id}', 'viewCount': 1}
     with patch.object(post_manager, 'get_post', return_value=post):
         # should not throw exception
-        post_manager.on_post_view_count_change_update_counts(post.id, new_item=new_item)
+        post_manager.on_post_view_count_change_update_counts(post.id, new_item)
 
 
 def test_on_comment_add(post_manager, post, user, user2, comment_manager):
@@ -236,6 +245,19 @@ def test_on_comment_add(post_manager, post, user, user2, comment_manager):
     assert pendulum.parse(post.item['gsiA3SortKey']) == now
 
 
+def test_on_comment_add_shares_record_models(post_manager, post, user2, comment_manager):
+    comment = comment_manager.add_comment(str(uuid4()), post.id, user2.id, 'lore')
+    record = StreamRecord(comment.id, new_item=comment.item, init_model=comment_manager.init_comment)
+
+    # the comment model, and the post it loads, are shared with other listeners of the record
+    comment_post_manager = comment_manager.post_manager
+    with patch.object(comment_post_manager, 'get_post', wraps=comment_post_manager.get_post) as get_post:
+        post_manager.on_comment_add(comment.id, comment.item, record=record)
+        assert record.new_model.post.id == post.id
+    assert get_post.mock_calls == [call(post.id)]
+    assert post.refresh_item().item['commentsUnviewedCount'] == 1
+
+
 def test_on_comment_delete(post_manager, post, user2, caplog, comment_manager):
     # configure starting state, verify
     post_manager.dynamo.increment_comment_count(post.id, viewed=False)
@@ -467,6 +489,24 @@ def test_on_user_delete_delete_all_by_user(post_manager, user):
     assert list(post_manager.dynamo.generate_posts_by_user(user.id)) == []
 
 
+def test_on_user_delete_delete_all_by_user_in_slices(post_manager, user):
+    post_manager.cascade_manager.register('deletePostsByUser', post_manager.delete_slice_by_user, slice_size=2)
+    for post_id in ('pid1', 'pid2', 'pid3'):
+        post_manager.add_post(user, post_id, PostType.TEXT_ONLY, text='t')
+
+    # the first slice is deleted inline, the rest is left to a job
+    post_manager.on_user_delete_delete_all_by_user(user.id, old_item=user.item)
+    assert [item['postId'] for item in post_manager.dynamo.generate_posts_by_user(user.id)] == ['pid3']
+    job_item = post_manager.cascade_manager.dynamo.get_job('deletePostsByUser', user.id)
+    assert job_item['nextToken']
+
+    # run the job's slices as the stream would, until done
+    while job_item:
+        post_manager.cascade_manager.on_job_add_edit_run_slice(user.id, new_item=job_item)
+        job_item = post_manager.cascade_manager.dynamo.get_job('deletePostsByUser', user.id)
+    assert list(post_manager.dynamo.generate_posts_by_user(user.id)) == []
+
+
 def test_on_post_view_add_delete_sync_viewed_by_counts(post_manager, post, caplog):
     assert 'viewedByCount' not in post.refresh_item().item
     assert 'postViewedByCount' not in post.user.refresh_item().item
@@ -474,30 +514,43 @@ def test_on_post_view_add_delete_sync_viewed_by_counts(post_manager, post, caplo
     item_other_user = {'sortKey': f'view/{uuid4()}'}
 
     # trigger for creation of a new post view, verify
-    post_manager.on_post_view_add_delete_sync_viewed_by_counts(post.id, new_item=item_other_user)
+    post_manager.on_post_view_add_delete_sync_viewed_by_counts([(post.id, None, item_other_user)])
     assert post.refresh_item().item['viewedByCount'] == 1
     assert post.user.refresh_item().item['postViewedByCount'] == 1
 
     # trigger for creation of a new post view by post owner, verify does not affect counts
-    post_manager.on_post_view_add_delete_sync_viewed_by_counts(post.id, new_item=item_post_owner)
+    post_manager.on_post_view_add_delete_sync_viewed_by_counts([(post.id, None, item_post_owner)])
     assert post.refresh_item().item['viewedByCount'] == 1
     assert post.user.refresh_item().item['postViewedByCount'] == 1
 
     # trigger for deletion of a post view by post owner, verify does not affect counts
-    post_manager.on_post_view_add_delete_sync_viewed_by_counts(post.id, old_item=item_post_owner)
+    post_manager.on_post_view_add_delete_sync_viewed_by_counts([(post.id, item_post_owner, None)])
     assert post.refresh_item().item['viewedByCount'] == 1
     assert post.user.refresh_item().item['postViewedByCount'] == 1
 
     # trigger for deletion of post view, verify
-    post_manager.on_post_view_add_delete_sync_viewed_by_counts(post.id, old_item=item_other_user)
+    post_manager.on_post_view_add_delete_sync_viewed_by_counts([(post.id, item_other_user, None)])
     assert post.refresh_item().item['viewedByCount'] == 0
     assert post.user.refresh_item().item['postViewedByCount'] == 0
 
     # trigger for deletion of post view, verify logs error doesn't crash
     with caplog.at_level(logging.WARNING):
-        post_manager.on_post_view_add_delete_sync_viewed_by_counts(post.id, old_item=item_other_user)
+        post_manager.on_post_view_add_delete_sync_viewed_by_counts([(post.id, item_other_user, None)])
     assert len(caplog.records) == 2
     assert all(x in caplog.records[0].msg for x in ('Failed to decrement viewedByCount', post.id))
     assert all(x in caplog.records[1].msg for x in ('Failed to decrement postViewedByCount', post.user_id))
     assert post.refresh_item().item['viewedByCount'] == 0
     assert post.user.refresh_item().item['postViewedByCount'] == 0
+
+
+def test_on_post_view_add_delete_sync_viewed_by_counts_uses_loader(post_manager, post):
+    loader = ItemLoader({'post': post_manager.get_posts})
+    other_item = {'sortKey': f'view/{uuid4()}'}
+
+    # a post already loaded by an earlier listener is not fetched again
+    with patch.object(post_manager, 'get_posts', wraps=post_manager.get_posts) as get_posts:
+        loader.getters['post'] = get_posts
+        loader.load('post', post.id)
+        post_manager.on_post_view_add_delete_sync_viewed_by_counts([(post.id, None, other_item)], loader=loader)
+    assert get_posts.mock_calls == [call([post.id])]
+    assert post.refresh_item().item['viewedByCount'] == 1
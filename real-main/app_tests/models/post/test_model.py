@@ -161,6 +161,29 @@ def test_get_image_readonly_url(cloudfront_client, s3_uploads_client):
     assert cloudfront_client.mock_calls == [mock.call.generate_presigned_url(expected_path, ['GET', 'HEAD'])]
 
 
+def test_get_image_readonly_urls(cloudfront_client, s3_uploads_client):
+    item = {
+        'postedByUserId': 'user-id',
+        'postId': 'post-id',
+        'postType': PostType.IMAGE,
+        'postStatus': PostStatus.COMPLETED,
+    }
+    cloudfront_client.configure_mock(**{'generate_presigned_urls.return_value': ['u1', 'u2', 'u3', 'u4', 'u5']})
+
+    post = Post(item, cloudfront_client=cloudfront_client, s3_uploads_client=s3_uploads_client)
+    urls = post.get_image_readonly_urls()
+    assert urls == {'url': 'u1', 'url4k': 'u2', 'url1080p': 'u3', 'url480p': 'u4', 'url64p': 'u5'}
+
+    # all sizes are in the same directory, signed together
+    filenames = [size.filename for size in image_size.JPEGS]
+    assert cloudfront_client.mock_calls == [
+        mock.call.generate_presigned_urls('user-id/post/post-id/image/', filenames)
+    ]
+    assert all(
+        post.get_image_path(size) == f'user-id/post/post-id/image/{size.filename}' for size in image_size.JPEGS
+    )
+
+
 def test_get_hls_access_cookies(cloudfront_client, s3_uploads_client):
     user_id = 'uid'
     post_id = 'pid'
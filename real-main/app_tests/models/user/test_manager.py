@@ -35,6 +35,31 @@ def test_get_user_that_doesnt_exist(user_manager):
     assert resp is None
 
 
+def test_get_users(user_manager, user1, user2):
+    users = user_manager.get_users([user2.id, 'uid-dne', user1.id])
+    assert [user.id if user else None for user in users] == [user2.id, None, user1.id]
+    assert users[0].username == user2.username
+
+
+def test_serialize_many(user_manager, block_manager, follower_manager, user1, user2, user3):
+    follower_manager.request_to_follow(user1, user2)
+    block_manager.block(user3, user1)
+    user_manager.block_manager.get_block_status = mock.Mock()
+    user_manager.follower_manager.get_follow_status = mock.Mock()
+
+    users = user_manager.get_users([user2.id, user1.id, 'uid-dne', user3.id])
+    resps = user_manager.serialize_many(user1.id, users)
+    assert resps[2] is None
+    resps = [resps[0], resps[1], resps[3]]
+    assert [resp['userId'] for resp in resps] == [user2.id, user1.id, user3.id]
+    assert [resp['blockerStatus'] for resp in resps] == ['NOT_BLOCKING', 'SELF', 'BLOCKING']
+    assert [resp['followedStatus'] for resp in resps] == ['FOLLOWING', 'SELF', 'NOT_FOLLOWING']
+    # none of the relationships were read one by one
+    assert user_manager.block_manager.get_block_status.call_count == 0
+    assert user_manager.follower_manager.get_follow_status.call_count == 0
+    assert user_manager.serialize_many(user1.id, []) == []
+
+
 def test_get_user_by_username(user_manager, user1):
     # check a user that doesn't exist
     user = user_manager.get_user_by_username('nope_not_there')
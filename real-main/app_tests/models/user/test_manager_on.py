@@ -43,11 +43,11 @@ def test_on_comment_add_adjusts_counts(user_manager, user, comment):
     assert 'commentCount' not in org_item
 
     # process, check state
-    user_manager.on_comment_add(comment.id, comment.item)
+    user_manager.on_comment_add([(comment.id, None, comment.item)])
     assert user.refresh_item().item['commentCount'] == 1
 
     # process, check state
-    user_manager.on_comment_add(comment.id, comment.item)
+    user_manager.on_comment_add([(comment.id, None, comment.item)])
     assert user.refresh_item().item['commentCount'] == 2
 
     # check for unexpected state changes
@@ -58,20 +58,20 @@ def test_on_comment_add_adjusts_counts(user_manager, user, comment):
 
 def test_on_comment_delete_adjusts_counts(user_manager, user, comment, caplog):
     # configure, check & save starting state
-    user_manager.on_comment_add(comment.id, comment.item)
+    user_manager.on_comment_add([(comment.id, None, comment.item)])
     org_item = user.refresh_item().item
     assert org_item['commentCount'] == 1
     assert 'commentDeletedCount' not in org_item
 
     # process, check state
-    user_manager.on_comment_delete(comment.id, comment.item)
+    user_manager.on_comment_delete([(comment.id, comment.item, None)])
     new_item = user.refresh_item().item
     assert new_item['commentCount'] == 0
     assert new_item['commentDeletedCount'] == 1
 
     # process again, verify fails softly
     with caplog.at_level(logging.WARNING):
-        user_manager.on_comment_delete(comment.id, comment.item)
+        user_manager.on_comment_delete([(comment.id, comment.item, None)])
     assert len(caplog.records) == 1
     assert 'Failed to decrement' in caplog.records[0].msg
     assert 'commentCount' in caplog.records[0].msg
@@ -148,11 +148,11 @@ def test_on_card_add_increment_count(user_manager, user, card):
     assert user.refresh_item().item.get('cardCount', 0) == 0
 
     # handle add, verify state
-    user_manager.on_card_add_increment_count(card.id, card.item)
+    user_manager.on_card_add_increment_count([(card.id, None, card.item)])
     assert user.refresh_item().item.get('cardCount', 0) == 1
 
     # handle add, verify state
-    user_manager.on_card_add_increment_count(card.id, card.item)
+    user_manager.on_card_add_increment_count([(card.id, None, card.item)])
     assert user.refresh_item().item.get('cardCount', 0) == 2
 
 
@@ -161,12 +161,12 @@ def test_on_card_delete_decrement_count(user_manager, user, card, caplog):
     assert user.refresh_item().item.get('cardCount', 0) == 1
 
     # handle delete, verify state
-    user_manager.on_card_delete_decrement_count(card.id, card.item)
+    user_manager.on_card_delete_decrement_count([(card.id, card.item, None)])
     assert user.refresh_item().item.get('cardCount', 0) == 0
 
     # handle delete, verify fails softly and state unchanged
     with caplog.at_level(logging.WARNING):
-        user_manager.on_card_delete_decrement_count(card.id, card.item)
+        user_manager.on_card_delete_decrement_count([(card.id, card.item, None)])
     assert len(caplog.records) == 1
     assert 'Failed to decrement' in caplog.records[0].msg
     assert 'cardCount' in caplog.records[0].msg
@@ -181,11 +181,11 @@ def test_on_chat_member_add_update_chat_count(user_manager, chat, user):
     assert user.refresh_item().item.get('chatCount', 0) == 0
 
     # react to an add, check state
-    user_manager.on_chat_member_add_update_chat_count(chat.id, new_item=member_item)
+    user_manager.on_chat_member_add_update_chat_count([(chat.id, None, member_item)])
     assert user.refresh_item().item.get('chatCount', 0) == 1
 
     # react to another add, check state
-    user_manager.on_chat_member_add_update_chat_count(chat.id, new_item=member_item)
+    user_manager.on_chat_member_add_update_chat_count([(chat.id, None, member_item)])
     assert user.refresh_item().item.get('chatCount', 0) == 2
 
 
@@ -197,12 +197,12 @@ def test_on_chat_member_delete_update_chat_count(user_manager, chat, user, caplo
     assert user.refresh_item().item.get('chatCount', 0) == 1
 
     # react to an delete, check state
-    user_manager.on_chat_member_delete_update_chat_count(chat.id, old_item=member_item)
+    user_manager.on_chat_member_delete_update_chat_count([(chat.id, member_item, None)])
     assert user.refresh_item().item.get('chatCount', 0) == 0
 
     # react to another delete, verify fails softly
     with caplog.at_level(logging.WARNING):
-        user_manager.on_chat_member_delete_update_chat_count(chat.id, old_item=member_item)
+        user_manager.on_chat_member_delete_update_chat_count([(chat.id, member_item, None)])
     assert len(caplog.records) == 1
     assert 'Failed to decrement' in caplog.records[0].msg
     assert 'chatCount' in caplog.records[0].msg
@@ -215,11 +215,11 @@ def test_on_album_add_update_album_count(user_manager, album, user):
     assert user.refresh_item().item.get('albumCount', 0) == 0
 
     # react to an add, check state
-    user_manager.on_album_add_update_album_count(album.id, new_item=album.item)
+    user_manager.on_album_add_update_album_count([(album.id, None, album.item)])
     assert user.refresh_item().item.get('albumCount', 0) == 1
 
     # react to another add, check state
-    user_manager.on_album_add_update_album_count(album.id, new_item=album.item)
+    user_manager.on_album_add_update_album_count([(album.id, None, album.item)])
     assert user.refresh_item().item.get('albumCount', 0) == 2
 
 
@@ -229,12 +229,12 @@ def test_on_album_delete_update_album_count(user_manager, album, user, caplog):
     assert user.refresh_item().item.get('albumCount', 0) == 1
 
     # react to an delete, check state
-    user_manager.on_album_delete_update_album_count(album.id, old_item=album.item)
+    user_manager.on_album_delete_update_album_count([(album.id, album.item, None)])
     assert user.refresh_item().item.get('albumCount', 0) == 0
 
     # react to another delete, verify fails softly
     with caplog.at_level(logging.WARNING):
-        user_manager.on_album_delete_update_album_count(album.id, old_item=album.item)
+        user_manager.on_album_delete_update_album_count([(album.id, album.item, None)])
     assert len(caplog.records) == 1
     assert 'Failed to decrement' in caplog.records[0].msg
     assert 'albumCount' in caplog.records[0].msg
@@ -267,13 +267,13 @@ def test_on_post_status_change_sync_counts_new_status(
         assert user.item.get(col, 0) == 0
 
     # react to the change, check counts
-    user_manager.on_post_status_change_sync_counts(post_id, new_item=new_item, old_item=old_item)
+    user_manager.on_post_status_change_sync_counts([(post_id, old_item, new_item)])
     user.refresh_item()
     for col in count_cols:
         assert user.item.get(col, 0) == (1 if col == count_col_incremented else 0)
 
     # react to the change again, check counts
-    user_manager.on_post_status_change_sync_counts(post_id, new_item=new_item, old_item=old_item)
+    user_manager.on_post_status_change_sync_counts([(post_id, old_item, new_item)])
     user.refresh_item()
     for col in count_cols:
         assert user.item.get(col, 0) == (2 if col == count_col_incremented else 0)
@@ -304,14 +304,14 @@ def test_on_post_status_change_sync_counts_old_status(
         assert user.item.get(col, 0) == 1
 
     # react to the change, check counts
-    user_manager.on_post_status_change_sync_counts(post_id, new_item=new_item, old_item=old_item)
+    user_manager.on_post_status_change_sync_counts([(post_id, old_item, new_item)])
     user.refresh_item()
     for col in count_cols:
         assert user.item.get(col, 0) == (0 if col == count_col_decremented else 1)
 
     # react to the change again, verify fails softly
     with caplog.at_level(logging.WARNING):
-        user_manager.on_post_status_change_sync_counts(post_id, new_item=new_item, old_item=old_item)
+        user_manager.on_post_status_change_sync_counts([(post_id, old_item, new_item)])
     assert len(caplog.records) == 1
     assert 'Failed to decrement' in caplog.records[0].msg
     assert count_col_decremented in caplog.records[0].msg
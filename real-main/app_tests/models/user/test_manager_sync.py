@@ -118,13 +118,13 @@ def test_sync_chats_with_unviewed_messages_count_chat_member_added(user_manager,
     # sync add of member with no unviewed message count, verify
     new_item = chat.member_dynamo.get(chat.id, user.id)
     assert 'messagesUnviewedCount' not in new_item
-    user_manager.sync_chats_with_unviewed_messages_count(chat.id, new_item=new_item, old_item={})
+    user_manager.sync_chats_with_unviewed_messages_count([(chat.id, {}, new_item)])
     assert user.refresh_item().item.get('chatsWithUnviewedMessagesCount', 0) == 0
 
     # synd add of member with some unviewed message count, verify
     new_item = chat.member_dynamo.increment_messages_unviewed_count(chat.id, user.id)
     assert new_item['messagesUnviewedCount'] == 1
-    user_manager.sync_chats_with_unviewed_messages_count(chat.id, new_item=new_item, old_item={})
+    user_manager.sync_chats_with_unviewed_messages_count([(chat.id, {}, new_item)])
 
 
 def test_sync_chats_with_unviewed_messages_count_chat_member_edited(user_manager, chat, user):
@@ -135,17 +135,17 @@ def test_sync_chats_with_unviewed_messages_count_chat_member_edited(user_manager
     assert 'messagesUnviewedCount' not in item1
     item2 = chat.member_dynamo.increment_messages_unviewed_count(chat.id, user.id)
     assert item2['messagesUnviewedCount'] == 1
-    user_manager.sync_chats_with_unviewed_messages_count(chat.id, new_item=item2, old_item=item1)
+    user_manager.sync_chats_with_unviewed_messages_count([(chat.id, item1, item2)])
     assert user.refresh_item().item.get('chatsWithUnviewedMessagesCount', 0) == 1
 
     # sync edit of member from some unviewed message count some more, verify
     item3 = chat.member_dynamo.increment_messages_unviewed_count(chat.id, user.id)
     assert item3['messagesUnviewedCount'] == 2
-    user_manager.sync_chats_with_unviewed_messages_count(chat.id, new_item=item3, old_item=item2)
+    user_manager.sync_chats_with_unviewed_messages_count([(chat.id, item2, item3)])
     assert user.refresh_item().item.get('chatsWithUnviewedMessagesCount', 0) == 1
 
     # sync edit of member from some unviewed message count to none, verify
-    user_manager.sync_chats_with_unviewed_messages_count(chat.id, new_item=item1, old_item=item3)
+    user_manager.sync_chats_with_unviewed_messages_count([(chat.id, item3, item1)])
     assert user.refresh_item().item.get('chatsWithUnviewedMessagesCount', 0) == 0
 
 
@@ -156,18 +156,18 @@ def test_sync_chats_with_unviewed_messages_count_chat_member_deleted(user_manage
     # sync delete of member with no unviewed message count, verify
     old_item = chat.member_dynamo.get(chat.id, user.id)
     assert 'messagesUnviewedCount' not in old_item
-    user_manager.sync_chats_with_unviewed_messages_count(chat.id, new_item={}, old_item=old_item)
+    user_manager.sync_chats_with_unviewed_messages_count([(chat.id, old_item, {})])
     assert user.refresh_item().item.get('chatsWithUnviewedMessagesCount', 0) == 1
 
     # sync delete of member with some unviewed message count, verify
     old_item = chat.member_dynamo.increment_messages_unviewed_count(chat.id, user.id)
     assert old_item['messagesUnviewedCount'] == 1
-    user_manager.sync_chats_with_unviewed_messages_count(chat.id, new_item={}, old_item=old_item)
+    user_manager.sync_chats_with_unviewed_messages_count([(chat.id, old_item, {})])
     assert user.refresh_item().item.get('chatsWithUnviewedMessagesCount', 0) == 0
 
     # sync delete of member with some unviewed message count, verify fails softly
     with caplog.at_level(logging.WARNING):
-        user_manager.sync_chats_with_unviewed_messages_count(chat.id, new_item={}, old_item=old_item)
+        user_manager.sync_chats_with_unviewed_messages_count([(chat.id, old_item, {})])
     assert len(caplog.records) == 1
     assert 'Failed to decrement' in caplog.records[0].msg
     assert 'chatsWithUnviewedMessagesCount' in caplog.records[0].msg
@@ -188,13 +188,13 @@ def test_sync_follow_counts_due_to_follow_status_public_user_lifecycle(
     assert followed.refresh_item().item.get('followersRequestedCount', 0) == 0
 
     # sync, check state
-    user_manager.sync_follow_counts_due_to_follow_status(followed.id, new_item=follow.item)
+    user_manager.sync_follow_counts_due_to_follow_status([(followed.id, None, follow.item)])
     assert follower.refresh_item().item.get('followedCount', 0) == 1
     assert followed.refresh_item().item.get('followerCount', 0) == 1
     assert followed.refresh_item().item.get('followersRequestedCount', 0) == 0
 
     # sync unfollowing, check state
-    user_manager.sync_follow_counts_due_to_follow_status(followed.id, old_item=follow.item)
+    user_manager.sync_follow_counts_due_to_follow_status([(followed.id, follow.item, None)])
     assert follower.refresh_item().item.get('followedCount', 0) == 0
     assert followed.refresh_item().item.get('followerCount', 0) == 0
     assert followed.refresh_item().item.get('followersRequestedCount', 0) == 0
@@ -215,7 +215,7 @@ def test_sync_follow_counts_due_to_follow_status_private_user_lifecycle(
     assert followed.refresh_item().item.get('followersRequestedCount', 0) == 0
 
     # sync requested, check state
-    user_manager.sync_follow_counts_due_to_follow_status(followed.id, new_item=follow.item)
+    user_manager.sync_follow_counts_due_to_follow_status([(followed.id, None, follow.item)])
     assert follower.refresh_item().item.get('followedCount', 0) == 0
     assert followed.refresh_item().item.get('followerCount', 0) == 0
     assert followed.refresh_item().item.get('followersRequestedCount', 0) == 1
@@ -224,7 +224,7 @@ def test_sync_follow_counts_due_to_follow_status_private_user_lifecycle(
     old_item = follow.item.copy()
     follow.accept()
     assert follow.status == FollowStatus.FOLLOWING
-    user_manager.sync_follow_counts_due_to_follow_status(followed.id, new_item=follow.item, old_item=old_item)
+    user_manager.sync_follow_counts_due_to_follow_status([(followed.id, old_item, follow.item)])
     assert follower.refresh_item().item.get('followedCount', 0) == 1
     assert followed.refresh_item().item.get('followerCount', 0) == 1
     assert followed.refresh_item().item.get('followersRequestedCount', 0) == 0
@@ -233,7 +233,7 @@ def test_sync_follow_counts_due_to_follow_status_private_user_lifecycle(
     old_item = follow.item.copy()
     follow.deny()
     assert follow.status == FollowStatus.DENIED
-    user_manager.sync_follow_counts_due_to_follow_status(followed.id, new_item=follow.item, old_item=old_item)
+    user_manager.sync_follow_counts_due_to_follow_status([(followed.id, old_item, follow.item)])
     assert follower.refresh_item().item.get('followedCount', 0) == 0
     assert followed.refresh_item().item.get('followerCount', 0) == 0
     assert followed.refresh_item().item.get('followersRequestedCount', 0) == 0
@@ -242,7 +242,7 @@ def test_sync_follow_counts_due_to_follow_status_private_user_lifecycle(
     old_item = follow.item.copy()
     follow.accept()
     assert follow.status == FollowStatus.FOLLOWING
-    user_manager.sync_follow_counts_due_to_follow_status(followed.id, new_item=follow.item, old_item=old_item)
+    user_manager.sync_follow_counts_due_to_follow_status([(followed.id, old_item, follow.item)])
     assert follower.refresh_item().item.get('followedCount', 0) == 1
     assert followed.refresh_item().item.get('followerCount', 0) == 1
     assert followed.refresh_item().item.get('followersRequestedCount', 0) == 0
@@ -250,7 +250,7 @@ def test_sync_follow_counts_due_to_follow_status_private_user_lifecycle(
     # sync back to not following, check state
     old_item = follow.item.copy()
     assert follow.status == FollowStatus.FOLLOWING
-    user_manager.sync_follow_counts_due_to_follow_status(followed.id, old_item=old_item)
+    user_manager.sync_follow_counts_due_to_follow_status([(followed.id, old_item, None)])
     assert follower.refresh_item().item.get('followedCount', 0) == 0
     assert followed.refresh_item().item.get('followerCount', 0) == 0
     assert followed.refresh_item().item.get('followersRequestedCount', 0) == 0
@@ -272,7 +272,7 @@ def test_sync_follow_counts_due_to_follow_status_fails_softly(
 
     # sync a change that fails to decrement, verify fails softly
     with caplog.at_level(logging.WARNING):
-        user_manager.sync_follow_counts_due_to_follow_status(followed.id, old_item=follow.item)
+        user_manager.sync_follow_counts_due_to_follow_status([(followed.id, follow.item, None)])
     assert len(caplog.records) == 1
     assert 'Failed to decrement' in caplog.records[0].msg
     assert 'followersRequestedCount' in caplog.records[0].msg
@@ -290,7 +290,7 @@ def test_sync_follow_counts_due_to_follow_status_fails_softly(
     # sync a change that fails to decrement, verify fails softly
     caplog.clear()
     with caplog.at_level(logging.WARNING):
-        user_manager.sync_follow_counts_due_to_follow_status(followed.id, old_item=follow.item)
+        user_manager.sync_follow_counts_due_to_follow_status([(followed.id, follow.item, None)])
     assert len(caplog.records) == 2
     follower_records = [rec for rec in caplog.records if 'followerCount' in rec.msg]
     followed_records = [rec for rec in caplog.records if 'followedCount' in rec.msg]
@@ -310,11 +310,11 @@ def test_sync_chat_message_creation_count(user_manager, user2, message, system_m
     assert user2.refresh_item().item.get('chatMessagesCreationCount', 0) == 0
 
     # sync a message creation by user2, verify increments
-    user_manager.sync_chat_message_creation_count(message.id, new_item=message.item)
+    user_manager.sync_chat_message_creation_count([(message.id, None, message.item)])
     assert user2.refresh_item().item.get('chatMessagesCreationCount', 0) == 1
 
     # sync a system message creation, verify no error and no increment
-    user_manager.sync_chat_message_creation_count(system_message.id, new_item=system_message.item)
+    user_manager.sync_chat_message_creation_count([(system_message.id, None, system_message.item)])
     assert user2.refresh_item().item.get('chatMessagesCreationCount', 0) == 1
 
 
@@ -323,9 +323,9 @@ def test_sync_chat_message_deletion_count(user_manager, user2, message, system_m
     assert user2.refresh_item().item.get('chatMessagesDeletionCount', 0) == 0
 
     # sync a message deletion by user2, verify increments
-    user_manager.sync_chat_message_deletion_count(message.id, old_item=message.item)
+    user_manager.sync_chat_message_deletion_count([(message.id, message.item, None)])
     assert user2.refresh_item().item.get('chatMessagesDeletionCount', 0) == 1
 
     # sync a system message deletion, verify no error and no increment
-    user_manager.sync_chat_message_deletion_count(system_message.id, old_item=system_message.item)
+    user_manager.sync_chat_message_deletion_count([(system_message.id, system_message.item, None)])
     assert user2.refresh_item().item.get('chatMessagesDeletionCount', 0) == 1
@@ -109,6 +109,37 @@ def test_get_photo_url(user, uploaded_post, cloudfront_client):
         cloudfront_client.reset_mock()
 
 
+def test_get_photo_urls(user, uploaded_post, cloudfront_client):
+    user.placeholder_photos_directory = 'pp-photo-dir'
+    user.frontend_resources_domain = 'pp-photo-domain'
+
+    # neither set
+    assert user.get_photo_urls() is None
+
+    # placeholder code set
+    user.item['placeholderPhotoCode'] = 'pp-code'
+    url_root = f'https://{user.frontend_resources_domain}/{user.placeholder_photos_directory}'
+    urls = user.get_photo_urls()
+    assert urls['url'] == f'{url_root}/pp-code/native.jpg'
+    assert urls['url64p'] == f'{url_root}/pp-code/64p.jpg'
+    assert len(urls) == 5
+
+    # photo post set, all sizes are signed together
+    user.update_photo(uploaded_post.id)
+    cloudfront_client.configure_mock(**{'generate_presigned_urls.return_value': ['u1', 'u2', 'u3', 'u4', 'u5']})
+    cloudfront_client.reset_mock()
+    assert user.get_photo_urls() == {
+        'url': 'u1',
+        'url4k': 'u2',
+        'url1080p': 'u3',
+        'url480p': 'u4',
+        'url64p': 'u5',
+    }
+    path_prefix = user.get_photo_path(image_size.NATIVE)[: -len(image_size.NATIVE.filename)]
+    filenames = [size.filename for size in image_size.JPEGS]
+    assert cloudfront_client.mock_calls == [mock.call.generate_presigned_urls(path_prefix, filenames)]
+
+
 def test_set_photo_multiple_times(user, uploaded_post, another_uploaded_post):
     # verify it's not already set
     user.refresh_item()
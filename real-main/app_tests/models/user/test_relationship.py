@@ -0,0 +1,100 @@
+from unittest import mock
+
+import pytest
+
+from app.models.block.enums import BlockStatus
+from app.models.follower.enums import FollowStatus
+
+
+@pytest.fixture
+def user1(user_manager, cognito_client):
+    cognito_client.create_verified_user_pool_entry('uid1', 'uname1', 'uname1@real.app')
+    yield user_manager.create_cognito_only_user('uid1', 'uname1')
+
+
+@pytest.fixture
+def user2(user_manager, cognito_client):
+    cognito_client.create_verified_user_pool_entry('uid2', 'uname2', 'uname2@real.app')
+    yield user_manager.create_cognito_only_user('uid2', 'uname2')
+
+
+@pytest.fixture
+def user3(user_manager, cognito_client):
+    cognito_client.create_verified_user_pool_entry('uid3', 'uname3', 'uname3@real.app')
+    yield user_manager.create_cognito_only_user('uid3', 'uname3')
+
+
+@pytest.fixture
+def relationship_service(user_manager):
+    yield user_manager.relationship_service
+
+
+def test_get_relationships(relationship_service, block_manager, follower_manager, user1, user2, user3):
+    # user1 follows user2, user3 blocks user1
+    follower_manager.request_to_follow(user1, user2)
+    block_manager.block(user3, user1)
+
+    with mock.patch.object(
+        relationship_service.block_manager.dynamo.client,
+        'batch_get_items',
+        wraps=relationship_service.block_manager.dynamo.client.batch_get_items,
+    ) as batch_get_items_mock:
+        user_ids = [user2.id, user1.id, user3.id, 'uid-dne']
+        relationships = relationship_service.get_relationships(user1.id, user_ids)
+    assert batch_get_items_mock.call_count == 1
+    assert relationships == [
+        {
+            'blockerStatus': BlockStatus.NOT_BLOCKING,
+            'blockedStatus': BlockStatus.NOT_BLOCKING,
+            'followedStatus': FollowStatus.FOLLOWING,
+        },
+        {
+            'blockerStatus': BlockStatus.SELF,
+            'blockedStatus': BlockStatus.SELF,
+            'followedStatus': FollowStatus.SELF,
+        },
+        {
+            'blockerStatus': BlockStatus.BLOCKING,
+            'blockedStatus': BlockStatus.NOT_BLOCKING,
+            'followedStatus': FollowStatus.NOT_FOLLOWING,
+        },
+        {
+            'blockerStatus': BlockStatus.NOT_BLOCKING,
+            'blockedStatus': BlockStatus.NOT_BLOCKING,
+            'followedStatus': FollowStatus.NOT_FOLLOWING,
+        },
+    ]
+
+    # same answers from the other direction
+    relationships = relationship_service.get_relationships(user3.id, [user1.id])
+    assert relationships[0]['blockedStatus'] == BlockStatus.BLOCKING
+    assert relationships[0]['blockerStatus'] == BlockStatus.NOT_BLOCKING
+    assert relationship_service.get_relationships(user2.id, [user1.id])[0]['followedStatus'] == 'NOT_FOLLOWING'
+    assert relationship_service.get_relationships(user1.id, []) == []
+
+    # the caller's blocks of the users need not be fetched
+    with mock.patch.object(
+        relationship_service.block_manager.dynamo.client,
+        'batch_get_items',
+        wraps=relationship_service.block_manager.dynamo.client.batch_get_items,
+    ) as batch_get_items_mock:
+        relationships = relationship_service.get_relationships(
+            user1.id, [user3.id, user1.id], blocked_status=False
+        )
+    assert len(batch_get_items_mock.call_args.args[0]) == 2
+    assert relationships == [
+        {'blockerStatus': BlockStatus.BLOCKING, 'followedStatus': FollowStatus.NOT_FOLLOWING},
+        {'blockerStatus': BlockStatus.SELF, 'followedStatus': FollowStatus.SELF},
+    ]
+
+
+def test_get_pair_relationships(relationship_service, block_manager, user1, user2, user3):
+    block_manager.block(user2, user3)
+    relationships = relationship_service.get_pair_relationships(
+        [(user1.id, user2.id), (user3.id, user2.id), (user2.id, user3.id)]
+    )
+    assert [(r['blockerStatus'], r['blockedStatus']) for r in relationships] == [
+        (BlockStatus.NOT_BLOCKING, BlockStatus.NOT_BLOCKING),
+        (BlockStatus.BLOCKING, BlockStatus.NOT_BLOCKING),
+        (BlockStatus.NOT_BLOCKING, BlockStatus.BLOCKING),
+    ]
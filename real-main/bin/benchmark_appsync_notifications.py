@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+Benchmark of firing notifications with AppSyncClient, against how it used to build a new boto session,
+signer, http transport and parsed document for every notification.
+
+Notifications are sent to a local http stand-in for AppSync, so the numbers leave out network latency and
+TLS handshakes - with which the re-used connections of the pooled client save more still. The stand-in
+can be made to wait before responding with `--latency`, to compare deferring the notifications and sending
+them concurrently, as the dynamo stream handler does.
+"""
+import argparse
+import contextlib
+import http.server
+import json
+import os
+import sys
+import threading
+import time
+
+import boto3
+import gql
+import gql.transport.requests
+import requests_aws4auth
+
+# https://stackoverflow.com/questions/16981921
+SCRIPT_PATH = os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(SCRIPT_PATH)))
+from app.clients import AppSyncClient  # noqa E402
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    disable_nagle_algorithm = True  # or the response waits on a delayed ack from the kept-alive connection
+    latency = 0  # seconds
+
+    def do_POST(self):
+        time.sleep(self.latency)
+        self.rfile.read(int(self.headers['Content-Length']))
+        body = json.dumps({'data': {'triggerNotification': None}}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class UnpooledAppSyncClient(AppSyncClient):
+    "AppSyncClient as it was, with everything built afresh for each notification"
+
+    def send(self, query, variables):
+        aws_session = boto3.session.Session()
+        creds = aws_session.get_credentials().get_frozen_credentials()
+        auth = requests_aws4auth.AWS4Auth(
+            creds.access_key,
+            creds.secret_key,
+            aws_session.region_name,
+            self.service_name,
+            session_token=creds.token,
+        )
+        transport = gql.transport.requests.RequestsHTTPTransport(
+            url=self.appsync_graphql_url,
+            use_json=True,
+            headers=self.headers,
+            auth=auth,
+        )
+        resp = transport.execute(gql.gql(query), variables)
+        if resp.errors:
+            raise Exception(f'Appsync resp error: `{resp.errors}`')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark firing AppSync notifications")
+    parser.add_argument('-n', dest='count', default=500, type=int, help='number of notifications to fire')
+    parser.add_argument('--latency', default=0, type=float, help='milliseconds the stand-in waits to respond')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+    StandInHandler.latency = args.latency / 1000
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_address[1]}/graphql'
+
+    for label, client_class, deferred in (
+        ('unpooled', UnpooledAppSyncClient, False),
+        ('pooled', AppSyncClient, False),
+        ('pooled & deferred', AppSyncClient, True),
+    ):
+        client = client_class(appsync_graphql_url=url)
+        start = time.perf_counter()
+        with client.deferred_sends() if deferred else contextlib.nullcontext():
+            for i in range(args.count):
+                client.fire_notification(f'user-{i}', 'USER_CHATS_WITH_UNVIEWED_MESSAGES_COUNT_CHANGED', count=i)
+        seconds = time.perf_counter() - start
+        print(f'{label}: {seconds * 1e3 / args.count:.2f} ms per notification')
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
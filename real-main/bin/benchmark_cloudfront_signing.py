@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""
+Benchmark of CloudFrontClient.generate_presigned_url, with and without the signed url cache.
+
+Models resolving the images of a feed: pages of posts, each resolved at five image sizes, drawn with
+repetition from a pool of posts, as the same posts show up in many users' feeds and are re-fetched.
+Signing uses a throwaway key pair generated here.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+from cryptography.hazmat import backends
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+# https://stackoverflow.com/questions/16981921
+SCRIPT_PATH = os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(SCRIPT_PATH)))
+from app.clients import CloudFrontClient  # noqa E402
+
+IMAGE_SIZES = ['native.jpg', '4K.jpg', '1080p.jpg', '480p.jpg', '64p.jpg']
+
+
+def generate_key_pair():
+    "A key pair in the format of the entry stored in the AWS secrets manager"
+    private_key = rsa.generate_private_key(
+        public_exponent=65537, key_size=2048, backend=backends.default_backend()
+    )
+    pem = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.TraditionalOpenSSL,
+        encryption_algorithm=serialization.NoEncryption(),
+    ).decode('utf-8')
+    # the secrets manager entry has no header or footer
+    return {'keyId': 'APKABENCHMARK', 'privateKey': ''.join(pem.strip().split('\n')[1:-1])}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark signing of CloudFront urls")
+    parser.add_argument('-n', dest='pages', default=200, type=int, help='number of feed pages to resolve')
+    parser.add_argument('--page-size', default=20, type=int, help='number of posts per page')
+    parser.add_argument('--posts', default=1000, type=int, help='number of distinct posts')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    key_pair = generate_key_pair()
+    rand = random.Random(0)
+    pages = [rand.choices(range(args.posts), k=args.page_size) for _ in range(args.pages)]
+    url_count = args.pages * args.page_size * len(IMAGE_SIZES)
+
+    for label, url_cache_size in (('uncached', 0), ('cached', CloudFrontClient.url_cache_size)):
+        client = CloudFrontClient(
+            lambda: key_pair, domain='benchmark.cloudfront.net', url_cache_size=url_cache_size
+        )
+        client.get_cloudfront_signer()  # load the key outside the timing
+        client.url_cache.pop_stats()
+
+        start = time.perf_counter()
+        for page in pages:
+            for post_index in page:
+                for image_size in IMAGE_SIZES:
+                    client.generate_presigned_url(f'uid/post/pid{post_index}/image/{image_size}', ['GET', 'HEAD'])
+        seconds = time.perf_counter() - start
+
+        stats = client.url_cache.pop_stats()
+        hit_rate = 100 * stats['hits'] / url_count
+        print(
+            f'{label}: {url_count / seconds:,.0f} urls per second, {seconds * 1e6 / url_count:.1f} µs per url, '
+            f'{hit_rate:.1f}% cache hits'
+        )
+
+
+if __name__ == '__main__':
+    main()
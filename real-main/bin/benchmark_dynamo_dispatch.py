@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+"""
+Microbenchmark of DynamoDispatch.search, before and after compiling the registry into routes.
+
+The registry is modeled on the one in app/handlers/dynamo/handlers.py, and the records on a typical mix
+seen by the stream handler: mostly MODIFYs of counters on user profiles and posts.
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+from collections import defaultdict
+
+# https://stackoverflow.com/questions/16981921
+SCRIPT_PATH = os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(SCRIPT_PATH)))
+from app.handlers.dynamo.dispatch import DynamoDispatch  # noqa E402
+
+IUD = ['INSERT', 'MODIFY', 'REMOVE']
+IU = ['INSERT', 'MODIFY']
+
+REGISTRY = [
+    ('album', '-', IU, {'postsLastUpdatedAt': None}),
+    ('chat', 'member', IUD, {'messagesUnviewedCount': 0}),
+    ('chat', 'view', IU, {'viewCount': 0}),
+    ('chatMessage', '-', ['INSERT'], None),
+    ('chatMessage', '-', ['INSERT'], None),
+    ('comment', '-', ['INSERT'], None),
+    ('comment', '-', ['INSERT'], None),
+    ('comment', '-', IU, {'textTags': []}),
+    ('post', '-', IU, {'commentsUnviewedCount': 0}),
+    ('post', '-', IU, {'anonymousLikeCount': 0, 'onymousLikeCount': 0}),
+    ('post', '-', IU, {'originalPostId': None}),
+    ('post', '-', IU, {'textTags': []}),
+    ('post', '-', IU, {'viewedByCount': 0}),
+    ('post', '-', IUD, {'postStatus': None}),
+    ('post', '-', IU, {'verificationHidden': False}),
+    ('post', '-', ['MODIFY'], {'postStatus': None}),
+    ('post', '-', ['MODIFY'], {'postStatus': None}),
+    ('post', '-', IUD, {'albumId': None, 'gsiK3SortKey': -1}),
+    ('post', 'like', ['INSERT'], None),
+    ('post', 'view', IU, {'viewCount': 0}),
+    ('post', 'view', IU, {'viewCount': 0}),
+    ('post', 'view', ['INSERT', 'REMOVE'], None),
+    ('user', 'follower', IUD, {'followStatus': 'NOT_FOLLOWING'}),
+    ('user', 'follower', IUD, {'postId': None}),
+    ('user', 'follower', IUD, {'followStatus': 'NOT_FOLLOWING'}),
+    ('user', 'follower', IUD, {'followStatus': 'NOT_FOLLOWING'}),
+    ('user', 'follower', IUD, {'followStatus': 'NOT_FOLLOWING'}),
+    ('user', 'profile', ['INSERT'], None),
+    ('user', 'profile', IU, {'chatsWithUnviewedMessagesCount': 0}),
+    ('user', 'profile', IU, {'followersRequestedCount': 0}),
+    ('user', 'profile', IU, {'chatMessagesForcedDeletionCount': 0}),
+    ('user', 'profile', IU, {'commentForcedDeletionCount': 0}),
+    ('user', 'profile', IU, {'postForcedArchivingCount': 0}),
+    ('user', 'profile', IU, {'chatsWithUnviewedMessagesCount': 0}),
+    ('user', 'profile', IU, {'email': None}),
+    ('user', 'profile', IU, {'phoneNumber': None}),
+    ('user', 'profile', IU, {'userStatus': 'ACTIVE'}),
+    ('user', 'profile', IU, {'username': None, 'fullName': None, 'lastManuallyReindexedAt': None}),
+    ('user', 'profile', IUD, {'email': None}),
+    ('user', 'profile', IUD, {'phoneNumber': None}),
+] + [('user', 'profile', ['REMOVE'], None)] * 18
+
+
+class LegacyDynamoDispatch:
+    "The nested-dict implementation of DynamoDispatch, as it was before routes were compiled"
+
+    def __init__(self):
+        self.listeners = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+
+    def register(self, pk_prefix, sk_prefix, event_names, handler, attributes=None):
+        for event_name in event_names:
+            self.listeners[pk_prefix][sk_prefix][event_name].append(
+                {'handler': handler, 'attributes': attributes}
+            )
+
+    def search(self, pk_prefix, sk_prefix, event_name, old_item, new_item):
+        matches = []
+        for listener in self.listeners[pk_prefix][sk_prefix][event_name]:
+            if not listener['attributes']:
+                matches.append(listener['handler'])
+                continue
+            for attr_name, attr_default in listener['attributes'].items():
+                old_value = old_item.get(attr_name, attr_default)
+                new_value = new_item.get(attr_name, attr_default)
+                if old_value != new_value:
+                    matches.append(listener['handler'])
+                    break
+        return matches
+
+
+def user_profile(**kwargs):
+    item = {
+        'userId': 'uid',
+        'username': 'username',
+        'email': 'test@real.app',
+        'userStatus': 'ACTIVE',
+        'followerCount': 42,
+        'followedCount': 24,
+        'postCount': 12,
+        'chatsWithUnviewedMessagesCount': 1,
+        'lastClient': {'system': 'iOS', 'version': '1.2.3'},
+    }
+    return {**item, **kwargs}
+
+
+def post(**kwargs):
+    item = {
+        'postId': 'pid',
+        'postedByUserId': 'uid',
+        'postStatus': 'COMPLETED',
+        'text': 'lore ipsum',
+        'textTags': [{'tag': '@username', 'userId': 'uid'}],
+        'viewedByCount': 3,
+        'onymousLikeCount': 2,
+        'gsiK3SortKey': 0,
+    }
+    return {**item, **kwargs}
+
+
+# (weight, pk_prefix, sk_prefix, event_name, old_item, new_item)
+RECORD_MIX = [
+    (20, 'user', 'profile', 'MODIFY', user_profile(), user_profile(followerCount=43)),
+    (10, 'user', 'profile', 'MODIFY', user_profile(), user_profile(chatsWithUnviewedMessagesCount=2)),
+    (
+        5,
+        'user',
+        'profile',
+        'MODIFY',
+        user_profile(),
+        user_profile(lastClient={'system': 'iOS', 'version': '1.3'}),
+    ),
+    (20, 'post', '-', 'MODIFY', post(), post(viewedByCount=4)),
+    (5, 'post', '-', 'MODIFY', post(), post(postStatus='ARCHIVED')),
+    (15, 'post', 'view', 'MODIFY', {'viewCount': 1}, {'viewCount': 2}),
+    (10, 'chat', 'member', 'MODIFY', {'messagesUnviewedCount': 0}, {'messagesUnviewedCount': 1}),
+    (10, 'user', 'follower', 'INSERT', {}, {'followStatus': 'FOLLOWING'}),
+    (5, 'chatMessage', '-', 'INSERT', {}, {'text': 'hi'}),
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark DynamoDispatch.search")
+    parser.add_argument('-n', dest='records', default=100000, type=int, help='number of records to search')
+    return parser.parse_args().records
+
+
+def main():
+    count = parse_args()
+    weights, records = zip(*[(weight, record) for weight, *record in RECORD_MIX])
+    records = random.Random(0).choices(records, weights=weights, k=count)
+
+    for dispatch_class in (LegacyDynamoDispatch, DynamoDispatch):
+        dispatch = dispatch_class()
+        for i, (pk_prefix, sk_prefix, event_names, attributes) in enumerate(REGISTRY):
+            dispatch.register(pk_prefix, sk_prefix, event_names, f'handler{i}', attributes)
+
+        def run():
+            for record in records:
+                dispatch.search(*record)
+
+        seconds = min(timeit.repeat(run, number=1, repeat=5))
+        print(f'{dispatch_class.__name__}: {seconds * 1e6 / count:.2f} µs per record')
+
+
+if __name__ == '__main__':
+    main()
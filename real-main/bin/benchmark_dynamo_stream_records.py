@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""
+Benchmark of the CPU time the dynamo stream handler spends per record deserializing and dispatching,
+before and after deserializing item images lazily.
+
+Replays a captured batch of stream records if one is given, ie a json file of a lambda event as received
+by app.handlers.dynamo.handlers.process_records. Otherwise a batch is generated from a typical mix of records,
+including those for items no listener is interested in, such as trending and image items.
+"""
+import argparse
+import decimal
+import json
+import os
+import random
+import sys
+import time
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+# https://stackoverflow.com/questions/16981921
+SCRIPT_PATH = os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(SCRIPT_PATH)))
+sys.path.append(os.path.dirname(SCRIPT_PATH))
+from benchmark_dynamo_dispatch import REGISTRY, post, user_profile  # noqa E402
+
+from app.handlers.dynamo.dispatch import DynamoDispatch, LazyImage, deserialize  # noqa E402
+
+boto_deserialize = TypeDeserializer().deserialize
+serialize = TypeSerializer().serialize
+
+# (weight, partitionKey, sortKey, event_name, old_item, new_item)
+RECORD_MIX = [
+    (20, 'user/uid', 'profile', 'MODIFY', user_profile(), user_profile(followerCount=43)),
+    (5, 'user/uid', 'profile', 'MODIFY', user_profile(), user_profile(username='new')),
+    (20, 'post/pid', '-', 'MODIFY', post(), post(viewedByCount=4)),
+    (5, 'post/pid', '-', 'MODIFY', post(), post(postStatus='ARCHIVED')),
+    (15, 'post/pid', 'view/uid', 'MODIFY', {'viewCount': 1}, {'viewCount': 2}),
+    (10, 'user/uid', 'follower/uid2', 'INSERT', {}, {'followStatus': 'FOLLOWING'}),
+    (15, 'post/pid', 'trending', 'MODIFY', {'score': decimal.Decimal('1.5')}, {'score': decimal.Decimal('2.5')}),
+    (5, 'user/uid', 'deleted', 'INSERT', {}, {'userId': 'uid', 'deletedAt': '2020-10-17T00:00:00Z'}),
+    (5, 'post/pid', 'image', 'INSERT', {}, {'height': 1080, 'width': 1920, 'colors': [{'r': 1, 'g': 2, 'b': 3}]}),
+]
+
+
+def stream_record(pk, sk, event_name, old_item, new_item):
+    dynamodb = {'Keys': {'partitionKey': serialize(pk), 'sortKey': serialize(sk)}}
+    for name, item in (('OldImage', old_item), ('NewImage', new_item)):
+        if item:
+            dynamodb[name] = {k: serialize(v) for k, v in {'partitionKey': pk, 'sortKey': sk, **item}.items()}
+    return {'eventName': event_name, 'dynamodb': dynamodb}
+
+
+def process_record_eagerly(dispatch, record):
+    "How the stream handler processed each record, before deserializing images lazily"
+    name = record['eventName']
+    pk = boto_deserialize(record['dynamodb']['Keys']['partitionKey'])
+    sk = boto_deserialize(record['dynamodb']['Keys']['sortKey'])
+    old_item = {k: boto_deserialize(v) for k, v in record['dynamodb'].get('OldImage', {}).items()}
+    new_item = {k: boto_deserialize(v) for k, v in record['dynamodb'].get('NewImage', {}).items()}
+    pk_prefix, sk_prefix = pk.split('/')[0], sk.split('/')[0]
+    return dispatch.search(pk_prefix, sk_prefix, name, old_item, new_item), old_item, new_item
+
+
+def process_record_lazily(dispatch, record):
+    "How the stream handler processes each record"
+    name = record['eventName']
+    pk = deserialize(record['dynamodb']['Keys']['partitionKey'])
+    sk = deserialize(record['dynamodb']['Keys']['sortKey'])
+    pk_prefix, sk_prefix = pk.split('/')[0], sk.split('/')[0]
+    if not dispatch.has_listeners(pk_prefix, sk_prefix, name):
+        return [], None, None
+    old_image = LazyImage(record['dynamodb'].get('OldImage', {}))
+    new_image = LazyImage(record['dynamodb'].get('NewImage', {}))
+    funcs = dispatch.search(pk_prefix, sk_prefix, name, old_image, new_image)
+    if not funcs:
+        return [], None, None
+    return funcs, old_image.to_dict(), new_image.to_dict()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark deserializing & dispatching dynamo stream records")
+    parser.add_argument('-f', dest='event_file', help='json file of a captured stream event to replay')
+    parser.add_argument('-n', dest='records', default=10000, type=int, help='number of records to generate')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.event_file:
+        with open(args.event_file) as fh:
+            records = json.load(fh)['Records']
+    else:
+        weights, records = zip(*[(weight, record) for weight, *record in RECORD_MIX])
+        records = [stream_record(*r) for r in random.Random(0).choices(records, weights=weights, k=args.records)]
+
+    dispatch = DynamoDispatch()
+    for i, (pk_prefix, sk_prefix, event_names, attributes) in enumerate(REGISTRY):
+        dispatch.register(pk_prefix, sk_prefix, event_names, f'handler{i}', attributes)
+
+    # both must agree on which listeners get called, with what
+    for record in records:
+        eager_funcs, eager_old_item, eager_new_item = process_record_eagerly(dispatch, record)
+        lazy_funcs, lazy_old_item, lazy_new_item = process_record_lazily(dispatch, record)
+        assert eager_funcs == lazy_funcs, record
+        assert not lazy_funcs or (eager_old_item, eager_new_item) == (lazy_old_item, lazy_new_item), record
+
+    for process_record in (process_record_eagerly, process_record_lazily):
+        cpu_seconds = []
+        for _ in range(5):
+            start = time.process_time()
+            for record in records:
+                process_record(dispatch, record)
+            cpu_seconds.append(time.process_time() - start)
+        print(f'{process_record.__name__}: {min(cpu_seconds) * 1e6 / len(records):.2f} µs of CPU per record')
+
+
+if __name__ == '__main__':
+    main()
@@ -3,14 +3,19 @@ import argparse
 import collections
 import os
 import pprint
+import sys
 
-import boto3
 import dotenv
 import pendulum
 from boto3.dynamodb.conditions import Attr, Key
 
 dotenv.load_dotenv()
 
+# https://stackoverflow.com/questions/16981921
+SCRIPT_PATH = os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(SCRIPT_PATH)))
+from app.clients import DynamoClient  # noqa E402
+
 DYNAMO_TABLE = os.environ.get('DYNAMO_TABLE')
 assert DYNAMO_TABLE, 'Environment variable DYNAMO_TABLE must be defined'
 
@@ -26,11 +31,21 @@ def parse_args():
         type=lambda s: str(pendulum.parse(s).date()),
         help='Count users that signed up on this date. Ex: 2020-05-19',
     )
+    parser.add_argument(
+        '-s', dest='segments', default=8, type=int, help='Number of segments to split the table scan into'
+    )
+    parser.add_argument(
+        '-r',
+        dest='max_rcus',
+        default=None,
+        type=int,
+        help='Max read capacity units per second the table scan may consume',
+    )
     args = parser.parse_args()
-    return args.date
+    return args.date, args.segments, args.max_rcus
 
 
-def generate_users(table, signed_up_date):
+def generate_users(dynamo_client, signed_up_date, segments, max_rcus):
     "A generator that generates all users that signed up on the given date"
     # TODO: add an index to the user item, change this from a scan to a query
     kwargs = {
@@ -40,14 +55,8 @@ def generate_users(table, signed_up_date):
             & Attr('signedUpAt').between(signed_up_date, signed_up_date + 'T24')
         ),
     }
-    last_key = False
-    while last_key is not None:
-        if last_key:
-            kwargs['ExclusiveStartKey'] = last_key
-        resp = table.scan(**kwargs)
-        for item in resp['Items']:
-            yield item
-        last_key = resp.get('LastEvaluatedKey')
+    scan = dynamo_client.parallel_scan(kwargs, total_segments=segments, max_capacity_units_per_second=max_rcus)
+    return scan.generate_unordered()
 
 
 def generate_posts(table, user_id):
@@ -68,11 +77,12 @@ def generate_posts(table, user_id):
 
 
 def main():
-    signed_up_date = parse_args()
-    table = boto3.resource('dynamodb').Table(DYNAMO_TABLE)
+    signed_up_date, segments, max_rcus = parse_args()
+    dynamo_client = DynamoClient(table_name=DYNAMO_TABLE)
+    table = dynamo_client.table
 
     stats = collections.defaultdict(int)
-    for user in generate_users(table, signed_up_date):
+    for user in generate_users(dynamo_client, signed_up_date, segments, max_rcus):
         print('.', end='', flush=True)
 
         verified = False
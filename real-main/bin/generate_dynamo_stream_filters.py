@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""
+Generate the Lambda event source filters of the dynamo stream consumer from the listeners registered in
+app/handlers/dynamo/handlers.py, so that the stream Lambda isn't invoked for records no listener handles,
+such as those of trending items and user subitems.
+
+The filters are written as a CloudFormation override of the consumer's event source mapping, which is
+included from serverless.yml. Re-run after changing the registrations. With `--check`, nothing is written
+and the exit status is non-zero if the file is out of date.
+
+With `--split`, the records are instead split by item type over several consumers, one per group in
+CONSUMER_GROUPS, so they scale independently. Each group's consumer must then be declared in serverless.yml
+as a function named `dynamoStream<Group>`, with the same handler and stream event as `dynamoStream`.
+"""
+import argparse
+import json
+import os
+import sys
+
+# https://stackoverflow.com/questions/16981921
+SCRIPT_PATH = os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__)))
+ROOT_PATH = os.path.dirname(os.path.dirname(SCRIPT_PATH))
+sys.path.append(ROOT_PATH)
+
+# the listeners are registered as a side effect of importing the handlers module, which also builds clients
+# that insist on configuration - but are not called, so placeholders do
+for name in (
+    'COGNITO_USER_POOL_BACKEND_CLIENT_ID',
+    'COGNITO_USER_POOL_ID',
+    'DYNAMO_FEED_TABLE',
+    'DYNAMO_TABLE',
+    'ELASTICSEARCH_DOMAIN',
+    'PINPOINT_APPLICATION_ID',
+    'S3_UPLOADS_BUCKET',
+):
+    os.environ.setdefault(name, 'placeholder')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+from app.handlers.dynamo.handlers import dispatch  # noqa E402
+
+FILTERS_PATH = os.path.join(ROOT_PATH, 'serverless', 'resources', 'dynamo-stream-filters.yml')
+
+# logical id that serverless gives the event source mapping of a function's stream event from our table
+MAPPING_LOGICAL_ID = '{}EventSourceMappingDynamodbDynamoDbTable'
+
+CONSUMER_GROUPS = {
+    'Chat': ['chat', 'chatMessage'],
+    'Post': ['album', 'comment', 'post'],
+    'User': ['card', 'cascade', 'user'],
+}
+
+
+def consumer_patterns(split=False):
+    "Return a dict of {consumer function name: list of filter patterns}"
+    if not split:
+        return {'dynamoStream': dispatch.filter_patterns()}
+
+    registered = {pk_prefix for pk_prefix, _, _ in dispatch.routes}
+    grouped = {pk_prefix for pk_prefixes in CONSUMER_GROUPS.values() for pk_prefix in pk_prefixes}
+    if registered - grouped:
+        raise Exception(
+            f'Listeners registered for pk prefixes in no consumer group: {sorted(registered - grouped)}'
+        )
+    return {
+        f'dynamoStream{group}': dispatch.filter_patterns(pk_prefixes=pk_prefixes)
+        for group, pk_prefixes in CONSUMER_GROUPS.items()
+    }
+
+
+def render(patterns_by_consumer):
+    lines = [
+        '# Generated by bin/generate_dynamo_stream_filters.py from the registered dynamo stream listeners.',
+        '# Do not edit by hand, re-run that script instead.',
+        'Resources:',
+    ]
+    for function_name, patterns in patterns_by_consumer.items():
+        logical_id = MAPPING_LOGICAL_ID.format(function_name[0].upper() + function_name[1:])
+        lines += [f'  {logical_id}:', '    Properties:', '      FilterCriteria:', '        Filters:']
+        lines += [f"          - Pattern: '{json.dumps(pattern)}'" for pattern in patterns]
+    return '\n'.join(lines) + '\n'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate dynamo stream event source filters")
+    parser.add_argument('--split', action='store_true', help='split records over a consumer per item type group')
+    parser.add_argument('--check', action='store_true', help='check the generated file is up to date')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    content = render(consumer_patterns(split=args.split))
+    if args.check:
+        with open(FILTERS_PATH) as fh:
+            if fh.read() != content:
+                sys.exit(f'{FILTERS_PATH} is out of date, re-run {SCRIPT_PATH}')
+        return
+    with open(FILTERS_PATH, 'w') as fh:
+        fh.write(content)
+    print(f'Wrote {FILTERS_PATH}')
+
+
+if __name__ == '__main__':
+    main()